@@ -66,6 +66,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
     'musicwire.account.middleware.UserAuthenticationMiddleware',
+    'musicwire.core.middleware.RequestDeadlineMiddleware',
     'elasticapm.contrib.django.middleware.TracingMiddleware',
 ]
 
@@ -89,6 +90,15 @@ TEMPLATES = [
 
 REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'musicwire.core.helpers.custom_exception_handler',
+    'DEFAULT_RENDERER_CLASSES': [
+        'musicwire.core.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'musicwire.core.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100
 }
@@ -148,7 +158,8 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
-EXEMPT_URLS = ['/admin/', '/user/signup', '/user/signin']
+# Metrics scrapers have no user token, the endpoint requires METRICS_TOKEN itself.
+EXEMPT_URLS = ['/admin/', '/user/signup', '/user/signin', '/metrics/']
 
 RAVEN_CONFIG = {
     'dns': os.getenv("RAVEN_DNS")
@@ -206,6 +217,81 @@ CACHES = {
 
 TRACK_CACHE_TIME = 60 * 5  # 5 minutes
 
+# Crawled playlists and tracks are written per this many rows in a transaction,
+# with COPY on PostgreSQL unless disabled.
+INGEST_BATCH_SIZE = 5000
+INGEST_USE_COPY = True
+
+PROVIDER_BASE_URLS = {
+    'spotify': 'https://api.spotify.com/v1/',
+    'youtube': 'https://www.googleapis.com/youtube/v3/',
+}
+
+# Concurrent provider calls per process. HTTP connection pools are sized with it.
+PROVIDER_MAX_WORKERS = {
+    'spotify': 4,
+    'youtube': 4,
+}
+# Threads which call providers outside the workers, the task's own thread and
+# the page reader of a crawl. Connection pools have room for them too.
+PROVIDER_CALLER_THREADS = 2
+# Token paged responses read ahead of the database writes of a crawl.
+PROVIDER_PREFETCH_PAGES = 2
+# Open connections per event loop of async clients.
+PROVIDER_ASYNC_MAX_CONNECTIONS = {
+    'spotify': 100,
+    'youtube': 100,
+}
+# Crawl source playlists of transfers with the async adapters, pages of a
+# playlist are then requested on an event loop instead of the executor.
+PROVIDER_ASYNC_CRAWL = False
+# Playlists an async crawl reads at the same time, on one event loop.
+PROVIDER_ASYNC_PLAYLISTS = 4
+
+# Token buckets shared through redis per provider and access token. Rate is
+# refilled units per second, YouTube units are quota units of the endpoints.
+PROVIDER_RATE_LIMITS = {
+    'spotify': {'rate': 10, 'capacity': 20},
+    'youtube': {'rate': 30, 'capacity': 300},
+}
+# Daily quota units of the app's API project, renewed at midnight of the time zone.
+# Requests beyond it are not sent, transfer tasks resume after the renewal.
+PROVIDER_DAILY_QUOTAS = {
+    'youtube': {'units': 10000, 'timezone': 'America/Los_Angeles'},
+}
+# Seconds a provider access token is valid, stored ones older than it are not
+# used to resume a paused task.
+PROVIDER_TOKEN_LIFETIME = 60 * 60
+# Seconds, provider requests shrink them to the remaining time budget.
+PROVIDER_CONNECT_TIMEOUT = 5
+PROVIDER_READ_TIMEOUT = 30
+REQUEST_DEADLINE = 60  # Time budget of a web request.
+TRANSFER_TASK_DEADLINE = 60 * 60 * 2  # Time budget of a transfer task, 2 hours
+
+# ETags of provider GET responses, unchanged pages are not downloaded again.
+PROVIDER_ETAG_CACHE_TIME = 60 * 60 * 24 * 7  # 7 days
+
+# Progress counters of crawls and transfers in Redis, see provider.progress.
+PROGRESS_FLUSH_INTERVAL = 1  # Seconds between writes of a process.
+PROGRESS_EXPIRE_TIME = 60 * 60 * 24  # 1 day
+
+PROVIDER_RATE_LIMIT_RETRIES = 3  # Resend count of a request answered with 429.
+PROVIDER_RETRY_AFTER_DEFAULT = 5  # Seconds, if 429 comes without Retry-After.
+
+# Transient failure retries. Keys other than default are "<provider>:<end_point>"
+# patterns, first match overrides the default policy. Waits are full jittered
+# factor * 2 ** try seconds capped with max_value, all tries end in max_time.
+PROVIDER_RETRY_POLICIES = {
+    'default': {'max_tries': 4, 'max_time': 30, 'factor': 0.5, 'max_value': 8},
+    'spotify:search': {'max_tries': 3, 'max_time': 10},
+    'youtube:search': {'max_tries': 2, 'max_time': 10},
+}
+
+# Bearer token of the metrics scrape endpoint, it is closed when not set.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+# Seconds between writes of a process's request counts to the shared totals.
+METRICS_FLUSH_INTERVAL = 5
+
 ELASTIC_APM = {
   # Set required service name. Allowed characters:
   # a-z, A-Z, 0-9, -, _, and space
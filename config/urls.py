@@ -16,9 +16,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from musicwire.provider.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('transfer/', include('musicwire.transfer.urls'), name='transfer'),
     path('user/', include('musicwire.account.urls'), name='account'),
-    path('music/', include('musicwire.music.urls'), name='music')
+    path('music/', include('musicwire.music.urls'), name='music'),
+    path('metrics/', metrics_view, name='metrics')
 ]
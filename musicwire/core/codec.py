@@ -0,0 +1,36 @@
+"""
+JSON codec of the application. orjson is used when it is installed, stdlib
+json otherwise. Both dumps to compact utf-8 bytes.
+"""
+import json
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+DecodeError = ValueError  # orjson.JSONDecodeError is a ValueError too.
+
+
+def stdlib_dumps(obj: Any, default: Optional[Callable] = None) -> bytes:
+    return json.dumps(obj, default=default, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def stdlib_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+
+if orjson is not None:
+    # Datetimes go through default to keep the format of the given encoder.
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(obj: Any, default: Optional[Callable] = None) -> bytes:
+        return orjson.dumps(obj, default=default, option=OPTIONS)
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+else:  # pragma: no cover
+    dumps = stdlib_dumps
+    loads = stdlib_loads
@@ -0,0 +1,90 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+from musicwire.core.exceptions import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+_deadline = ContextVar('deadline', default=None)
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Give a time budget to everything called in the block. Budget is carried
+    with contextvars, nested blocks can only shrink it. Executor threads only
+    see it if the work is submitted with contextvars.copy_context().run.
+    """
+    current = _deadline.get()
+    budget = Deadline(seconds)
+    if current is not None and current.expires_at < budget.expires_at:
+        budget = current
+
+    token = _deadline.set(budget)
+    try:
+        yield budget
+    finally:
+        _deadline.reset(token)
+
+
+def with_deadline(seconds: float):
+    """
+    Run the decorated task with a time budget. Task stops with a warning when
+    the budget runs out instead of blocking the worker.
+    """
+    def decorator(func):
+        @wraps(func)
+        def aux(*args, **kwargs):
+            with deadline(seconds):
+                try:
+                    return func(*args, **kwargs)
+                except DeadlineExceeded as e:
+                    logger.warning(f"{func.__name__} stopped: {e}")
+        return aux
+    return decorator
+
+
+def remaining_time() -> Optional[float]:
+    """
+    Seconds left from the current budget, None if there is no budget.
+    """
+    budget = _deadline.get()
+    if budget is None:
+        return None
+    return budget.remaining()
+
+
+def check_deadline(needed: float = 0):
+    """
+    Raise DeadlineExceeded if the budget cannot cover needed seconds.
+    """
+    remaining = remaining_time()
+    if remaining is not None and remaining <= needed:
+        raise DeadlineExceeded('Time budget of the operation is exhausted.')
+
+
+def request_timeout() -> Tuple[float, float]:
+    """
+    Connect and read timeouts of a provider request, shrunk to the budget.
+    """
+    connect, read = settings.PROVIDER_CONNECT_TIMEOUT, settings.PROVIDER_READ_TIMEOUT
+    remaining = remaining_time()
+    if remaining is None:
+        return connect, read
+
+    check_deadline()
+    return min(connect, remaining), min(read, remaining)
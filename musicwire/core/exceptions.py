@@ -37,3 +37,18 @@ class AllTracksAlreadyProcessed(ValidationError):
 
 class AllPlaylistsAlreadyProcessed(ValidationError):
     code = 'ALL_PLAYLISTS_ALREADY_PROCESSED'
+
+
+class DeadlineExceeded(ValidationError):
+    status_code = status.HTTP_504_GATEWAY_TIMEOUT
+    code = 'DEADLINE_EXCEEDED'
+
+
+class QuotaExceeded(ValidationError):
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    code = 'QUOTA_EXCEEDED'
+
+
+class ProviderTokenExpired(ValidationError):
+    status_code = status.HTTP_401_UNAUTHORIZED
+    code = 'PROVIDER_TOKEN_EXPIRED'
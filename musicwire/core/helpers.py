@@ -1,9 +1,17 @@
-import json
+import asyncio
+import fnmatch
+import inspect
 import logging
+import time
 import uuid
-from functools import wraps
+from contextvars import copy_context
+from functools import partial, wraps
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Iterator, Optional
 
+import aiohttp
+import backoff
 from django.conf import settings
+from django.db import close_old_connections
 from raven import Client
 from requests import exceptions as requests_exceptions
 from rest_framework.exceptions import APIException
@@ -11,35 +19,222 @@ from rest_framework.response import Response
 from rest_framework.views import exception_handler
 from urllib3 import exceptions
 
+from musicwire.core import codec
+from musicwire.core.deadline import remaining_time
 from musicwire.provider.datastructures import ClientResult
+from musicwire.provider.metrics import request_metrics
 
 logger = logging.getLogger(__name__)
 
+TRANSIENT_ERRORS = (exceptions.ReadTimeoutError,
+                    requests_exceptions.ReadTimeout,
+                    exceptions.ConnectionError,
+                    requests_exceptions.ConnectionError)
+ASYNC_TRANSIENT_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+# Errors raised before the request reaches the provider.
+NOT_SENT_ERRORS = (requests_exceptions.ConnectTimeout, aiohttp.ClientConnectorError)
+TRANSIENT_STATUS_CODES = (500, 502, 503, 504)
+# Methods which can be resent without side effects. Provider endpoints the
+# clients POST to, e.g. adding playlist items, would add duplicates.
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE')
+
+
+def get_retry_policy(provider: str, end_point: str) -> dict:
+    """
+    Merge default retry policy with the first policy whose
+    "<provider>:<end_point>" pattern matches the request.
+    """
+    policies = settings.PROVIDER_RETRY_POLICIES
+    policy = dict(policies['default'])
+    for pattern, overrides in policies.items():
+        if pattern != 'default' and fnmatch.fnmatch(f"{provider}:{end_point}", pattern):
+            policy.update(overrides)
+            break
+    return policy
+
+
+def is_transient(response, error, retry_safe: bool) -> bool:
+    """
+    Requests which are not safe to resend are only retried when the connection
+    could not be opened, the provider has not seen them yet.
+    """
+    if not retry_safe:
+        return isinstance(error, NOT_SENT_ERRORS)
+    if error is not None:
+        return True
+    return response.status_code in TRANSIENT_STATUS_CODES
+
+
+class RequestRetry:
+    """
+    Retry state of a single client request. Requests of idempotent methods
+    are retried on timeouts, connection errors and
+    5xx responses with jittered exponential backoff, limited by max_tries and
+    the total max_time of the endpoint's retry policy or the time budget.
+    """
+
+    def __init__(self, client, end_point: str, method: str = 'GET'):
+        self.method = method
+        self.end_point = end_point
+        self.retry_safe = method in IDEMPOTENT_METHODS
+        self.policy = get_retry_policy(client.provider, end_point)
+        self.delays = backoff.expo(factor=self.policy['factor'],
+                                   max_value=self.policy['max_value'])
+        self.give_up_at = time.monotonic() + self.policy['max_time']
+        self.tries = 0
+
+    def next_delay(self, response, error) -> Optional[float]:
+        """
+        Seconds to wait before resending the request, None if it is final.
+        """
+        self.tries += 1
+        if self.tries >= self.policy['max_tries'] or not is_transient(
+                response, error, self.retry_safe):
+            return None
+        delay = backoff.full_jitter(next(self.delays))
+        remaining = remaining_time()
+        if time.monotonic() + delay > self.give_up_at or (
+                remaining is not None and remaining <= delay):
+            return None
+        reason = error or response.status_code
+        logger.warning(f"Retrying {self.method} {self.end_point} in {delay:.2f}s, "
+                       f"try {self.tries} failed with {reason}")
+        return delay
+
+
+def to_client_result(response, connection_error) -> ClientResult:
+    error = False
+    error_message = None
+    result = None
+    if connection_error:
+        logging.error(f"Connection error as {connection_error}")
+        return ClientResult(result=result, error=True, error_msg='Connection Error')
+    if response.status_code == 304:
+        return ClientResult(result=result, error=False, error_msg=None, not_modified=True)
+    if response and response.ok:
+        result = codec.loads(response.content)
+    else:
+        logger.error(f"Response error: {response.text}")
+        error = True
+        error_message = response.text
+    return ClientResult(result=result, error=error, error_msg=error_message,
+                        etag=response.headers.get('ETag'))
+
+
+def observe_request(client, retry: RequestRetry, response, connection_error, started: float):
+    received = connection_error is None and response is not None
+    request_metrics.observe(
+        client.provider, retry.end_point, retry.method,
+        status=response.status_code if received else 'error',
+        duration=time.monotonic() - started,
+        size=len(response.content or b'') if received else 0,
+        retries=retry.tries - 1
+    )
+
+
+def request_retry(signature: inspect.Signature, client, args, kwargs) -> RequestRetry:
+    """
+    Retry state of a send_request call, its arguments may be positional.
+    """
+    arguments = signature.bind(client, *args, **kwargs)
+    arguments.apply_defaults()
+    return RequestRetry(client, arguments.arguments['end_point'],
+                        arguments.arguments['method'])
+
 
 def request_validator(func):
+    signature = inspect.signature(func)
+
     @wraps(func)
-    def aux(*args, **kwargs):
-        error = False
-        error_message = None
-        result = None
-        try:
-            response = func(*args, **kwargs)
-        except (exceptions.ReadTimeoutError,
-                requests_exceptions.ReadTimeout,
-                exceptions.ConnectionError,
-                requests_exceptions.ConnectionError) as e:
-            logging.error(f"Connection error as {e}")
-            return ClientResult(result=result, error=True, error_msg='Connection Error')
-        if response and response.ok:
-            result = response.json()
-        else:
-            logger.error(f"Response error: {response.text}")
-            error = True
-            error_message = response.text
-        return ClientResult(result=result, error=error, error_msg=error_message)
+    def aux(client, *args, **kwargs):
+        retry = request_retry(signature, client, args, kwargs)
+        started = time.monotonic()
+        while True:
+            response, connection_error = None, None
+            try:
+                response = func(client, *args, **kwargs)
+            except TRANSIENT_ERRORS as e:
+                connection_error = e
+
+            delay = retry.next_delay(response, connection_error)
+            if delay is None:
+                break
+            time.sleep(delay)
+        observe_request(client, retry, response, connection_error, started)
+        return to_client_result(response, connection_error)
     return aux
 
 
+def async_request_validator(func):
+    """
+    Coroutine version of request_validator.
+    """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    async def aux(client, *args, **kwargs):
+        retry = request_retry(signature, client, args, kwargs)
+        started = time.monotonic()
+        while True:
+            response, connection_error = None, None
+            try:
+                response = await func(client, *args, **kwargs)
+            except ASYNC_TRANSIENT_ERRORS as e:
+                connection_error = e
+
+            delay = retry.next_delay(response, connection_error)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        observe_request(client, retry, response, connection_error, started)
+        return to_client_result(response, connection_error)
+    return aux
+
+
+async def run_sync(fn: Callable, *args):
+    """
+    Run blocking code, e.g. Redis calls or database writes, in the default
+    executor of the event loop, in a copy of caller's context to keep its time
+    budget. Connections of the executor's threads are closed like after a
+    request, once they are older than CONN_MAX_AGE.
+    """
+    def call():
+        close_old_connections()
+        try:
+            return fn(*args)
+        finally:
+            close_old_connections()
+
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, partial(copy_context().run, call))
+
+
+def iterate_from_loop(iterator: AsyncIterator, loop: asyncio.AbstractEventLoop) -> Iterator:
+    """
+    Iterate an async iterator of the loop from blocking code run with run_sync,
+    e.g. to write pages while the loop keeps requesting the next ones. Owner
+    of the iterator closes it on the loop.
+    """
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(iterator.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+async def gather_limited(limit: int, awaitables: Iterable[Awaitable]) -> list:
+    """
+    asyncio.gather with at most limit awaitables running at a time.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*[run(awaitable) for awaitable in awaitables])
+
+
 def custom_exception_handler(exc, context: dict):
     """
     Rest Framework exception handler
@@ -64,8 +259,8 @@ def custom_exception_handler(exc, context: dict):
 
     if not isinstance(error_message, dict):
         try:
-            error_message = json.loads(error_message)
-        except ValueError:
+            error_message = codec.loads(str(error_message))
+        except codec.DecodeError:
             pass
 
     data = {
@@ -0,0 +1,139 @@
+import random
+import string
+import timeit
+
+from django.core.management import BaseCommand
+from rest_framework.utils import encoders
+
+from musicwire.core import codec
+
+MARKETS = [a + b for a in string.ascii_uppercase[:14] for b in string.ascii_uppercase[:13]]
+
+
+def random_id(size=22):
+    return ''.join(random.choices(string.ascii_letters + string.digits, k=size))
+
+
+def spotify_artist():
+    artist_id = random_id()
+    return {
+        'external_urls': {'spotify': f'https://open.spotify.com/artist/{artist_id}'},
+        'href': f'https://api.spotify.com/v1/artists/{artist_id}',
+        'id': artist_id,
+        'name': f'Artist {artist_id[:6]}',
+        'type': 'artist',
+        'uri': f'spotify:artist:{artist_id}'
+    }
+
+
+def spotify_track_item():
+    """
+    Playlist track item like Spotify returns without a fields mask.
+    """
+    album_id, track_id = random_id(), random_id()
+    return {
+        'added_at': '2020-08-26T12:38:01Z',
+        'added_by': {'id': 'user', 'type': 'user', 'uri': 'spotify:user:user'},
+        'is_local': False,
+        'track': {
+            'album': {
+                'album_type': 'album',
+                'artists': [spotify_artist()],
+                'available_markets': MARKETS,
+                'external_urls': {'spotify': f'https://open.spotify.com/album/{album_id}'},
+                'href': f'https://api.spotify.com/v1/albums/{album_id}',
+                'id': album_id,
+                'images': [{'height': size, 'width': size,
+                            'url': f'https://i.scdn.co/image/{random_id(40)}'}
+                           for size in (640, 300, 64)],
+                'name': f'Album {album_id[:6]}',
+                'release_date': '2019-11-22',
+                'release_date_precision': 'day',
+                'total_tracks': 12,
+                'type': 'album',
+                'uri': f'spotify:album:{album_id}'
+            },
+            'artists': [spotify_artist() for _ in range(random.randint(1, 3))],
+            'available_markets': MARKETS,
+            'disc_number': 1,
+            'duration_ms': random.randint(120000, 360000),
+            'explicit': False,
+            'external_ids': {'isrc': f'US{random_id(10).upper()}'},
+            'external_urls': {'spotify': f'https://open.spotify.com/track/{track_id}'},
+            'href': f'https://api.spotify.com/v1/tracks/{track_id}',
+            'id': track_id,
+            'is_local': False,
+            'name': f'Track {track_id[:6]}',
+            'popularity': random.randint(0, 100),
+            'preview_url': f'https://p.scdn.co/mp3-preview/{random_id(40)}',
+            'track_number': random.randint(1, 12),
+            'type': 'track',
+            'uri': f'spotify:track:{track_id}'
+        }
+    }
+
+
+def spotify_page(limit):
+    return {
+        'href': 'https://api.spotify.com/v1/playlists/id/tracks?offset=0&limit=100',
+        'items': [spotify_track_item() for _ in range(limit)],
+        'limit': limit,
+        'next': 'https://api.spotify.com/v1/playlists/id/tracks?offset=100&limit=100',
+        'offset': 0,
+        'previous': None,
+        'total': 10000
+    }
+
+
+def serialized_track(item):
+    """
+    TrackSerializer output of a playlist track.
+    """
+    return {
+        'name': item['track']['name'],
+        'artist': item['track']['artists'][0]['name'],
+        'album': item['track']['album']['name'],
+        'remote_id': item['track']['uri'],
+        'is_transferred': False,
+        'provider': 'spotify',
+        'playlist_name': 'Benchmark Playlist'
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare stdlib json with the application codec on Spotify sized payloads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def best_of(self, fn, repeat):
+        return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        pages = [spotify_page(options['limit']) for _ in range(options['pages'])]
+        bodies = [codec.stdlib_dumps(page) for page in pages]
+        tracks = [serialized_track(item) for page in pages for item in page['items']]
+        default = encoders.JSONEncoder().default
+        repeat = options['repeat']
+
+        size = sum(len(body) for body in bodies) / 1024 / 1024
+        self.stdout.write(f"{len(pages)} pages, {size:.1f} MiB, {len(tracks)} tracks, "
+                          f"codec: {'orjson' if codec.orjson else 'stdlib'}")
+
+        cases = (
+            ('decode pages', lambda: [codec.stdlib_loads(body) for body in bodies],
+             lambda: [codec.loads(body) for body in bodies]),
+            ('encode pages', lambda: [codec.stdlib_dumps(page) for page in pages],
+             lambda: [codec.dumps(page) for page in pages]),
+            ('render tracks', lambda: codec.stdlib_dumps(tracks, default=default),
+             lambda: codec.dumps(tracks, default=default)),
+        )
+        for name, stdlib_fn, codec_fn in cases:
+            stdlib_time = self.best_of(stdlib_fn, repeat)
+            codec_time = self.best_of(codec_fn, repeat)
+            self.stdout.write(f"{name:<14} stdlib {stdlib_time * 1000:8.1f} ms  "
+                              f"codec {codec_time * 1000:8.1f} ms  "
+                              f"x{stdlib_time / codec_time:.1f}")
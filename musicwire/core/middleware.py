@@ -0,0 +1,17 @@
+from django.conf import settings
+
+from musicwire.core.deadline import deadline
+
+
+class RequestDeadlineMiddleware:
+    """
+    Give every request a time budget, provider calls made by views shrink their
+    timeouts to it and stop with DeadlineExceeded when it runs out.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with deadline(settings.REQUEST_DEADLINE):
+            return self.get_response(request)
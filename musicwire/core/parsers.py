@@ -0,0 +1,23 @@
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from musicwire.core import codec
+
+
+class JSONParser(parsers.JSONParser):
+    """
+    Parses request bodies with the application codec.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            data = stream.read()
+            if encoding.lower() not in ('utf-8', 'utf8'):
+                data = data.decode(encoding)
+            return codec.loads(data)
+        except codec.DecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
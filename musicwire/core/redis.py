@@ -0,0 +1,22 @@
+import asyncio
+from typing import Callable
+
+from redis.exceptions import RedisError
+
+# Errors of Redis calls which jobs can do without, e.g. progress, metrics, rate
+# limits and quotas. NotImplementedError is raised if the cache is not Redis,
+# e.g. in development.
+UNAVAILABLE = (RedisError, NotImplementedError)
+
+
+def run_off_loop(func: Callable):
+    """
+    Call func from the caller's thread, or from the default executor if the
+    caller is a coroutine, the event loop must not wait for Redis.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        func()
+    else:
+        loop.run_in_executor(None, func)
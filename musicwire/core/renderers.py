@@ -0,0 +1,24 @@
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+from musicwire.core import codec
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    Renders responses with the application codec. Indented output, asked by
+    the browsable api or the accept header, is left to the rest framework.
+    """
+    default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super(JSONRenderer, self).render(
+                data, accepted_media_type, renderer_context
+            )
+
+        return codec.dumps(data, default=self.default)
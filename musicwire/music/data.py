@@ -0,0 +1,11 @@
+import json
+import os
+
+# Video titles as uploaders write them, with the artist, name and featured
+# artists they are of.
+YOUTUBE_TITLES_PATH = os.path.join(os.path.dirname(__file__), 'youtube_titles.json')
+
+
+def youtube_titles() -> list:
+    with open(YOUTUBE_TITLES_PATH, encoding='utf-8') as titles:
+        return json.load(titles)
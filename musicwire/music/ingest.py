@@ -0,0 +1,151 @@
+import io
+import logging
+from typing import Callable, Iterable, List, Sequence
+
+from django.conf import settings
+from django.db import connection, models, transaction
+
+from musicwire.core.helpers import run_sync
+
+logger = logging.getLogger(__name__)
+
+
+def copy_value(value) -> str:
+    """
+    Value in COPY text format, tabs and new lines would split the row.
+    """
+    if value is None:
+        return r'\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class BulkWriter:
+    """
+    Write rows of a model given as tuples of field values, without building
+    model instances. Related fields take primary keys, fields which are not
+    given are written with their default, strings longer than their field are
+    cut. Rows are buffered and written every batch_size rows in their own
+    transaction, with COPY on PostgreSQL and with multi-row INSERT elsewhere.
+    Rows are not checked against existing ones, callers leave those out.
+
+    Use it as a context manager, buffered rows are written on exit, also if
+    the pages after them failed.
+    """
+
+    def __init__(self, model, fields: Sequence[str], batch_size: int = None,
+                 use_copy: bool = None):
+        self.model = model
+        self.fields = [model._meta.get_field(name) for name in fields]
+        # Defaults are applied by Django, not the database.
+        default_fields = [field for field in model._meta.concrete_fields
+                          if field not in self.fields and not field.auto_created]
+        self.defaults = tuple(field.get_default() for field in default_fields)
+        self.columns_fields = self.fields + default_fields
+        self.max_lengths = [field.max_length if isinstance(field, models.CharField) else None
+                            for field in self.columns_fields]
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        if use_copy is None:
+            use_copy = connection.vendor == 'postgresql' and settings.INGEST_USE_COPY
+        self.use_copy = use_copy
+        self.rows = []
+        self.callbacks = []
+        self.written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+            return
+
+        # Rows of the completed pages are kept, the error is raised as it is.
+        try:
+            self.flush()
+        except Exception:
+            logger.exception(f"Buffered {self.model.__name__} rows could not be written.")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        # Coroutines write in the default executor, not on the event loop.
+        await run_sync(self.__exit__, exc_type, exc_val, exc_tb)
+
+    @property
+    def table(self) -> str:
+        return connection.ops.quote_name(self.model._meta.db_table)
+
+    @property
+    def columns(self) -> str:
+        return ', '.join(connection.ops.quote_name(field.column)
+                         for field in self.columns_fields)
+
+    def add(self, rows: Iterable[tuple], on_write: Callable = None):
+        """
+        Buffer rows, on_write is called once they are written, e.g. to store
+        the ETag of the page they came from.
+        """
+        self.rows.extend(rows)
+        if on_write is not None:
+            self.callbacks.append(on_write)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        rows, self.rows = self.rows, []
+        callbacks, self.callbacks = self.callbacks, []
+
+        if rows:
+            with transaction.atomic(), connection.cursor() as cursor:
+                if self.use_copy:
+                    self.copy(cursor, rows)
+                else:
+                    self.insert(cursor, rows)
+            self.written += len(rows)
+
+        for callback in callbacks:
+            callback()
+
+    def prepare(self, row: tuple) -> list:
+        values = []
+        for field, max_length, value in zip(self.columns_fields, self.max_lengths,
+                                            row + self.defaults):
+            if max_length and isinstance(value, str):
+                value = value[:max_length]
+            values.append(field.get_db_prep_save(value, connection))
+        return values
+
+    def copy(self, cursor, rows: List[tuple]):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(copy_value(value) for value in self.prepare(row)))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor.copy_expert(f'COPY {self.table} ({self.columns}) FROM STDIN', buffer)
+
+    def insert(self, cursor, rows: List[tuple]):
+        placeholder = f"({', '.join(['%s'] * len(self.columns_fields))})"
+        # Query parameters are limited on some databases, e.g. SQLite.
+        size = max(connection.ops.bulk_batch_size(self.columns_fields, rows), 1)
+        for start in range(0, len(rows), size):
+            chunk = rows[start:start + size]
+            params = [value for row in chunk for value in self.prepare(row)]
+            cursor.execute(
+                f"INSERT INTO {self.table} ({self.columns}) "
+                f"VALUES {', '.join([placeholder] * len(chunk))}",
+                params
+            )
+
+    def instances(self, rows: Iterable[tuple], **related) -> list:
+        """
+        Unsaved instances of rows for callers which return what they wrote,
+        related objects given by name are set on each.
+        """
+        attnames = [field.attname for field in self.fields]
+        objs = [self.model(**dict(zip(attnames, row))) for row in rows]
+        for obj in objs:
+            for name, value in related.items():
+                setattr(obj, name, value)
+        return objs
@@ -0,0 +1,64 @@
+import re
+import timeit
+
+from django.core.management import BaseCommand
+
+from musicwire.music.data import youtube_titles
+from musicwire.music.normalize import channel_artist, parse_title, parse_titles
+
+
+def simplify_track_title(title: str):
+    """
+    Title cleanup YouTube tracks were stored with before the normalize module.
+    """
+    characters_to_remove = "[!()@-]"
+    strings_to_remove = "Official.Video"
+    title = re.sub(characters_to_remove, "", title)
+    title = re.sub(strings_to_remove, "", title)
+    return title
+
+
+class Command(BaseCommand):
+    help = 'Compare title normalization with the old cleanup on the YouTube title corpus.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--copies', type=int, default=250,
+                            help='Copies of the corpus, each with distinct titles.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def best_of(self, fn, repeat):
+        return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+    def handle(self, *args, **options):
+        corpus = youtube_titles()
+        # Numbered copies so the parse cache does not hide the parsing cost.
+        titles = [f"{case['title']} {copy}" if copy else case['title']
+                  for copy in range(options['copies']) for case in corpus]
+        artists = [channel_artist(case['channel'])
+                   for _ in range(options['copies']) for case in corpus]
+        repeat = options['repeat']
+
+        def parse():
+            parse_title.cache_clear()
+            parse_titles(titles, artists)
+
+        old_time = self.best_of(lambda: [simplify_track_title(title) for title in titles],
+                                repeat)
+        new_time = self.best_of(parse, repeat)
+        cached_time = self.best_of(lambda: parse_titles(titles, artists), repeat)
+
+        parsed = [parse_title(case['title'], channel_artist(case['channel']))
+                  for case in corpus]
+        correct = sum((title.artist, title.title, list(title.featured)) ==
+                      (case['artist'], case['name'], case['featured'])
+                      for case, title in zip(corpus, parsed))
+
+        self.stdout.write(f"{len(titles)} titles, corpus of {len(corpus)}")
+        self.stdout.write(f"old cleanup    {old_time * 1000:8.1f} ms  "
+                          f"{len(titles) / old_time:10.0f} titles/s")
+        self.stdout.write(f"normalize      {new_time * 1000:8.1f} ms  "
+                          f"{len(titles) / new_time:10.0f} titles/s")
+        self.stdout.write(f"normalize hit  {cached_time * 1000:8.1f} ms  "
+                          f"{len(titles) / cached_time:10.0f} titles/s")
+        self.stdout.write(f"artist, title and featured right for {correct} of "
+                          f"{len(corpus)} titles")
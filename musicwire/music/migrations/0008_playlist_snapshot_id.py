@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0007_auto_20200826_1238'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlist',
+            name='snapshot_id',
+            field=models.CharField(max_length=128, null=True),
+        ),
+        migrations.AddField(
+            model_name='playlist',
+            name='synced_snapshot_id',
+            field=models.CharField(max_length=128, null=True),
+        ),
+    ]
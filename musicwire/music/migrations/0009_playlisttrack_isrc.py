@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0008_playlist_snapshot_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlisttrack',
+            name='isrc',
+            field=models.CharField(max_length=12, null=True),
+        ),
+    ]
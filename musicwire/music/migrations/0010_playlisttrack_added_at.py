@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0009_playlisttrack_isrc'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlisttrack',
+            name='added_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0010_playlisttrack_added_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlisttrack',
+            name='category',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='playlisttrack',
+            name='duration_ms',
+            field=models.PositiveIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0011_playlisttrack_video_details'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlist',
+            name='synced_added_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
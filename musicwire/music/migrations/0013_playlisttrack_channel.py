@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0012_playlist_synced_added_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlisttrack',
+            name='channel',
+            field=models.CharField(max_length=128, null=True),
+        ),
+    ]
@@ -20,17 +20,39 @@ class Playlist(models.Model):
     provider = models.CharField(max_length=64, choices=Provider.PROVIDERS)
     is_transferred = models.BooleanField(default=False)
     user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, null=True)
+    # Provider's version of the playlist, e.g. Spotify snapshot_id, and the
+    # version whose tracks were crawled completely.
+    snapshot_id = models.CharField(max_length=128, null=True)
+    synced_snapshot_id = models.CharField(max_length=128, null=True)
+    # Newest added_at of saved tracks as of their last complete crawl, older
+    # pages are not crawled again.
+    synced_added_at = models.DateTimeField(null=True)
 
     def __str__(self):
         return self.name
 
+    @property
+    def is_synced(self) -> bool:
+        return bool(self.snapshot_id) and self.snapshot_id == self.synced_snapshot_id
+
 
 class PlaylistTrack(models.Model):
     name = models.CharField(max_length=255)
     artist = models.CharField(max_length=128, null=True)
+    # Featured artists, comma separated, if the title names them.
+    featured = models.CharField(max_length=255, null=True)
     album = models.CharField(max_length=128, null=True)
     playlist = models.ForeignKey(Playlist, on_delete=models.SET_NULL, null=True)
     remote_id = models.CharField(max_length=155)
+    # International Standard Recording Code, same recording on every provider.
+    isrc = models.CharField(max_length=12, null=True)
+    # When the track was added to its playlist or saved, if provider tells.
+    added_at = models.DateTimeField(null=True)
+    duration_ms = models.PositiveIntegerField(null=True)
+    # Category id of the video, only YouTube tracks have one.
+    category = models.CharField(max_length=64, null=True)
+    # Channel which uploaded the video, only YouTube tracks have one.
+    channel = models.CharField(max_length=128, null=True)
     is_transferred = models.BooleanField(default=False)
     provider = models.CharField(max_length=64, choices=Provider.PROVIDERS)
     user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, null=True)
@@ -0,0 +1,124 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+# Words of bracketed parts which describe the upload, not the song, e.g.
+# "(Official Video)", "[HD]", "(Lyrics)". "(Live)" or "(Remix)" are kept.
+NOISE_WORDS = (r'official|video|audio|lyrics?|visuali[sz]er|hd|hq|4k|\d{3,4}p|explicit|'
+               r'clip|m/?v|remaster(?:ed)?|color\s+coded')
+NOISE_RE = re.compile(rf'\b(?:{NOISE_WORDS})\b', re.IGNORECASE)
+BRACKETS_RE = re.compile(r'\s*[(\[【]([^)\]】]*)[)\]】]')
+# Same descriptions at the end of a title without brackets, e.g. "| Official Audio".
+# Each starts with a space or a separator, other positions are skipped quickly.
+TRAILING_NOISE_RE = re.compile(
+    r'(?:(?:\s*[-–—|/]\s*|\s+)(?:official\s+(?:music\s+|lyric\s+)?(?:video|audio)|'
+    r'(?:official\s+)?m/?v|(?:music|lyric)\s+video|lyrics?|visuali[sz]er|audio|hd|hq|4k))+'
+    r'\s*$',
+    re.IGNORECASE
+)
+# Dash between artist and title. Dashes in names, e.g. "Jay-Z", have no spaces.
+SEPARATOR_RE = re.compile(r'\s+[-–—~]+\s*|\s*[-–—~]+\s+')
+# Artist "Title" or Artist 'Title' uploads without a dash.
+QUOTED_TITLE_RE = re.compile(
+    r'^(?P<artist>.+?)\s+["“\'‘](?P<title>[^"”\'’]+)["”\'’](?:\s|$)'
+)
+FEATURED_RE = re.compile(r'\s*[(\[]\s*(?:feat|ft|featuring)\b\.?\s*([^)\]]+)[)\]]'
+                         r'|\s+(?:feat|ft|featuring)\b\.?\s+(.+)$', re.IGNORECASE)
+FEATURED_SPLIT_RE = re.compile(r'\s*(?:,|&)\s*')
+QUOTES = '"\'“”‘’'
+SPACES_RE = re.compile(r'\s+')
+# Channels YouTube generates for artists are "<artist> - Topic", label ones
+# "<artist>VEVO".
+CHANNEL_SUFFIX_RE = re.compile(r'(?:\s+-\s+Topic|VEVO)$')
+# Separators of ISRCs written for humans, e.g. "US-S1Z-99-00001".
+ISRC_SEPARATORS_RE = re.compile(r'[\s-]')
+ISRC_LENGTH = 12
+
+
+@dataclass(frozen=True)
+class TrackTitle:
+    title: str
+    artist: Optional[str] = None
+    featured: Tuple[str, ...] = ()
+
+
+def normalize_isrc(isrc: Optional[str]) -> Optional[str]:
+    """
+    ISRC in its 12 character form, None if it is not one. Providers return
+    some with hyphens, spaces or in lowercase, they would not match exactly.
+    """
+    if not isrc:
+        return None
+    isrc = ISRC_SEPARATORS_RE.sub('', isrc).upper()
+    return isrc if len(isrc) == ISRC_LENGTH and isrc.isalnum() else None
+
+
+def channel_artist(channel: str) -> Optional[str]:
+    """
+    Artist of a music channel, None for other channels. Those are often
+    labels or compilations, not the artist of the song.
+    """
+    if not CHANNEL_SUFFIX_RE.search(channel):
+        return None
+    return CHANNEL_SUFFIX_RE.sub('', channel).strip()
+
+
+def split_featured(text: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Remove featured artists from text and return them separately.
+    """
+    featured = []
+
+    def collect(match):
+        names = match.group(1) or match.group(2)
+        featured.extend(name for name in FEATURED_SPLIT_RE.split(names.strip()) if name)
+        return ''
+
+    return FEATURED_RE.sub(collect, text).strip(), tuple(featured)
+
+
+def strip_noise(text: str) -> str:
+    text = BRACKETS_RE.sub(lambda match: '' if NOISE_RE.search(match.group(1))
+                           else match.group(0), text)
+    return TRAILING_NOISE_RE.sub('', text).strip(' -–—|/~')
+
+
+@lru_cache(maxsize=16384)
+def parse_title(title: str, artist: Optional[str] = None) -> TrackTitle:
+    """
+    Split a video title like "Artist - Title (Official Video) [HD] ft. X" into
+    artist, title and featured artists. Artist, e.g. of the channel, is used
+    if the title does not name one. Same songs are in many playlists, parsed
+    titles are cached.
+    """
+    text = strip_noise(SPACES_RE.sub(' ', title).strip())
+
+    parts = SEPARATOR_RE.split(text, maxsplit=1)
+    if len(parts) == 2 and parts[0] and parts[1]:
+        artist, text = parts
+    else:
+        quoted = QUOTED_TITLE_RE.match(text)
+        if quoted:
+            artist, text = quoted.group('artist'), quoted.group('title')
+
+    text, featured = split_featured(text)
+    if artist:
+        artist, artist_featured = split_featured(artist)
+        featured = artist_featured + featured
+
+    return TrackTitle(
+        title=text.strip(QUOTES + ' ') or title.strip(),
+        artist=artist or None,
+        featured=featured
+    )
+
+
+def parse_titles(titles: Iterable[str],
+                 artists: Iterable[Optional[str]] = None) -> List[TrackTitle]:
+    """
+    Parse titles of a page, artists are the fallback artists of the titles.
+    """
+    titles = list(titles)
+    artists = [None] * len(titles) if artists is None else artists
+    return [parse_title(title, artist) for title, artist in zip(titles, artists)]
@@ -1,20 +1,77 @@
 import abc
 import logging
-from typing import List, Optional
+from contextvars import copy_context
+from typing import Callable, Dict, Iterable, List, Optional, Set
 
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from musicwire.core.exceptions import ProviderResponseError
+from musicwire.core.helpers import gather_limited, run_sync
 from musicwire.music.models import Playlist, PlaylistTrack, SearchErrorTrack
+from musicwire.provider.executors import FairExecutor, get_executor
+from musicwire.provider.progress import ProgressReporter, get_progress
 
 logger = logging.getLogger(__name__)
 
 
+async def gather_searches(adapter, queries: Iterable[str]) -> Dict[str, Optional[dict]]:
+    """
+    Coroutine version of BaseAdapter.search_many for async adapters, at most
+    PROVIDER_ASYNC_MAX_CONNECTIONS searches are awaited at a time.
+    """
+    queries = list(queries)
+    unique = adapter.unique_queries(queries)
+
+    async def search(query):
+        try:
+            return await adapter.search(query)
+        except ProviderResponseError as pre:
+            logger.warning(pre)
+            return pre
+
+    results = await gather_limited(settings.PROVIDER_ASYNC_MAX_CONNECTIONS[adapter.provider],
+                                   [search(query) for query in unique.values()])
+    failed = await run_sync(adapter.store_search_results, unique, results)
+    return {query: adapter.search_result(query, failed) for query in queries}
+
+
+async def gather_matches(adapter, tracks: List[PlaylistTrack]) -> List[Optional[dict]]:
+    """
+    Coroutine version of BaseAdapter.match_tracks for async adapters.
+    """
+    queries = [adapter.track_query(track) for track in tracks]
+    results = await adapter.search_many(queries)
+    return [results[query] for query in queries]
+
+
 class BaseAdapter(metaclass=abc.ABCMeta):
+    provider = None
+    # Track ids a caller should buffer per add_tracks_to_playlist call.
+    add_tracks_batch_size = 50
+    # Daily quota units a track's search and add take, 0 without a quota.
+    track_quota_cost = 0
+
+    @property
+    def executor(self) -> FairExecutor:
+        return get_executor(self.provider)
+
+    @property
+    def executor_key(self):
+        # Calls are queued per user, workers are shared fairly between users.
+        return getattr(self.user, 'pk', None)
+
+    @property
+    def progress(self) -> ProgressReporter:
+        return get_progress(self.executor_key)
 
     @abc.abstractmethod
     def playlists(self):
         raise NotImplemented()
 
     @abc.abstractmethod
-    def playlist_tracks(self, playlist_id: str, paging, limit=50):
+    def playlist_tracks(self, playlist_id: str, paging, limit=None, keep_tracks=True,
+                        skip_synced=False):
         raise NotImplemented()
 
     @abc.abstractmethod
@@ -29,6 +86,119 @@ class BaseAdapter(metaclass=abc.ABCMeta):
     def search(self, search_track: str, search_type: str) -> List[dict]:
         raise NotImplemented()
 
+    def map_concurrently(self, fn: Callable, items: Iterable) -> list:
+        """
+        Call fn with each item on the provider's executor and return results in
+        the order of items. Calls which have not started are cancelled if one
+        raises, e.g. DeadlineExceeded.
+        """
+        # Each call runs in a copy of caller's context to keep its time budget.
+        futures = [self.executor.submit(self.executor_key, copy_context().run, fn, item)
+                   for item in items]
+        try:
+            return [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> List[str]:
+        """
+        Add tracks with a request each for providers without a batch endpoint,
+        on the provider's executor. Returns ids of added tracks, failed ones are
+        logged and left out.
+        """
+        def add(track_id):
+            try:
+                self.add_track_to_playlist(playlist_id, track_id)
+            except ProviderResponseError as pre:
+                logger.warning(pre)
+                return None
+            return track_id
+
+        added = self.map_concurrently(add, track_ids)
+        return [track_id for track_id in added if track_id]
+
+    @staticmethod
+    def track_query(track: PlaylistTrack) -> str:
+        # Artist narrows the search, the name alone matches covers and remixes.
+        return f"{track.artist} {track.name}" if track.artist else track.name
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return ' '.join(query.lower().split())
+
+    @cached_property
+    def search_results(self) -> Dict[str, dict]:
+        # Search results by normalized query. An adapter lives for a job, a song
+        # in many playlists of it is searched once.
+        return {}
+
+    def unique_queries(self, queries: Iterable[str]) -> Dict[str, str]:
+        """
+        Map normalized queries which were not searched before to the first query
+        they were given as.
+        """
+        unique = {}
+        for query in queries:
+            normalized = self.normalize_query(query)
+            if normalized not in self.search_results:
+                unique.setdefault(normalized, query)
+        return unique
+
+    def store_search_results(self, unique: Dict[str, str], results: list) -> Set[str]:
+        """
+        Keep results of searched queries for the job and record the provider
+        errors of the failed ones. Failures are not kept, a later call searches
+        them again. Returns the failed normalized queries.
+        """
+        failed = {normalized for normalized, result in zip(unique, results)
+                  if isinstance(result, ProviderResponseError)}
+        self.search_results.update((normalized, result)
+                                   for normalized, result in zip(unique, results)
+                                   if normalized not in failed)
+        SearchErrorTrack.objects.bulk_create([
+            SearchErrorTrack(name=query[:255], response=str(result), provider=self.provider,
+                             user=self.user)
+            for query, result in zip(unique.values(), results)
+            if isinstance(result, ProviderResponseError)
+        ])
+        self.progress.incr('searches', len(results))
+        self.progress.incr('errors', len(failed))
+        return failed
+
+    def search_result(self, query: str, failed: Set[str]) -> Optional[dict]:
+        normalized = self.normalize_query(query)
+        return None if normalized in failed else self.search_results[normalized]
+
+    def search_many(self, queries: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """
+        Search each distinct query once, concurrently on the provider's executor
+        and under its rate limiter. Returns results of all given queries, ones
+        which found nothing map to an empty dict and ones which failed to None.
+        """
+        queries = list(queries)
+        unique = self.unique_queries(queries)
+
+        def search(query):
+            try:
+                return self.search(query)
+            except ProviderResponseError as pre:
+                logger.warning(pre)
+                return pre
+
+        results = self.map_concurrently(search, unique.values())
+        failed = self.store_search_results(unique, results)
+        return {query: self.search_result(query, failed) for query in queries}
+
+    def match_tracks(self, tracks: List[PlaylistTrack]) -> List[Optional[dict]]:
+        """
+        Find tracks on the provider, results are in the order of tracks, {} for
+        the ones which are not found and None for the ones whose search failed.
+        """
+        queries = [self.track_query(track) for track in tracks]
+        results = self.search_many(queries)
+        return [results[query] for query in queries]
+
     @staticmethod
     def get_db_playlist(playlist_id: str, user: object) -> Optional[object]:
         try:
@@ -1,12 +1,25 @@
+import asyncio
+import itertools
 import logging
-from concurrent.futures import as_completed
-from concurrent.futures.thread import ThreadPoolExecutor
-from typing import Callable, Iterable, List, Optional
-
-from musicwire.core.exceptions import ProviderResponseError, ValidationError
+import math
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextvars import copy_context
+from datetime import datetime
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from musicwire.core.exceptions import ProviderResponseError
+from musicwire.core.helpers import gather_limited, iterate_from_loop, run_sync
+from musicwire.music.ingest import BulkWriter
 from musicwire.music.models import CreatedPlaylist, Playlist, PlaylistTrack
-from musicwire.provider.adapters.base import BaseAdapter
-from musicwire.provider.clients.spotify import Client
+from musicwire.music.normalize import normalize_isrc
+from musicwire.provider.adapters.base import BaseAdapter, gather_matches, gather_searches
+from musicwire.provider.capabilities import get_capability, page_size
+from musicwire.provider.clients.spotify import AsyncClient, Client
 from musicwire.provider.datastructures import ClientResult
 from musicwire.provider.models import Provider
 
@@ -14,16 +27,24 @@ logger = logging.getLogger(__name__)
 
 
 class Adapter(BaseAdapter):
-    _executor = ThreadPoolExecutor(max_workers=4)
+    # Pages requested ahead of the consumer. Twice the workers keeps the pool
+    # busy while a finished page is written to the database.
+    max_in_flight = settings.PROVIDER_MAX_WORKERS[Provider.SPOTIFY] * 2
     saved_tracks_id = "spotify_saved_tracks"
+    provider = Provider.SPOTIFY
+    # Max uris of a single add tracks request.
+    add_tracks_batch_size = get_capability(
+        Provider.SPOTIFY, 'POST', 'playlists/{id}/tracks'
+    ).max_batch_size
 
     def __init__(self, token, user):
         req_data = {
-            'base_url': "https://api.spotify.com/v1/",
+            'base_url': settings.PROVIDER_BASE_URLS[Provider.SPOTIFY],
             'token': token,
         }
         self.spotify_client = Client(**req_data)
         self.user = user
+        self.spotify_user_id = None
 
     @staticmethod
     def validate_response(response: ClientResult):
@@ -31,37 +52,66 @@ class Adapter(BaseAdapter):
             raise ProviderResponseError(response.error_msg)
         return response.result
 
+    def changed_pages(self, responses: Iterable[ClientResult]) -> Iterator[ClientResult]:
+        """
+        Validate pages and drop the ones provider answered as not modified, they
+        were ingested before. Every page counts as done for progress.
+        """
+        for response in responses:
+            self.progress.incr('pages_done')
+            self.validate_response(response)
+            if not response.not_modified:
+                yield response
+
+    def store_validator(self, response: ClientResult) -> Callable:
+        """
+        Callback of the writer which stores ETag of the page once its rows are
+        written.
+        """
+        return partial(self.spotify_client.validators.store, response)
+
     @staticmethod
     def status_control(playlist_data):
         return "public" if playlist_data['public'] else "private"
 
-    def collect_concurrently(
-            self, fn: Callable, collection: Iterable, title=None
-    ) -> List:
+    def collect_concurrently(self, fn: Callable, collection: Iterable) -> Iterator:
         """
-        Maps each elements of a collection with a function and processes
-        the calls concurrently.
+        Maps each elements of a collection with a function, processes the calls
+        concurrently and yields results as they complete. At most max_in_flight
+        calls are submitted ahead, so results never pile up in memory while the
+        consumer is busy.
         """
-        results = []
-        waiting_task = [self._executor.submit(fn, product) for product in collection]
-
-        total = len(collection)
-        for i, future in enumerate(as_completed(waiting_task), start=1):
-            result = future.result()
-            results.append(result)
-            percentage = int(i / total * 100)
-            print(f"{title}:{i:3}/{total} {percentage}%", end="\r")
-        return results
+        collection = iter(collection)
+        pending = set()
+        try:
+            while True:
+                for product in itertools.islice(collection,
+                                                self.max_in_flight - len(pending)):
+                    # Each call runs in a copy of caller's context to keep its
+                    # time budget.
+                    pending.add(self.executor.submit(
+                        self.executor_key, copy_context().run, fn, product
+                    ))
+                if not pending:
+                    return
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            # Consumer stopped early, e.g. DeadlineExceeded or a database error.
+            for future in pending:
+                future.cancel()
 
     def collector(
-            self, fn: Callable, limit: int, offset: int, **kwargs
-    ) -> list:
+            self, fn: Callable, end_point: str, limit: Optional[int], offset: int, **kwargs
+    ) -> Iterator[ClientResult]:
         """
-        Iterate through all pages and return list of results.
+        Iterate through all pages of end_point and yield them as they arrive.
+        Pages are as large as the endpoint allows unless limit is given. First
+        page is fetched right away for the total and yielded first.
         """
-        if limit > 50:
-            # Spotify limit for response count.
-            raise ValidationError('Invalid limit. Max limit is 50.')
+        limit = page_size(self.provider, end_point, limit)
 
         request_data = {
             "limit": limit,
@@ -69,86 +119,196 @@ class Adapter(BaseAdapter):
             **kwargs
         }
 
-        response = fn(request_data=request_data)
-        # TODO: Might concatenate this response with thread responses to avoid
-        #  redundant request
-        response = self.validate_response(response)
+        first_page = fn(request_data=dict(request_data))
+        # A not modified first page still carries the stored total.
+        response = self.validate_response(first_page)
+
+        total_pages = math.ceil(max(response.get('total') - offset, 0) / limit)
+        self.progress.incr('pages_total', max(total_pages, 1))
 
-        total_pages = int(response.get('total') / limit) + 1
+        request_data = ({'limit': limit, 'offset': offset + limit * page, **kwargs}
+                        for page in range(1, total_pages))
 
-        request_data = [{'limit': limit, 'offset': offset + limit * page, **kwargs}
-                        for page in range(total_pages)]
+        return itertools.chain([first_page], self.collect_concurrently(fn, request_data))
 
-        return self.collect_concurrently(fn, request_data, fn.__name__)
+    # Fields of rows get_tracks and save_playlists write.
+    track_fields = ('name', 'artist', 'remote_id', 'album', 'isrc', 'added_at', 'playlist',
+                    'provider', 'user')
+    playlist_fields = ('name', 'status', 'remote_id', 'content', 'provider', 'snapshot_id',
+                       'user')
 
-    def get_tracks(self, tracks: List[dict], playlist_id: str) -> List[object]:
+    def get_tracks(
+            self, tracks: Iterable[ClientResult], playlist_id: str, keep_tracks=True
+    ) -> List[object]:
+        """
+        Write each page of tracks as it arrives. Returns created tracks per page,
+        an empty list if keep_tracks is False so long crawls hold no pages.
+        """
         finished_tracks = []
 
         playlist = self.get_db_playlist(playlist_id=playlist_id, user=self.user)
-        db_tracks = self.get_db_tracks(user=self.user)
-
-        for item in tracks:
-            objs = [PlaylistTrack(
-                name=track['track']['name'],
-                artist=track['track']['artists'][0]['name'],
-                remote_id=track['track']['uri'],
-                album=track['track']['album']['name'],
-                playlist=playlist,
-                provider=Provider.SPOTIFY,
-                user=self.user
-            ) for track in item['items'] if track['track']['uri'] not in db_tracks]
-            PlaylistTrack.objects.bulk_create(objs)
-            finished_tracks.append(objs)
+        playlist_pk = playlist.pk if playlist else None
+        db_tracks = set(self.get_db_tracks(user=self.user))
+
+        with BulkWriter(PlaylistTrack, self.track_fields) as writer:
+            for response in tracks:
+                item = response.result
+                rows = [(
+                    track['track']['name'],
+                    track['track']['artists'][0]['name'],
+                    track['track']['uri'],
+                    track['track']['album']['name'],
+                    normalize_isrc(track['track'].get('external_ids', {}).get('isrc')),
+                    parse_datetime(track['added_at']) if track.get('added_at') else None,
+                    playlist_pk,
+                    Provider.SPOTIFY,
+                    self.user.pk
+                ) for track in item['items'] if track['track']['uri'] not in db_tracks]
+                writer.add(rows, on_write=self.store_validator(response))
+                self.progress.incr('tracks_ingested', len(rows))
+                db_tracks.update(row[2] for row in rows)
+                if keep_tracks:
+                    finished_tracks.append(writer.instances(rows, playlist=playlist,
+                                                            user=self.user))
 
         return finished_tracks
 
-    def saved_tracks(self, playlist_id: str, limit=50, offset=0) -> Optional[List]:
+    @staticmethod
+    def newest_added_at(response: ClientResult) -> Optional[datetime]:
         """
-        Get saved tracks of user.
+        Newest added_at of a saved tracks page, None if it has no new items.
         """
-        tracks = []
-        responses: list = self.collector(self.spotify_client.get_saved_tracks, limit, offset)
-
-        for response in responses:
-            tracks.append(self.validate_response(response))
+        if response.not_modified or response.error:
+            return None
+        return max((parse_datetime(item['added_at']) for item in response.result['items']
+                    if item.get('added_at')), default=None)
 
-        return self.get_tracks(tracks=tracks, playlist_id=playlist_id)
+    @staticmethod
+    def mark_saved_tracks_synced(playlist: Optional[Playlist], newest: Optional[datetime]):
+        """
+        Saved tracks up to newest are crawled completely, later crawls stop at
+        the page which reaches it.
+        """
+        if playlist is not None and newest is not None:
+            Playlist.objects.filter(pk=playlist.pk).update(synced_added_at=newest)
 
-    def playlists(self, limit=50, offset=0) -> list:
+    @staticmethod
+    def reached_cursor(response: ClientResult, cursor: datetime, limit: int,
+                       offset: int) -> bool:
         """
-        Get playlists of user.
+        Whether pages after this one are ingested already. Saved tracks are
+        ordered by added_at descending, an unchanged page has nothing new after
+        it. Tracks added at the cursor are ingested again, several tracks can be
+        added at the same second.
         """
-        objs, playlists = [], []
+        if response.not_modified or response.error:
+            return True
+        result = response.result
+        return offset + limit >= result['total'] or any(
+            parse_datetime(item['added_at']) <= cursor for item in result['items']
+        )
 
-        responses: list = self.collector(self.spotify_client.get_playlists, limit, offset)
+    def pages_since(self, cursor: datetime, limit: int, offset: int) -> Iterator[ClientResult]:
+        """
+        Fetch saved tracks pages one by one until one reaches the cursor.
+        """
+        while True:
+            response = self.spotify_client.get_saved_tracks(
+                request_data={'limit': limit, 'offset': offset}
+            )
+            self.progress.incr('pages_total')
+            yield response
+            if self.reached_cursor(response, cursor, limit, offset):
+                return
+            offset += limit
+
+    def saved_tracks(
+            self, playlist_id: str, limit=None, offset=0, keep_tracks=True
+    ) -> Optional[List]:
+        """
+        Get saved tracks of user. Once a crawl of them completed, only pages
+        newer than the newest track it saw are fetched, usually just the first
+        one. Tracks are crawled completely again until one completes.
+        """
+        limit = page_size(self.provider, 'me/tracks', limit)
+        playlist = self.get_db_playlist(playlist_id=playlist_id, user=self.user)
+        cursor = playlist.synced_added_at if playlist else None
+        if cursor is None:
+            responses = self.collector(self.spotify_client.get_saved_tracks, 'me/tracks',
+                                       limit, offset)
+        else:
+            responses = self.pages_since(cursor, limit, offset)
+
+        # Newest tracks are on the first page.
+        responses = iter(responses)
+        first_page = next(responses)
+        tracks = self.changed_pages(itertools.chain([first_page], responses))
+
+        finished_tracks = self.get_tracks(tracks=tracks, playlist_id=playlist_id,
+                                          keep_tracks=keep_tracks)
+        if offset == 0:
+            self.mark_saved_tracks_synced(playlist, self.newest_added_at(first_page))
 
-        for response in responses:
-            playlists.append(self.validate_response(response))
+        return finished_tracks
 
-        db_playlist = self.get_db_playlists(self.user)
+    def save_playlists(self, playlists: Iterable[ClientResult]) -> list:
+        """
+        Create new playlists of each page and store new snapshot ids of known
+        ones, tracks of those are crawled again.
+        """
+        objs = []
+        db_playlist = set(self.get_db_playlists(self.user))
+        snapshots = dict(Playlist.objects.filter(
+            user=self.user, provider=Provider.SPOTIFY
+        ).values_list('remote_id', 'snapshot_id'))
+
+        with BulkWriter(Playlist, self.playlist_fields) as writer:
+            for response in playlists:
+                item = response.result
+                rows = [(
+                    playlist['name'],
+                    self.status_control(playlist),
+                    playlist['id'],
+                    None,
+                    Provider.SPOTIFY,
+                    playlist.get('snapshot_id'),
+                    self.user.pk
+                ) for playlist in item['items'] if playlist['id'] not in db_playlist]
+                writer.add(rows, on_write=self.store_validator(response))
+                db_playlist.update(row[2] for row in rows)
+                objs.extend(writer.instances(rows, user=self.user))
+
+                for playlist in item['items']:
+                    snapshot_id = playlist.get('snapshot_id')
+                    if (playlist['id'] in snapshots
+                            and snapshots[playlist['id']] != snapshot_id):
+                        Playlist.objects.filter(
+                            user=self.user, remote_id=playlist['id']
+                        ).update(snapshot_id=snapshot_id)
 
-        # TODO: check if first loop necessary
-        for item in playlists:
-            objs = [Playlist(
-                name=playlist['name'],
-                status=self.status_control(playlist),
-                remote_id=playlist['id'],
-                content=None,
-                provider=Provider.SPOTIFY,
-                user=self.user
-            ) for playlist in item['items'] if playlist['id'] not in db_playlist]
+        return objs
 
-        Playlist.objects.bulk_create(objs)
+    def playlists(self, limit=None, offset=0) -> list:
+        """
+        Get playlists of user.
+        """
+        responses = self.collector(self.spotify_client.get_playlists, 'me/playlists',
+                                   limit, offset)
+        playlists = self.changed_pages(responses)
 
-        return objs
+        return self.save_playlists(playlists)
 
-    def albums(self, limit=50, offset=0) -> Optional[List]:
+    def albums(self, limit=None, offset=0) -> Optional[List]:
         """
         Get albums of user.
         """
-        user_albums, albums = [], []
+        responses = self.collector(self.spotify_client.get_albums, 'me/albums', limit,
+                                   offset)
 
-        responses = self.collector(self.spotify_client.get_albums, limit, offset)
+        return self.parse_albums(responses)
+
+    def parse_albums(self, responses: Iterable[ClientResult]) -> List[dict]:
+        user_albums, albums = [], []
 
         for response in responses:
             albums.append(self.validate_response(response))
@@ -163,36 +323,75 @@ class Adapter(BaseAdapter):
                 user_albums.append(album_data)
         return user_albums
 
-    def playlist_tracks(self, playlist_id: str, limit=50, paging=0) -> Optional[List]:
+    # Fields of the tracks which get_tracks reads. Only playlist endpoints of
+    # Spotify accept fields, me/tracks and me/playlists return full objects.
+    playlist_tracks_fields = (
+        'total,items(added_at,track(name,uri,artists(name),album(name),external_ids(isrc)))'
+    )
+
+    @staticmethod
+    def mark_synced(playlist: Optional[Playlist]):
+        """
+        Tracks of the playlist's snapshot are crawled completely, they are not
+        crawled again until playlists() stores a new snapshot.
+        """
+        if playlist is not None:
+            Playlist.objects.filter(pk=playlist.pk).update(
+                synced_snapshot_id=playlist.snapshot_id
+            )
+
+    def playlist_tracks(
+            self, playlist_id: str, limit=None, paging=0, keep_tracks=True, skip_synced=False
+    ) -> Optional[List]:
         """
-        Get a playlist's tracks.
+        Get a playlist's tracks. If skip_synced, nothing is requested and
+        returned for a playlist which did not change since its last complete
+        crawl, e.g. when a crawl only writes tracks.
         """
-        tracks = []
-        data = {'playlist_id': playlist_id}
+        playlist = self.get_db_playlist(playlist_id=playlist_id, user=self.user)
+        if skip_synced and playlist is not None and playlist.is_synced:
+            return []
+
+        data = {'playlist_id': playlist_id, 'fields': self.playlist_tracks_fields}
 
         responses = self.collector(self.spotify_client.get_playlist_tracks,
-                                   limit, paging, **data)
+                                   f'playlists/{playlist_id}/tracks', limit, paging, **data)
+        tracks = self.changed_pages(responses)
 
-        for response in responses:
-            tracks.append(self.validate_response(response))
+        finished_tracks = self.get_tracks(tracks=tracks, playlist_id=playlist_id,
+                                          keep_tracks=keep_tracks)
+        self.mark_synced(playlist)
 
-        return self.get_tracks(tracks=tracks, playlist_id=playlist_id)
+        return finished_tracks
+
+    def current_user_id(self) -> str:
+        # Id of the token's user does not change, it is requested once.
+        if self.spotify_user_id is None:
+            response = self.spotify_client.get_current_user()
+            self.spotify_user_id = self.validate_response(response)['id']
+        return self.spotify_user_id
 
     def create_playlist(self, playlist_data: dict) -> dict:
         """
         Post a new playlist in user account.
         """
-        user_id = playlist_data.pop('user_id')
+        user_id = playlist_data.pop('user_id', None) or self.current_user_id()
 
-        request_data = {
+        response = self.spotify_client.create_a_playlist(
+            user_id, self.create_playlist_request_data(playlist_data)
+        )
+
+        return self.save_created_playlist(self.validate_response(response))
+
+    @staticmethod
+    def create_playlist_request_data(playlist_data: dict) -> dict:
+        return {
             "name": playlist_data['playlist_name'],
             "public": playlist_data.get('privacy_status'),
             "description": playlist_data.get('description')
         }
 
-        response = self.spotify_client.create_a_playlist(user_id, request_data)
-        playlist_data = self.validate_response(response)
-
+    def save_created_playlist(self, playlist_data: dict) -> dict:
         created_playlist = {
             "name": playlist_data['name'],
             "status": self.status_control(playlist_data),
@@ -217,6 +416,28 @@ class Adapter(BaseAdapter):
 
         return response
 
+    def track_chunks(self, track_ids: List[str]) -> Iterator[List[str]]:
+        for start in range(0, len(track_ids), self.add_tracks_batch_size):
+            yield track_ids[start:start + self.add_tracks_batch_size]
+
+    def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> List[str]:
+        """
+        Post tracks to given playlist, 100 uris per request. Returns uris which
+        were added, tracks of a failed request are logged and left out.
+        """
+        added = []
+        for chunk in self.track_chunks(track_ids):
+            response = self.spotify_client.add_tracks_to_playlist(
+                playlist_id, {'uris': chunk}
+            )
+            if response.error:
+                logger.warning(f"{len(chunk)} tracks could not be added to "
+                               f"{playlist_id}: {response.error_msg}")
+                continue
+            added.extend(chunk)
+
+        return added
+
     def upload_playlist_cover_image(self):
         raise NotImplemented()
 
@@ -227,12 +448,17 @@ class Adapter(BaseAdapter):
         """
         params = {
             'type': search_type,
-            'q': search_track
+            'q': search_track,
+            # Only the first item is used.
+            'limit': 1
         }
 
         response = self.spotify_client.search(params=params)
         search_result = self.validate_response(response)
 
+        return self.parse_search(search_track, search_result)
+
+    def parse_search(self, search_track: str, search_result: dict) -> dict:
         # Spotify returns first dict key as album or track or artist which depends on
         # search request. This dict_key can be taken from request data but ...
         dict_key, *_ = search_result
@@ -243,7 +469,7 @@ class Adapter(BaseAdapter):
                 'name': search_result[dict_key]['items'][0]['name'],
                 'type': search_result[dict_key]['items'][0]['type'],
             }
-        except (KeyError, TypeError):
+        except (KeyError, TypeError, IndexError):
             search_response = {}
             self.create_search_error(
                 search_track=search_track,
@@ -253,3 +479,271 @@ class Adapter(BaseAdapter):
             )
 
         return search_response
+
+    @staticmethod
+    def isrc_search_params(isrc: str) -> dict:
+        return {'type': 'track', 'q': f'isrc:{isrc}', 'limit': 1}
+
+    def parse_isrc_search(self, response: ClientResult) -> dict:
+        """
+        A miss is not a search error, callers fall back to search by name.
+        """
+        try:
+            item = self.validate_response(response)['tracks']['items'][0]
+        except (ProviderResponseError, KeyError, TypeError, IndexError):
+            return {}
+        return {'id': item['uri'], 'name': item['name'], 'type': item['type']}
+
+    def search_isrc(self, isrc: str) -> dict:
+        """
+        Exact match of a recording by its ISRC, {} if Spotify does not have it.
+        """
+        response = self.spotify_client.search(params=self.isrc_search_params(isrc))
+        return self.parse_isrc_search(response)
+
+    @cached_property
+    def isrc_results(self) -> Dict[str, dict]:
+        return {}
+
+    def match_tracks(self, tracks: List[PlaylistTrack]) -> List[dict]:
+        """
+        Tracks with an ISRC are matched exactly first. The others and ones whose
+        ISRC is unknown to Spotify fall back to search by name.
+        """
+        isrcs = list({track.isrc for track in tracks if track.isrc} - self.isrc_results.keys())
+        self.isrc_results.update(zip(isrcs, self.map_concurrently(self.search_isrc, isrcs)))
+        self.progress.incr('searches', len(isrcs))
+
+        matches = [self.isrc_results.get(track.isrc) or {} for track in tracks]
+        unmatched = [track for track, match in zip(tracks, matches) if not match]
+        fallback = iter(super().match_tracks(unmatched))
+        return [match or next(fallback) for match in matches]
+
+
+class AsyncAdapter(Adapter):
+    """
+    Coroutine version of the adapter. Pages and requests of many users share
+    one event loop instead of the threads of the executor, database writes run
+    in the loop's default executor.
+    """
+
+    def __init__(self, token, user):
+        super(AsyncAdapter, self).__init__(token=token, user=user)
+        self.spotify_client = AsyncClient(
+            base_url=self.spotify_client.base_url, token=token
+        )
+
+    async def collector(
+            self, fn: Callable, end_point: str, limit: Optional[int], offset: int, **kwargs
+    ) -> AsyncIterator[ClientResult]:
+        """
+        Iterate through all pages of end_point and yield them as they arrive.
+        At most PROVIDER_ASYNC_MAX_CONNECTIONS pages are requested ahead of the
+        consumer, so pages do not pile up while it writes.
+        """
+        limit = page_size(self.provider, end_point, limit)
+
+        request_data = {
+            "limit": limit,
+            "offset": offset,
+            **kwargs
+        }
+
+        first_page = await fn(request_data=dict(request_data))
+        response = self.validate_response(first_page)
+
+        total_pages = math.ceil(max(response.get('total') - offset, 0) / limit)
+        self.progress.incr('pages_total', max(total_pages, 1))
+        yield first_page
+
+        request_data = ({'limit': limit, 'offset': offset + limit * page, **kwargs}
+                        for page in range(1, total_pages))
+        max_in_flight = settings.PROVIDER_ASYNC_MAX_CONNECTIONS[self.provider]
+        pending = set()
+        try:
+            while True:
+                for data in itertools.islice(request_data, max_in_flight - len(pending)):
+                    pending.add(asyncio.ensure_future(fn(request_data=data)))
+                if not pending:
+                    return
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def write_pages(self, write: Callable, responses: AsyncIterator[ClientResult],
+                          *args, first_pages: Iterable[ClientResult] = ()):
+        """
+        Call write with the changed pages in the default executor, it writes
+        every page as it arrives while the loop requests the next ones.
+        """
+        pages = itertools.chain(first_pages,
+                                iterate_from_loop(responses, asyncio.get_running_loop()))
+        try:
+            return await run_sync(write, self.changed_pages(pages), *args)
+        finally:
+            await responses.aclose()
+
+    async def saved_tracks(self, playlist_id: str, limit=None, offset=0,
+                           keep_tracks=True) -> Optional[List]:
+        """
+        Get saved tracks of user, see Adapter.saved_tracks.
+        """
+        limit = page_size(self.provider, 'me/tracks', limit)
+        playlist = await run_sync(self.get_db_playlist, playlist_id, self.user)
+        cursor = playlist.synced_added_at if playlist else None
+        if cursor is None:
+            responses = self.collector(self.spotify_client.get_saved_tracks,
+                                       'me/tracks', limit, offset)
+        else:
+            responses = self.pages_since(cursor, limit, offset)
+
+        # Newest tracks are on the first page.
+        first_page = await responses.__anext__()
+        finished_tracks = await self.write_pages(self.get_tracks, responses, playlist_id,
+                                                 keep_tracks, first_pages=[first_page])
+        if offset == 0:
+            await run_sync(self.mark_saved_tracks_synced, playlist,
+                           self.newest_added_at(first_page))
+
+        return finished_tracks
+
+    async def pages_since(self, cursor: datetime, limit: int,
+                          offset: int) -> AsyncIterator[ClientResult]:
+        while True:
+            response = await self.spotify_client.get_saved_tracks(
+                request_data={'limit': limit, 'offset': offset}
+            )
+            self.progress.incr('pages_total')
+            yield response
+            if self.reached_cursor(response, cursor, limit, offset):
+                return
+            offset += limit
+
+    async def playlists(self, limit=None, offset=0) -> list:
+        """
+        Get playlists of user.
+        """
+        responses = self.collector(self.spotify_client.get_playlists, 'me/playlists',
+                                   limit, offset)
+
+        return await self.write_pages(self.save_playlists, responses)
+
+    async def playlist_tracks(self, playlist_id: str, limit=None, paging=0,
+                              keep_tracks=True, skip_synced=False) -> Optional[List]:
+        """
+        Get a playlist's tracks, see Adapter.playlist_tracks.
+        """
+        playlist = await run_sync(self.get_db_playlist, playlist_id, self.user)
+        if skip_synced and playlist is not None and playlist.is_synced:
+            return []
+
+        data = {'playlist_id': playlist_id, 'fields': self.playlist_tracks_fields}
+
+        responses = self.collector(self.spotify_client.get_playlist_tracks,
+                                   f'playlists/{playlist_id}/tracks', limit, paging, **data)
+        finished_tracks = await self.write_pages(self.get_tracks, responses, playlist_id,
+                                                 keep_tracks)
+        await run_sync(self.mark_synced, playlist)
+
+        return finished_tracks
+
+    async def albums(self, limit=None, offset=0) -> Optional[List]:
+        """
+        Get albums of user.
+        """
+        responses = [response async for response in self.collector(
+            self.spotify_client.get_albums, 'me/albums', limit, offset
+        )]
+
+        return self.parse_albums(responses)
+
+    async def current_user_id(self) -> str:
+        if self.spotify_user_id is None:
+            response = await self.spotify_client.get_current_user()
+            self.spotify_user_id = self.validate_response(response)['id']
+        return self.spotify_user_id
+
+    async def create_playlist(self, playlist_data: dict) -> dict:
+        """
+        Post a new playlist in user account.
+        """
+        user_id = playlist_data.pop('user_id', None) or await self.current_user_id()
+
+        response = await self.spotify_client.create_a_playlist(
+            user_id, self.create_playlist_request_data(playlist_data)
+        )
+
+        return await run_sync(self.save_created_playlist, self.validate_response(response))
+
+    async def add_track_to_playlist(self, playlist_id: str, track_id: str):
+        """
+        Post tracks to given playlist.
+        """
+        request_data = {'uris': [track_id]}
+        response = await self.spotify_client.add_tracks_to_playlist(
+            playlist_id, request_data
+        )
+        self.validate_response(response)
+
+        return response
+
+    async def add_tracks_to_playlist(self, playlist_id: str,
+                                     track_ids: List[str]) -> List[str]:
+        """
+        Post tracks to given playlist, 100 uris per request. Chunks are sent in
+        order, Spotify appends each to the end of the playlist.
+        """
+        added = []
+        for chunk in self.track_chunks(track_ids):
+            response = await self.spotify_client.add_tracks_to_playlist(
+                playlist_id, {'uris': chunk}
+            )
+            if response.error:
+                logger.warning(f"{len(chunk)} tracks could not be added to "
+                               f"{playlist_id}: {response.error_msg}")
+                continue
+            added.extend(chunk)
+
+        return added
+
+    async def search(self, search_track: str, search_type: str = 'track') -> dict:
+        """
+        Search an album, track, artist in spotify to find track to later use in add
+        playlist.
+        """
+        params = {
+            'type': search_type,
+            'q': search_track,
+            # Only the first item is used.
+            'limit': 1
+        }
+
+        response = await self.spotify_client.search(params=params)
+        search_result = self.validate_response(response)
+
+        return await run_sync(self.parse_search, search_track, search_result)
+
+    async def search_many(self, queries: Iterable[str]) -> Dict[str, dict]:
+        return await gather_searches(self, queries)
+
+    async def search_isrc(self, isrc: str) -> dict:
+        response = await self.spotify_client.search(params=self.isrc_search_params(isrc))
+        return self.parse_isrc_search(response)
+
+    async def match_tracks(self, tracks: List[PlaylistTrack]) -> List[dict]:
+        isrcs = list({track.isrc for track in tracks if track.isrc} - self.isrc_results.keys())
+        results = await gather_limited(
+            settings.PROVIDER_ASYNC_MAX_CONNECTIONS[self.provider],
+            [self.search_isrc(isrc) for isrc in isrcs]
+        )
+        self.isrc_results.update(zip(isrcs, results))
+        self.progress.incr('searches', len(isrcs))
+
+        unmatched = [track for track in tracks
+                     if not self.isrc_results.get(track.isrc)]
+        fallback = dict(zip(unmatched, await gather_matches(self, unmatched)))
+        return [self.isrc_results.get(track.isrc) or fallback[track] for track in tracks]
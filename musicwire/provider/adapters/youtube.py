@@ -1,34 +1,53 @@
 import logging
+import math
 import re
-from typing import List
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from django.conf import settings
 
 from musicwire.core.exceptions import ProviderResponseError
+from musicwire.core.helpers import gather_limited, run_sync
+from musicwire.music.ingest import BulkWriter
 from musicwire.music.models import CreatedPlaylist, Playlist, PlaylistTrack
-from musicwire.provider.adapters.base import BaseAdapter
-from musicwire.provider.clients.youtube import Client
+from musicwire.music.normalize import channel_artist, parse_titles
+from musicwire.provider.adapters.base import BaseAdapter, gather_matches, gather_searches
+from musicwire.provider.capabilities import get_capability, page_size
+from musicwire.provider.clients.youtube import AsyncClient, Client
 from musicwire.provider.datastructures import ClientResult
 from musicwire.provider.models import Provider
+from musicwire.provider.paging import next_page_token, prefetch_pages
 
 logger = logging.getLogger(__name__)
 
+# ISO 8601 duration of videos.list, e.g. PT1H2M3S.
+DURATION_RE = re.compile(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
 
 class Adapter(BaseAdapter):
+    provider = Provider.YOUTUBE
+    # Transferring a track takes a search and an insert.
+    track_quota_cost = (get_capability(Provider.YOUTUBE, 'GET', 'search').cost +
+                        get_capability(Provider.YOUTUBE, 'POST', 'playlistItems').cost)
+
     def __init__(self, token, user):
         req_data = {
-            'base_url': "https://www.googleapis.com/youtube/v3/",
+            'base_url': settings.PROVIDER_BASE_URLS[Provider.YOUTUBE],
             "token": token
         }
         self.youtube_client = Client(**req_data)
-        self.part = 'snippet, status, contentDetails'
         self.user = user
 
     @staticmethod
-    def simplify_track_title(title: str):
-        characters_to_remove = "[!()@-]"
-        strings_to_remove = "Official.Video"
-        title = re.sub(characters_to_remove, "", title)
-        title = re.sub(strings_to_remove, "", title)
-        return title
+    def parse_duration(duration: str):
+        """
+        Milliseconds of an ISO 8601 duration, None if it is not one.
+        """
+        match = DURATION_RE.match(duration or '')
+        if not match:
+            return None
+        days, hours, minutes, seconds = (int(value or 0) for value in match.groups())
+        return (((days * 24 + hours) * 60 + minutes) * 60 + seconds) * 1000
 
     @staticmethod
     def validate_response(response: ClientResult):
@@ -36,74 +55,235 @@ class Adapter(BaseAdapter):
             raise ProviderResponseError(response.error_msg)
         return response.result
 
-    def playlists(self):
+    # Fields of rows save_playlists and save_tracks write.
+    playlist_fields = ('name', 'status', 'remote_id', 'content', 'provider', 'user')
+    track_fields = ('name', 'artist', 'featured', 'remote_id', 'album', 'duration_ms',
+                    'category', 'channel', 'playlist', 'provider', 'user')
+
+    def save_playlists(self, writer: BulkWriter, playlists: dict, db_playlist: set,
+                       on_write: Callable = None) -> list:
+        """
+        Add rows of a page to writer and return them, on_write is called once
+        they are written.
+        """
+        rows = [(
+            playlist['snippet']['title'],
+            playlist['status']['privacyStatus'],
+            playlist['id'],
+            playlist['contentDetails']['itemCount'],
+            Provider.YOUTUBE,
+            self.user.pk
+        ) for playlist in playlists['items'] if playlist['id'] not in db_playlist]
+        writer.add(rows, on_write=on_write)
+        db_playlist.update(row[2] for row in rows)
+
+        return rows
+
+    @staticmethod
+    def video_id(track: dict) -> str:
+        return track["snippet"]["resourceId"]["videoId"]
+
+    def video_ids(self, tracks: dict, db_tracks: set) -> List[str]:
+        """
+        Videos of a page which save_tracks writes, the ones not stored yet.
+        """
+        return [self.video_id(track) for track in tracks['items']
+                if self.video_id(track) not in db_tracks]
+
+    def save_tracks(self, writer: BulkWriter, tracks: dict, playlist, db_tracks: set,
+                    videos: Dict[str, dict] = None, on_write: Callable = None) -> list:
+        """
+        Add rows of a page to writer and return them, on_write is called once
+        they are written. Artist, title and featured artists are
+        parsed from the video title, artist of a music channel is used if the
+        title has none. Duration, category and channel are taken from videos,
+        they are left empty for the videos which are not in it.
+        """
+        videos = videos or {}
+        items = [track for track in tracks['items'] if self.video_id(track) not in db_tracks]
+        details = [videos.get(self.video_id(track), {}) for track in items]
+        titles = parse_titles((track['snippet']['title'] for track in items),
+                              (video.get('artist') for video in details))
+
+        rows = [(
+            title.title,
+            title.artist,
+            ', '.join(title.featured) or None,
+            self.video_id(track),
+            None,
+            video.get('duration_ms'),
+            video.get('category'),
+            video.get('channel'),
+            playlist.pk if playlist else None,
+            Provider.YOUTUBE,
+            self.user.pk
+        ) for track, video, title in zip(items, details, titles)]
+        writer.add(rows, on_write=on_write)
+        db_tracks.update(self.video_id(track) for track in items)
+        self.progress.incr('tracks_ingested', len(rows))
+
+        return rows
+
+    # Parts and fields of the responses which methods below read.
+    playlists_projection = {
+        'part': 'snippet,status,contentDetails',
+        'fields': 'nextPageToken,pageInfo/totalResults,items(id,snippet/title,'
+                  'status/privacyStatus,contentDetails/itemCount)',
+    }
+
+    def changed_pages(self, responses: Iterable[ClientResult],
+                      limit: int) -> Iterator[ClientResult]:
         """
-        Get playlists of user.
+        Validate and count pages, drop the ones provider answered as not
+        modified. Those were ingested before, only their page token is used.
         """
+        for index, response in enumerate(responses):
+            page = self.validate_response(response)
+            self.count_page(page, limit, first=index == 0)
+            if not response.not_modified:
+                yield response
+
+    def store_validator(self, response: ClientResult) -> Callable:
+        """
+        Callback of the writer which stores ETag of the page once its rows are
+        written.
+        """
+        return partial(self.youtube_client.validators.store, response)
+
+    def playlists(self, limit=None):
+        """
+        Get all playlists of user, pages are requested ahead of the writes.
+        """
+        limit = page_size(self.provider, 'playlists', limit)
         params = {
-            'part': self.part,
-            'mine': True
+            **self.playlists_projection,
+            'mine': True,
+            'maxResults': limit
         }
 
-        response = self.youtube_client.get_playlists(params=params)
-        playlists = self.validate_response(response)
-
-        db_playlist = self.get_db_playlists(self.user)
+        def fetch(token):
+            return self.youtube_client.get_playlists(params={**params, 'pageToken': token})
 
-        objs = [Playlist(
-            name=playlist['snippet']['title'],
-            status=playlist['status']['privacyStatus'],
-            remote_id=playlist['id'],
-            content=playlist['contentDetails']['itemCount'],
-            provider=Provider.YOUTUBE,
-            user=self.user
-        ) for playlist in playlists['items'] if playlist['id'] not in db_playlist]
+        responses = prefetch_pages(self.executor, self.executor_key, fetch,
+                                   depth=settings.PROVIDER_PREFETCH_PAGES)
 
-        Playlist.objects.bulk_create(objs)
+        objs = []
+        db_playlist = set(self.get_db_playlists(self.user))
+        with BulkWriter(Playlist, self.playlist_fields) as writer:
+            for response in self.changed_pages(responses, limit):
+                rows = self.save_playlists(writer, response.result, db_playlist,
+                                           self.store_validator(response))
+                objs.extend(writer.instances(rows, user=self.user))
 
         return objs
 
-    def playlist_tracks(self, playlist_id: str, limit=50, paging=None) -> List[object]:
+    playlist_tracks_projection = {
+        'part': 'snippet',
+        'fields': 'nextPageToken,pageInfo/totalResults,'
+                  'items(id,snippet(title,resourceId/videoId))',
+    }
+
+    videos_projection = {
+        'part': 'snippet,contentDetails',
+        'fields': 'items(id,snippet(channelTitle,categoryId),contentDetails/duration)',
+    }
+
+    def video_batches(self, video_ids: List[str]) -> List[List[str]]:
+        batch_size = get_capability(self.provider, 'GET', 'videos').max_batch_size
+        return [video_ids[i:i + batch_size] for i in range(0, len(video_ids), batch_size)]
+
+    def videos_params(self, video_ids: List[str]) -> dict:
+        return {
+            **self.videos_projection,
+            'id': ','.join(video_ids),
+        }
+
+    def parse_videos(self, response: ClientResult) -> Dict[str, dict]:
         """
-        Get playlist's tracks.
+        Channel, its artist, duration and category of videos by id. Videos are only
+        additional details of tracks, a failed request is logged and skipped.
+        """
+        try:
+            items = self.validate_response(response)['items']
+        except ProviderResponseError as pre:
+            logger.warning(pre)
+            self.progress.incr('errors')
+            return {}
+
+        return {item['id']: {
+            'channel': item['snippet']['channelTitle'],
+            'artist': channel_artist(item['snippet']['channelTitle']),
+            'duration_ms': self.parse_duration(item['contentDetails']['duration']),
+            'category': item['snippet'].get('categoryId'),
+        } for item in items}
+
+    def videos(self, video_ids: List[str]) -> Dict[str, dict]:
+        """
+        Get details of videos, one request per 50 videos instead of a search
+        per track.
+        """
+        videos = {}
+        for batch in self.video_batches(video_ids):
+            response = self.youtube_client.get_videos(params=self.videos_params(batch))
+            videos.update(self.parse_videos(response))
+        return videos
+
+    def count_page(self, tracks: dict, limit: int, first: bool):
+        """
+        Count a playlist items page as done, first one tells the total.
+        """
+        if first:
+            total = tracks.get('pageInfo', {}).get('totalResults', 0)
+            self.progress.incr('pages_total', max(math.ceil(total / limit), 1))
+        self.progress.incr('pages_done')
+
+    def playlist_tracks(
+            self, playlist_id: str, limit=None, paging=None, keep_tracks=True,
+            skip_synced=False
+    ) -> List[object]:
+        """
+        Get playlist's tracks, in pages as large as allowed unless limit is given.
+        Nothing is returned if keep_tracks is False, pages are only written.
+        YouTube playlists have no snapshot, skip_synced changes nothing.
         """
         finished_tracks = []
+        limit = page_size(self.provider, 'playlistItems', limit)
 
         params = {
+            **self.playlist_tracks_projection,
             'maxResults': limit,
-            'part': self.part,
             'playlistId': playlist_id,
-            'pageToken': paging
         }
 
         playlist = self.get_db_playlist(playlist_id=playlist_id, user=self.user)
-        db_tracks = self.get_db_tracks(user=self.user)
-
-        while True:
-            # Cannot be done with async or threads due to google turns each page
-            # with page token
-            response = self.youtube_client.get_playlist_tracks(params=params)
-
-            tracks = self.validate_response(response)
-
-            objs = [PlaylistTrack(
-                name=self.simplify_track_title(track['snippet']['title']),
-                artist=None,
-                remote_id=track["snippet"]["resourceId"]["videoId"],
-                album=None,
-                playlist=playlist,
-                provider=Provider.YOUTUBE,
-                user=self.user
-            ) for track in tracks['items'] if track['id'] not in db_tracks]
-            PlaylistTrack.objects.bulk_create(objs)
-            finished_tracks.append(objs)
-
-            next_page_token = tracks.get('nextPageToken')
-
-            if not next_page_token:
-                break
-
-            params['pageToken'] = next_page_token
+        db_tracks = set(self.get_db_tracks(user=self.user))
+
+        def fetch(token):
+            # Videos of the page are looked up with it, the writer only writes.
+            # Tracks written meanwhile may be looked up again, never missed.
+            response = self.youtube_client.get_playlist_tracks(
+                params={**params, 'pageToken': token})
+            if response.error or response.not_modified:
+                return response, {}
+            return response, self.videos(self.video_ids(response.result, db_tracks))
+
+        # Pages follow each other with page tokens, so they cannot be requested
+        # concurrently. Next page is requested while this one is written instead.
+        pages = prefetch_pages(self.executor, self.executor_key, fetch, paging,
+                               depth=settings.PROVIDER_PREFETCH_PAGES,
+                               next_token=lambda page: next_page_token(page[0]))
+
+        with BulkWriter(PlaylistTrack, self.track_fields) as writer:
+            for index, (response, videos) in enumerate(pages):
+                tracks = self.validate_response(response)
+                self.count_page(tracks, limit, first=index == 0)
+                if response.not_modified:
+                    continue
+                rows = self.save_tracks(writer, tracks, playlist, db_tracks, videos,
+                                        self.store_validator(response))
+                if keep_tracks:
+                    finished_tracks.append(writer.instances(rows, playlist=playlist,
+                                                            user=self.user))
 
         return finished_tracks
 
@@ -112,14 +292,28 @@ class Adapter(BaseAdapter):
         #  will be added.
         raise NotImplemented()
 
+    # Part is also the set of properties insert writes.
+    create_playlist_projection = {
+        'part': 'snippet,status',
+        'fields': 'id,snippet/title,status/privacyStatus',
+    }
+
     def create_playlist(self, playlist_data: dict) -> dict:
         """
         Post a new playlists in user account. Max create playlist limit is set to
          10 per day.
         """
-        params = {'part': self.part}
+        params = dict(self.create_playlist_projection)
 
-        request_data = {
+        response = self.youtube_client.create_a_playlist(
+            params, self.create_playlist_request_data(playlist_data)
+        )
+
+        return self.save_created_playlist(self.validate_response(response))
+
+    @staticmethod
+    def create_playlist_request_data(playlist_data: dict) -> dict:
+        return {
             "snippet": {
                 "title": playlist_data['playlist_name'],
                 "description": playlist_data.get('description')
@@ -129,9 +323,7 @@ class Adapter(BaseAdapter):
             }
         }
 
-        response = self.youtube_client.create_a_playlist(params, request_data)
-        playlist_data = self.validate_response(response)
-
+    def save_created_playlist(self, playlist_data: dict) -> dict:
         created_playlist = {
             "name": playlist_data['snippet']['title'],
             "status": playlist_data['status']['privacyStatus'],
@@ -143,13 +335,13 @@ class Adapter(BaseAdapter):
 
         return created_playlist
 
-    def add_track_to_playlist(self, playlist_id: str, track_id: str):
-        """
-        Post tracks to given playlist.
-        """
-        params = {
-            'part': self.part
-        }
+    add_track_projection = {
+        'part': 'snippet',
+        'fields': 'id',
+    }
+
+    def track_request_data(self, playlist_id: str, track_id: str):
+        params = dict(self.add_track_projection)
         request_data = {
             "snippet": {
                 "playlistId": playlist_id,
@@ -159,6 +351,13 @@ class Adapter(BaseAdapter):
                 }
             }
         }
+        return params, request_data
+
+    def add_track_to_playlist(self, playlist_id: str, track_id: str):
+        """
+        Post tracks to given playlist.
+        """
+        params, request_data = self.track_request_data(playlist_id, track_id)
 
         response = self.youtube_client.add_tracks_to_playlist(
             params=params, request_data=request_data
@@ -167,26 +366,37 @@ class Adapter(BaseAdapter):
 
         return response
 
+    # Only the first video of the search is used.
+    search_projection = {
+        'part': 'snippet',
+        'type': 'video',
+        'maxResults': 1,
+        'fields': 'items(id/videoId,snippet/title)',
+    }
+
     def search(self, search_track: str, search_type: str = None) -> dict:
         """
         Search for given tracks and append results to later use in add tracks to
         playlist.
         """
         params = {
-            'part': 'snippet',
+            **self.search_projection,
             'q': search_track,
         }
 
         response = self.youtube_client.search(params)
         search_result = self.validate_response(response)
 
+        return self.parse_search(search_track, search_result)
+
+    def parse_search(self, search_track: str, search_result: dict) -> dict:
         try:
             search_response = {
                 'id': search_result['items'][0]['id']['videoId'],
                 'name': search_result['items'][0]['snippet']['title'],
                 'type': None,
             }
-        except (KeyError, TypeError):
+        except (KeyError, TypeError, IndexError):
             search_response = {}
             self.create_search_error(
                 search_track=search_track,
@@ -196,3 +406,169 @@ class Adapter(BaseAdapter):
             )
 
         return search_response
+
+
+class AsyncAdapter(Adapter):
+    """
+    Coroutine version of the adapter. Pages of a playlist are still read one by
+    one due to page tokens but many playlists and users share one event loop,
+    database writes run in the loop's default executor.
+    """
+
+    def __init__(self, token, user):
+        super(AsyncAdapter, self).__init__(token=token, user=user)
+        self.youtube_client = AsyncClient(
+            base_url=self.youtube_client.base_url, token=token
+        )
+
+    async def playlists(self, limit=None):
+        """
+        Get all playlists of user.
+        """
+        objs = []
+        limit = page_size(self.provider, 'playlists', limit)
+
+        params = {
+            **self.playlists_projection,
+            'mine': True,
+            'maxResults': limit
+        }
+
+        db_playlist = set(await run_sync(self.get_db_playlists, self.user))
+        async with BulkWriter(Playlist, self.playlist_fields) as writer:
+            while True:
+                response = await self.youtube_client.get_playlists(params=params)
+                playlists = self.validate_response(response)
+                self.count_page(playlists, limit, first='pageToken' not in params)
+
+                if not response.not_modified:
+                    rows = await run_sync(self.save_playlists, writer, playlists,
+                                          db_playlist, self.store_validator(response))
+                    objs.extend(writer.instances(rows, user=self.user))
+
+                next_page_token = playlists.get('nextPageToken')
+
+                if not next_page_token:
+                    break
+
+                params['pageToken'] = next_page_token
+
+        return objs
+
+    async def playlist_tracks(self, playlist_id: str, limit=None, paging=None,
+                              keep_tracks=True, skip_synced=False) -> List[object]:
+        """
+        Get playlist's tracks.
+        """
+        finished_tracks = []
+        limit = page_size(self.provider, 'playlistItems', limit)
+
+        params = {
+            **self.playlist_tracks_projection,
+            'maxResults': limit,
+            'playlistId': playlist_id,
+            'pageToken': paging
+        }
+
+        playlist = await run_sync(self.get_db_playlist, playlist_id, self.user)
+        db_tracks = set(await run_sync(self.get_db_tracks, self.user))
+        async with BulkWriter(PlaylistTrack, self.track_fields) as writer:
+            while True:
+                response = await self.youtube_client.get_playlist_tracks(params=params)
+                tracks = self.validate_response(response)
+                self.count_page(tracks, limit, first=params['pageToken'] == paging)
+
+                if not response.not_modified:
+                    videos = await self.videos(self.video_ids(tracks, db_tracks))
+                    rows = await run_sync(self.save_tracks, writer, tracks, playlist,
+                                          db_tracks, videos, self.store_validator(response))
+                    if keep_tracks:
+                        finished_tracks.append(writer.instances(rows, playlist=playlist,
+                                                                user=self.user))
+
+                next_page_token = tracks.get('nextPageToken')
+
+                if not next_page_token:
+                    break
+
+                params['pageToken'] = next_page_token
+
+        return finished_tracks
+
+    async def videos(self, video_ids: List[str]) -> Dict[str, dict]:
+        """
+        Get details of videos, batches are requested concurrently.
+        """
+        responses = await gather_limited(
+            settings.PROVIDER_ASYNC_MAX_CONNECTIONS[self.provider],
+            [self.youtube_client.get_videos(params=self.videos_params(batch))
+             for batch in self.video_batches(video_ids)]
+        )
+        videos = {}
+        for response in responses:
+            videos.update(self.parse_videos(response))
+        return videos
+
+    async def create_playlist(self, playlist_data: dict) -> dict:
+        """
+        Post a new playlists in user account.
+        """
+        params = dict(self.create_playlist_projection)
+
+        response = await self.youtube_client.create_a_playlist(
+            params, self.create_playlist_request_data(playlist_data)
+        )
+
+        return await run_sync(self.save_created_playlist, self.validate_response(response))
+
+    async def add_track_to_playlist(self, playlist_id: str, track_id: str):
+        """
+        Post tracks to given playlist.
+        """
+        params, request_data = self.track_request_data(playlist_id, track_id)
+
+        response = await self.youtube_client.add_tracks_to_playlist(
+            params=params, request_data=request_data
+        )
+        self.validate_response(response)
+
+        return response
+
+    async def add_tracks_to_playlist(self, playlist_id: str,
+                                     track_ids: List[str]) -> List[str]:
+        """
+        Post tracks to given playlist, at most PROVIDER_MAX_WORKERS requests at
+        a time. Returns ids of added tracks, failed ones are logged and left out.
+        """
+        async def add(track_id):
+            try:
+                await self.add_track_to_playlist(playlist_id, track_id)
+            except ProviderResponseError as pre:
+                logger.warning(pre)
+                return None
+            return track_id
+
+        added = await gather_limited(settings.PROVIDER_MAX_WORKERS[Provider.YOUTUBE],
+                                     [add(track_id) for track_id in track_ids])
+        return [track_id for track_id in added if track_id]
+
+    async def search(self, search_track: str, search_type: str = None) -> dict:
+        """
+        Search for given tracks and append results to later use in add tracks to
+        playlist.
+        """
+        params = {
+            **self.search_projection,
+            'q': search_track,
+        }
+
+        response = await self.youtube_client.search(params)
+        search_result = self.validate_response(response)
+
+        return await run_sync(self.parse_search, search_track, search_result)
+
+    async def search_many(self, queries: Iterable[str]) -> Dict[str, dict]:
+        return await gather_searches(self, queries)
+
+    async def match_tracks(self, tracks: List[PlaylistTrack]) -> List[dict]:
+        return await gather_matches(self, tracks)
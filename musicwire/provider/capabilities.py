@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from musicwire.core.exceptions import ValidationError
+from musicwire.provider.metrics import endpoint_name
+from musicwire.provider.models import Provider
+
+
+@dataclass(frozen=True)
+class Capability:
+    # Items a page of a list endpoint can have.
+    max_page_size: Optional[int] = None
+    # Items, e.g. track uris or video ids, a single request can take.
+    max_batch_size: Optional[int] = None
+    # Rate limit units, for YouTube also quota units, of a request.
+    cost: int = 1
+
+
+DEFAULT_CAPABILITY = Capability()
+
+# What providers allow per endpoint, keyed by (method, endpoint name) with ids
+# replaced like in metrics. Endpoints which are not listed get the default.
+CAPABILITIES = {
+    Provider.SPOTIFY: {
+        ('GET', 'me/tracks'): Capability(max_page_size=50),
+        ('GET', 'me/playlists'): Capability(max_page_size=50),
+        ('GET', 'me/albums'): Capability(max_page_size=50),
+        ('GET', 'playlists/{id}/tracks'): Capability(max_page_size=100),
+        ('GET', 'search'): Capability(max_page_size=50),
+        ('POST', 'playlists/{id}/tracks'): Capability(max_batch_size=100),
+    },
+    Provider.YOUTUBE: {
+        ('GET', 'playlists'): Capability(max_page_size=50),
+        ('GET', 'playlistItems'): Capability(max_page_size=50),
+        ('GET', 'search'): Capability(max_page_size=50, cost=100),
+        # Comma separated video ids.
+        ('GET', 'videos'): Capability(max_batch_size=50),
+        ('POST', 'playlists'): Capability(cost=50),
+        # No batch insert, every item is a request.
+        ('POST', 'playlistItems'): Capability(max_batch_size=1, cost=50),
+    },
+}
+
+
+def get_capability(provider: str, method: str, end_point: str) -> Capability:
+    return CAPABILITIES.get(provider, {}).get((method, endpoint_name(end_point)),
+                                              DEFAULT_CAPABILITY)
+
+
+def page_size(provider: str, end_point: str, limit: Optional[int] = None) -> int:
+    """
+    Largest page of the list endpoint if limit is not given, otherwise limit
+    after checking the endpoint allows it.
+    """
+    max_page_size = get_capability(provider, 'GET', end_point).max_page_size
+    if limit is None:
+        return max_page_size
+    if max_page_size is not None and limit > max_page_size:
+        raise ValidationError(f'Invalid limit. Max limit is {max_page_size}.')
+    return limit
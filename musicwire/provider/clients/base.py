@@ -1,34 +1,253 @@
-import json
+import asyncio
+import os
+import threading
 import urllib.parse
+import weakref
 from abc import abstractmethod
+from typing import Optional
 
+import aiohttp
 import requests
+from django.conf import settings
+from django.utils.functional import cached_property
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 
-from musicwire.core.helpers import request_validator
-from musicwire.provider.datastructures import ClientResult
+from musicwire.core import codec
+from musicwire.core.deadline import request_timeout
+from musicwire.core.helpers import async_request_validator, request_validator, run_sync
+from musicwire.provider.capabilities import get_capability
+from musicwire.provider.datastructures import AsyncResponse
+from musicwire.provider.etags import ValidatorStore
+from musicwire.provider.metrics import request_metrics
+from musicwire.provider.quota import QuotaLedger, get_quota
+from musicwire.provider.ratelimit import RateLimiter, parse_retry_after
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+# aiohttp sessions are bound to the event loop they are created in.
+_async_sessions = weakref.WeakKeyDictionary()
+
+
+def _reset_sessions():
+    """
+    Sockets of the parent process must not be shared with forked Celery or
+    web workers, every child builds its own pools.
+    """
+    global _sessions, _sessions_lock
+    _sessions = {}
+    _sessions_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_sessions)
+
+
+def get_session(provider: str) -> requests.Session:
+    """
+    Return the keep-alive session of the provider for this process. Connection
+    pool is sized to the provider's workers and the threads calling besides
+    them, so concurrent pages reuse connections instead of doing a new TCP+TLS
+    handshake per request.
+    """
+    with _sessions_lock:
+        session = _sessions.get(provider)
+        if session is None:
+            pool_size = (settings.PROVIDER_MAX_WORKERS.get(provider, 1) +
+                         settings.PROVIDER_CALLER_THREADS)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[provider] = session
+    return session
+
+
+def get_async_session(provider: str) -> aiohttp.ClientSession:
+    """
+    Return the aiohttp session of the provider for the running event loop. All
+    coroutines of the loop share its connection pool.
+    """
+    loop = asyncio.get_event_loop()
+    sessions = _async_sessions.setdefault(loop, {})
+    session = sessions.get(provider)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=settings.PROVIDER_ASYNC_MAX_CONNECTIONS.get(provider, 1)
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        sessions[provider] = session
+    return session
+
+
+async def close_async_sessions():
+    """
+    Close sessions of the running event loop, call before the loop is closed.
+    """
+    sessions = _async_sessions.pop(asyncio.get_event_loop(), {})
+    for session in sessions.values():
+        await session.close()
+
+
+def run_async(coroutine):
+    """
+    Run a coroutine which uses async clients from synchronous code, e.g. a
+    Celery task, and close the sessions it opened.
+    """
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await close_async_sessions()
+
+    return asyncio.run(main())
 
 
 class BaseClient:
+    provider = None
+
     def __init__(self, *args, **kwargs):
         self.base_url = kwargs['base_url']
 
+    @property
+    def session(self) -> requests.Session:
+        return get_session(self.provider)
+
+    @cached_property
+    def rate_limiter(self) -> RateLimiter:
+        return RateLimiter(self.provider, self.token)
+
+    @cached_property
+    def quota(self) -> Optional[QuotaLedger]:
+        return get_quota(self.provider)
+
+    @cached_property
+    def validators(self) -> ValidatorStore:
+        return ValidatorStore(self.provider, self.token)
+
     @abstractmethod
     def get_headers(self):
         raise NotImplemented()
 
+    def make_request(self, end_point, params=None, data=None, method='GET',
+                     conditional=True):
+        """
+        GET requests are sent conditionally if the ETag of the same request was
+        stored before, see ValidatorStore. Requests whose callers need the items of
+        unchanged responses too, e.g. search, pass conditional=False.
+        """
+        if method != 'GET' or not conditional:
+            return self.send_request(end_point=end_point, params=params, data=data,
+                                     method=method)
+
+        key, cached = self.validators.lookup(end_point, params)
+        response = self.send_request(end_point=end_point, params=params,
+                                     etag=cached and cached['etag'])
+        return self.validators.resolve(key, cached, response)
+
     @request_validator  # type: ClientResult
-    def make_request(self, end_point, params=None, data=None, method='GET'):
+    def send_request(self, end_point, params=None, data=None, method='GET', etag=None):
         headers = self.get_headers()
+        if etag:
+            headers['If-None-Match'] = etag
         url = urllib.parse.urljoin(self.base_url, end_point)
         if data:
-            data = json.dumps(dict([(k, v) for k, v in data.items() if v]))
-
-        request = requests.request(
-            method,
-            url=url,
-            headers=headers,
-            params=params,
-            data=data
-        )
+            data = codec.dumps(dict([(k, v) for k, v in data.items() if v]))
+
+        cost = get_capability(self.provider, method, end_point).cost
+
+        for _ in range(settings.PROVIDER_RATE_LIMIT_RETRIES + 1):
+            self.rate_limiter.acquire(cost)
+            if self.quota:
+                self.quota.spend(cost)
+            request = self.session.request(
+                method,
+                url=url,
+                headers=headers,
+                params=params,
+                data=data,
+                timeout=request_timeout()
+            )
+            if request.status_code != 429:
+                break
+
+            request_metrics.rate_limit(self.provider, end_point, method)
+            # Only this token is throttled, others keep using their own budget.
+            self.rate_limiter.pause(parse_retry_after(
+                request.headers.get('Retry-After'),
+                default=settings.PROVIDER_RETRY_AFTER_DEFAULT
+            ))
+
+        if self.quota:
+            self.quota.observe(request)
+        return request
+
+
+class AsyncBaseClient(BaseClient):
+    """
+    Coroutine version of BaseClient. Endpoint methods of provider clients only
+    return make_request, so a provider's async client is just
+    AsyncClient(AsyncBaseClient, Client). Redis and cache calls of the
+    limiter, quota and validators run in the loop's default executor.
+    """
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        return get_async_session(self.provider)
+
+    async def make_request(self, end_point, params=None, data=None, method='GET',
+                           conditional=True):
+        if method != 'GET' or not conditional:
+            return await self.send_request(end_point=end_point, params=params,
+                                           data=data, method=method)
+
+        key, cached = await run_sync(self.validators.lookup, end_point, params)
+        response = await self.send_request(end_point=end_point, params=params,
+                                           etag=cached and cached['etag'])
+        return await run_sync(self.validators.resolve, key, cached, response)
+
+    @async_request_validator  # type: ClientResult
+    async def send_request(self, end_point, params=None, data=None, method='GET',
+                           etag=None):
+        headers = self.get_headers()
+        if etag:
+            headers['If-None-Match'] = etag
+        url = urllib.parse.urljoin(self.base_url, end_point)
+        if data:
+            data = codec.dumps(dict([(k, v) for k, v in data.items() if v]))
+        if params:
+            # aiohttp only accepts strings and numbers, convert like requests does.
+            params = {k: v if isinstance(v, (int, float)) and not isinstance(v, bool)
+                      else str(v) for k, v in params.items() if v is not None}
+
+        cost = get_capability(self.provider, method, end_point).cost
+
+        for _ in range(settings.PROVIDER_RATE_LIMIT_RETRIES + 1):
+            await self.rate_limiter.acquire_async(cost)
+            if self.quota:
+                await run_sync(self.quota.spend, cost)
+            connect, read = request_timeout()
+            async with self.session.request(
+                method,
+                url=url,
+                headers=headers,
+                params=params,
+                data=data,
+                timeout=aiohttp.ClientTimeout(connect=connect, sock_read=read)
+            ) as response:
+                request = AsyncResponse(
+                    status_code=response.status,
+                    headers=CaseInsensitiveDict(response.headers),
+                    content=await response.read()
+                )
+            if request.status_code != 429:
+                break
+
+            request_metrics.rate_limit(self.provider, end_point, method)
+            await run_sync(self.rate_limiter.pause, parse_retry_after(
+                request.headers.get('Retry-After'),
+                default=settings.PROVIDER_RETRY_AFTER_DEFAULT
+            ))
 
+        if self.quota:
+            await run_sync(self.quota.observe, request)
         return request
@@ -1,7 +1,10 @@
-from musicwire.provider.clients.base import BaseClient
+from musicwire.provider.clients.base import AsyncBaseClient, BaseClient
+from musicwire.provider.models import Provider
 
 
 class Client(BaseClient):
+    provider = Provider.SPOTIFY
+
     def __init__(self, *args, **kwargs):
         super(Client, self).__init__(**kwargs)
         self.token = kwargs['token']
@@ -14,6 +17,10 @@ class Client(BaseClient):
         }
         return headers
 
+    def get_current_user(self):
+        end_point = "me"
+        return self.make_request(end_point=end_point)
+
     def get_saved_tracks(self, request_data):
         end_point = "me/tracks"
         return self.make_request(end_point=end_point, params=request_data)
@@ -24,7 +31,8 @@ class Client(BaseClient):
 
     def get_albums(self, request_data):
         end_point = "me/albums"
-        return self.make_request(end_point=end_point, params=request_data)
+        return self.make_request(end_point=end_point, params=request_data,
+                                 conditional=False)
 
     def get_playlist_tracks(self, request_data):
         # Bad practice to change data with pop.
@@ -46,4 +54,8 @@ class Client(BaseClient):
 
     def search(self, params):
         end_point = "search"
-        return self.make_request(end_point=end_point, params=params)
+        return self.make_request(end_point=end_point, params=params, conditional=False)
+
+
+class AsyncClient(AsyncBaseClient, Client):
+    pass
@@ -1,7 +1,10 @@
-from musicwire.provider.clients.base import BaseClient
+from musicwire.provider.clients.base import AsyncBaseClient, BaseClient
+from musicwire.provider.models import Provider
 
 
 class Client(BaseClient):
+    provider = Provider.YOUTUBE
+
     def __init__(self, *args, **kwargs):
         super(Client, self).__init__(**kwargs)
         self.token = kwargs['token']
@@ -26,6 +29,10 @@ class Client(BaseClient):
         end_point = "playlistItems"
         return self.make_request(end_point=end_point, params=params)
 
+    def get_videos(self, params: dict):
+        end_point = "videos"
+        return self.make_request(end_point=end_point, params=params)
+
     def create_a_playlist(self, params: dict, request_data: dict):
         end_point = "playlists"
         return self.make_request(end_point=end_point, data=request_data, params=params,
@@ -38,4 +45,8 @@ class Client(BaseClient):
 
     def search(self, params: dict):
         end_point = "search"
-        return self.make_request(end_point=end_point, params=params)
+        return self.make_request(end_point=end_point, params=params, conditional=False)
+
+
+class AsyncClient(AsyncBaseClient, Client):
+    pass
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Mapping, Optional
+
+from musicwire.core import codec
 
 
 @dataclass
@@ -7,6 +9,32 @@ class ClientResult:
     result: Optional[dict]
     error: bool
     error_msg: Optional[str]
+    not_modified: bool = False
+    etag: Optional[str] = None
+    # Cache key of the ETag, set for responses of conditional requests.
+    validator_key: Optional[str] = None
+
+
+@dataclass
+class AsyncResponse:
+    """
+    Body read aiohttp response, with the parts of requests.Response interface
+    request validators use. Headers are case insensitive like requests'.
+    """
+    status_code: int
+    headers: Mapping[str, str]
+    content: bytes
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return codec.loads(self.content)
 
 
 class ProviderClientError(Exception):
@@ -0,0 +1,54 @@
+import hashlib
+import json
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from musicwire.provider.datastructures import ClientResult
+
+
+class ValidatorStore:
+    """
+    Keeps ETags of GET responses per access token, endpoint and params to send
+    conditional requests. Page metadata (totals, page tokens) is kept next to
+    the ETag, a 304 answer becomes that page without items so adapters go on
+    paging without ingesting anything again. ETags are only stored by callers,
+    once the items of the page are written, a page whose write failed is
+    fetched in full again.
+    """
+
+    def __init__(self, provider: str, token: str):
+        self.prefix = f"etag:{provider}:{hashlib.sha1(token.encode()).hexdigest()}"
+
+    def lookup(self, end_point: str, params: Optional[dict]) -> Tuple[str, Optional[dict]]:
+        params = sorted((params or {}).items())
+        digest = hashlib.sha1(
+            json.dumps([end_point, params], default=str).encode()
+        ).hexdigest()
+        key = f"{self.prefix}:{digest}"
+        return key, cache.get(key)
+
+    @staticmethod
+    def resolve(key: str, cached: Optional[dict], response: ClientResult) -> ClientResult:
+        if response.not_modified:
+            if cached is None:
+                return ClientResult(result=None, error=True,
+                                    error_msg='Not modified without a cached page.')
+            return ClientResult(result={**cached['page'], 'items': []}, error=False,
+                                error_msg=None, not_modified=True)
+
+        response.validator_key = key
+        return response
+
+    @staticmethod
+    def store(response: ClientResult):
+        """
+        Store ETag of a response of a conditional request, next requests of the
+        page are sent conditionally.
+        """
+        if (response.validator_key and not response.error and response.etag
+                and isinstance(response.result, dict)):
+            page = {k: v for k, v in response.result.items() if k != 'items'}
+            cache.set(response.validator_key, {'etag': response.etag, 'page': page},
+                      settings.PROVIDER_ETAG_CACHE_TIME)
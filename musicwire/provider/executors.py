@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+class FairExecutor:
+    """
+    Thread pool with a queue per key, e.g. per user. Free workers take work
+    round-robin across keys, so a library with thousands of queued pages
+    cannot take every worker from small users of the same process. Workers
+    are started with the first submitted call.
+    """
+
+    def __init__(self, max_workers: int, name: str = 'executor'):
+        self.max_workers = max_workers
+        self.name = name
+        self._queues = OrderedDict()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._shutdown = False
+
+    def submit(self, key, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError('Cannot schedule new calls after shutdown.')
+            self._queues.setdefault(key, deque()).append((future, fn, args, kwargs))
+            if len(self._threads) < self.max_workers:
+                self._start_worker()
+            self._condition.notify()
+        return future
+
+    def shutdown(self, wait: bool = True):
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _start_worker(self):
+        thread = threading.Thread(target=self._work, daemon=True,
+                                  name=f"{self.name}_{len(self._threads)}")
+        self._threads.append(thread)
+        thread.start()
+
+    def _next_call(self):
+        # Key which was served longest ago is first, it goes to the end after.
+        key, queue = self._queues.popitem(last=False)
+        call = queue.popleft()
+        if queue:
+            self._queues[key] = queue
+        return call
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queues and not self._shutdown:
+                    self._condition.wait()
+                if not self._queues:
+                    return
+                future, fn, args, kwargs = self._next_call()
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            # Calls may use the database, e.g. to record search errors. Worker's
+            # connection is closed like after a request once it is obsolete.
+            close_old_connections()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                close_old_connections()
+
+
+def _reset_executors():
+    """
+    Threads do not survive fork, Celery and web workers build their own pools
+    the first time they need one.
+    """
+    global _executors, _executors_lock
+    _executors = {}
+    _executors_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_executors)
+
+
+def get_executor(provider: str) -> FairExecutor:
+    """
+    Return the executor of the provider for this process, sized with
+    PROVIDER_MAX_WORKERS like the provider's connection pool.
+    """
+    with _executors_lock:
+        executor = _executors.get(provider)
+        if executor is None:
+            executor = FairExecutor(
+                max_workers=settings.PROVIDER_MAX_WORKERS.get(provider, 1),
+                name=f"{provider}_executor"
+            )
+            _executors[provider] = executor
+    return executor
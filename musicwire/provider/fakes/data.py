@@ -0,0 +1,100 @@
+import datetime
+import hashlib
+import random
+
+WORDS = (
+    'night', 'summer', 'love', 'fire', 'river', 'city', 'dream', 'ghost', 'golden',
+    'heart', 'light', 'midnight', 'ocean', 'paper', 'rain', 'shadow', 'silver',
+    'stone', 'wild', 'young', 'blue', 'electric', 'echo', 'highway', 'neon'
+)
+
+ADDED_AT = datetime.datetime(2020, 12, 31)
+
+class FakeLibrary:
+    """
+    Deterministic music library of a fake user. Items are built from their
+    index when asked, so libraries with thousands of playlists and tens of
+    thousands of tracks cost no memory.
+    """
+
+    def __init__(self, playlists=100, tracks_per_playlist=100, saved_tracks=1000, seed=0):
+        self.playlist_count = playlists
+        self.tracks_per_playlist = tracks_per_playlist
+        self.saved_track_count = saved_tracks
+        self.seed = seed
+        self._playlist_indexes = None
+        self._isrc_songs = None
+        self._video_songs = None
+
+    @property
+    def track_count(self) -> int:
+        return self.playlist_count * self.tracks_per_playlist + self.saved_track_count
+
+    def uid(self, *parts, size=22) -> str:
+        key = ':'.join(str(part) for part in (self.seed, *parts))
+        return hashlib.sha1(key.encode()).hexdigest()[:size]
+
+    def words(self, *parts, count=2) -> str:
+        rnd = random.Random(self.uid(*parts))
+        return ' '.join(rnd.choice(WORDS) for _ in range(count)).title()
+
+    def playlist(self, index: int) -> dict:
+        return {
+            'id': self.uid('playlist', index),
+            'name': f"{self.words('playlist', index)} {index}",
+            'public': index % 3 != 0,
+            'track_count': self.tracks_per_playlist,
+            # Changes with the library seed like Spotify snapshots do.
+            'snapshot_id': self.uid('snapshot', index, size=32),
+        }
+
+    def playlist_index(self, playlist_id: str) -> int:
+        if self._playlist_indexes is None:
+            self._playlist_indexes = {self.uid('playlist', index): index
+                                      for index in range(self.playlist_count)}
+        return self._playlist_indexes[playlist_id]
+
+    def track(self, playlist_index, index: int) -> dict:
+        """
+        Track of a playlist, playlist_index None is saved tracks. Every tenth
+        track of a playlist is also a saved track like real libraries have.
+        """
+        if playlist_index is None:
+            song = index
+        elif index % 10 == 9 and self.saved_track_count:
+            song = (playlist_index + index) % self.saved_track_count
+        else:
+            song = (self.saved_track_count + playlist_index * self.tracks_per_playlist
+                    + index)
+        return self.song(song, index)
+
+    def song(self, song: int, index: int = 0) -> dict:
+        return {
+            'id': self.uid('track', song),
+            'name': self.words('track', song, count=3),
+            'artist': f"The {self.words('artist', song % 500, count=1)}s",
+            'album': self.words('album', song % 2000),
+            'isrc': f"US{self.uid('isrc', song, size=10).upper()}",
+            'duration_ms': 120000 + song % 240000,
+            # Newest first, like me/tracks is ordered.
+            'added_at': (ADDED_AT - datetime.timedelta(minutes=index)).strftime(
+                '%Y-%m-%dT%H:%M:%SZ'),
+        }
+
+    def isrc_song(self, isrc: str):
+        """
+        Song number of an ISRC in the library, None if it is not in it.
+        """
+        if self._isrc_songs is None:
+            self._isrc_songs = {self.song(song)['isrc']: song
+                                for song in range(self.track_count)}
+        return self._isrc_songs.get(isrc)
+
+    def video_song(self, video_id: str):
+        """
+        Song number of a video id in the library, None if it is not in it.
+        """
+        if self._video_songs is None:
+            self._video_songs = {self.uid('track', song, size=11): song
+                                 for song in range(self.track_count)}
+        return self._video_songs.get(video_id)
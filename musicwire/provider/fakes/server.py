@@ -0,0 +1,278 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from musicwire.core import codec
+from musicwire.provider.fakes.data import FakeLibrary
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    # Keep-alive like the real APIs, clients reuse pooled connections.
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in one write, separate small writes stall on
+    # delayed ACKs of keep-alive connections.
+    wbufsize = -1
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_request(self, method):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = codec.loads(self.rfile.read(length)) if length else {}
+
+        status, payload, headers = self.server.fake.respond(
+            method, url.path, query, body, self.headers.get('If-None-Match')
+        )
+        content = codec.dumps(payload) if payload is not None else b''
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class FakeProviderServer:
+    """
+    Local stand-in for the Spotify and YouTube endpoints the clients use,
+    serving a FakeLibrary. Supports offset and page token paging, ETags,
+    per request latency and a 429 with Retry-After on every nth request.
+
+        with FakeProviderServer(FakeLibrary()) as server:
+            with override_settings(PROVIDER_BASE_URLS=server.base_urls):
+                ...
+    """
+
+    def __init__(self, library: FakeLibrary, latency: float = 0.0,
+                 rate_limit_every: int = 0, retry_after: int = 1,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.library = library
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._requests = 0
+
+        self.httpd = ThreadingHTTPServer((host, port), FakeProviderHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_urls(self) -> dict:
+        return {
+            'spotify': f"{self.url}/spotify/v1/",
+            'youtube': f"{self.url}/youtube/v3/",
+        }
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, method: str, path: str, query: dict, body: dict,
+                if_none_match=None):
+        provider, _, end_point = path.strip('/').partition('/')
+        end_point = end_point.partition('/')[2]  # Drop api version.
+        name = '/'.join('{id}' if i == 1 and part not in ('tracks', 'playlists') else part
+                        for i, part in enumerate(end_point.split('/')))
+
+        with self._lock:
+            self.calls[f"{provider} {method} {name}"] += 1
+            self._requests += 1
+            limited = self.rate_limit_every and self._requests % self.rate_limit_every == 0
+
+        if self.latency:
+            time.sleep(self.latency)
+        if limited:
+            error = {'error': {'status': 429, 'message': 'API rate limit exceeded'}}
+            return 429, error, {'Retry-After': str(self.retry_after)}
+
+        handler = getattr(self, f"{provider}_{method.lower()}", None)
+        try:
+            payload = handler(end_point, query, body)
+        except (KeyError, TypeError, ValueError):
+            return 404, {'error': {'status': 404, 'message': 'Not found.'}}, {}
+
+        if method != 'GET':
+            return 201, payload, {}
+
+        etag = f'"{hashlib.sha1(codec.dumps(payload)).hexdigest()}"'
+        if if_none_match == etag:
+            return 304, None, {'ETag': etag}
+        return 200, payload, {'ETag': etag}
+
+    @staticmethod
+    def offset_page(total: int, query: dict, item) -> dict:
+        limit, offset = int(query.get('limit', 20)), int(query.get('offset', 0))
+        return {
+            'items': [item(index) for index in range(offset, min(offset + limit, total))],
+            'limit': limit,
+            'offset': offset,
+            'total': total,
+        }
+
+    @staticmethod
+    def token_page(total: int, query: dict, item) -> dict:
+        limit, offset = int(query.get('maxResults', 5)), int(query.get('pageToken') or 0)
+        page = {
+            'items': [item(index) for index in range(offset, min(offset + limit, total))],
+            'pageInfo': {'totalResults': total, 'resultsPerPage': limit},
+        }
+        if offset + limit < total:
+            page['nextPageToken'] = str(offset + limit)
+        return page
+
+    def query_track(self, query: str) -> dict:
+        return self.library.track(None, int(hashlib.sha1(query.encode()).hexdigest(), 16)
+                                  % max(self.library.saved_track_count, 1))
+
+    @staticmethod
+    def spotify_track(track: dict) -> dict:
+        return {
+            'id': track['id'],
+            'name': track['name'],
+            'type': 'track',
+            'uri': f"spotify:track:{track['id']}",
+            'artists': [{'name': track['artist']}],
+            'album': {'name': track['album']},
+            'duration_ms': track['duration_ms'],
+            'external_ids': {'isrc': track['isrc']},
+        }
+
+    def spotify_get(self, end_point: str, query: dict, body: dict) -> dict:
+        library = self.library
+        parts = end_point.split('/')
+
+        if end_point == 'me':
+            return {'id': 'fake-user'}
+        if end_point == 'me/tracks':
+            return self.offset_page(library.saved_track_count, query, lambda i: {
+                'added_at': library.track(None, i)['added_at'],
+                'track': self.spotify_track(library.track(None, i)),
+            })
+        if end_point == 'me/playlists':
+            return self.offset_page(library.playlist_count, query, lambda i: {
+                'id': library.playlist(i)['id'],
+                'name': library.playlist(i)['name'],
+                'public': library.playlist(i)['public'],
+                'snapshot_id': library.playlist(i)['snapshot_id'],
+                'tracks': {'total': library.tracks_per_playlist},
+            })
+        if end_point == 'me/albums':
+            return self.offset_page(0, query, None)
+        if len(parts) == 3 and parts[0] == 'playlists' and parts[2] == 'tracks':
+            playlist = library.playlist_index(parts[1])
+            return self.offset_page(library.tracks_per_playlist, query, lambda i: {
+                'added_at': library.track(playlist, i)['added_at'],
+                'track': self.spotify_track(library.track(playlist, i)),
+            })
+        if end_point == 'search' and query['q'].startswith('isrc:'):
+            song = library.isrc_song(query['q'][len('isrc:'):])
+            items = [] if song is None else [self.spotify_track(library.song(song))]
+            return {'tracks': {'items': items}}
+        if end_point == 'search':
+            return {'tracks': {'items': [self.spotify_track(self.query_track(query['q']))]}}
+        raise KeyError(end_point)
+
+    def spotify_post(self, end_point: str, query: dict, body: dict) -> dict:
+        parts = end_point.split('/')
+
+        if len(parts) == 3 and parts[0] == 'users' and parts[2] == 'playlists':
+            return {
+                'id': self.library.uid('created', body['name']),
+                'name': body['name'],
+                'public': body.get('public', False),
+            }
+        if len(parts) == 3 and parts[0] == 'playlists' and parts[2] == 'tracks':
+            return {'snapshot_id': self.library.uid('snapshot', *body['uris'], size=32)}
+        raise KeyError(end_point)
+
+    def youtube_video(self, track: dict, title: str) -> dict:
+        return {'id': {'videoId': track['id'][:11]}, 'snippet': {'title': title}}
+
+    def youtube_get(self, end_point: str, query: dict, body: dict) -> dict:
+        library = self.library
+
+        if end_point == 'playlists':
+            return self.token_page(library.playlist_count, query, lambda i: {
+                'id': library.playlist(i)['id'],
+                'snippet': {'title': library.playlist(i)['name']},
+                'status': {'privacyStatus': 'public' if library.playlist(i)['public']
+                           else 'private'},
+                'contentDetails': {'itemCount': library.tracks_per_playlist},
+            })
+        if end_point == 'playlistItems':
+            playlist = library.playlist_index(query['playlistId'])
+
+            def item(index):
+                track = library.track(playlist, index)
+                return {
+                    'id': library.uid('item', playlist, index),
+                    'snippet': {
+                        'title': f"{track['artist']} - {track['name']} (Official Video)",
+                        'resourceId': {'kind': 'youtube#video',
+                                       'videoId': track['id'][:11]},
+                    },
+                }
+            return self.token_page(library.tracks_per_playlist, query, item)
+        if end_point == 'search':
+            track = self.query_track(query['q'])
+            return {'items': [self.youtube_video(track, track['name'])]}
+        if end_point == 'videos':
+            songs = [(video_id, library.video_song(video_id))
+                     for video_id in query['id'].split(',')]
+            return {'items': [{
+                'id': video_id,
+                'snippet': {'channelTitle': f"{library.song(song)['artist']} - Topic",
+                            'categoryId': '10'},
+                'contentDetails': {
+                    'duration': f"PT{library.song(song)['duration_ms'] // 1000}S"},
+            } for video_id, song in songs if song is not None]}
+        raise KeyError(end_point)
+
+    def youtube_post(self, end_point: str, query: dict, body: dict) -> dict:
+        if end_point == 'playlists':
+            return {
+                'id': self.library.uid('created', body['snippet']['title']),
+                'snippet': {'title': body['snippet']['title']},
+                'status': {'privacyStatus': body.get('status', {}).get(
+                    'privacyStatus', 'private')},
+            }
+        if end_point == 'playlistItems':
+            return {'id': self.library.uid('inserted', body['snippet']['resourceId'])}
+        raise KeyError(end_point)
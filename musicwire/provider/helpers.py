@@ -1,8 +1,8 @@
 from importlib import import_module
 
 
-def import_provider_class(provider):
+def import_provider_class(provider, asynchronous=False):
     app_path = '.'.join(__name__.split('.')[:-1])
     adapter_path = f"{app_path}.adapters.{provider}"
     module = import_module(adapter_path)
-    return module.Adapter
+    return module.AsyncAdapter if asynchronous else module.Adapter
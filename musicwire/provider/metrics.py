@@ -0,0 +1,207 @@
+import atexit
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, Tuple
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from musicwire.core.redis import UNAVAILABLE, run_off_loop
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the request duration histogram.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Ids in endpoint paths, e.g. playlists/<id>/tracks, would make a series per id.
+ID_SEGMENT = re.compile(r'^(playlists|users|albums|artists|tracks)/[^/]+/')
+
+
+def endpoint_name(end_point: str) -> str:
+    return ID_SEGMENT.sub(r'\1/{id}/', end_point)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.statuses = defaultdict(int)
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.duration = 0.0
+        self.count = 0
+        self.response_bytes = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def series(self) -> Iterator[Tuple[str, float]]:
+        """
+        Non zero values by series name, e.g. "status:200" or "bucket:3".
+        """
+        for status, count in self.statuses.items():
+            yield f'status:{status}', count
+        for index, count in enumerate(self.buckets):
+            if count:
+                yield f'bucket:{index}', count
+        for name in ('duration', 'count', 'response_bytes', 'retries', 'rate_limited'):
+            value = getattr(self, name)
+            if value:
+                yield name, value
+
+    def add(self, series: str, value):
+        kind, _, name = series.partition(':')
+        if kind == 'status':
+            self.statuses[name] += int(value)
+        elif kind == 'bucket':
+            self.buckets[int(name)] += int(value)
+        elif kind == 'duration':
+            self.duration += float(value)
+        else:
+            setattr(self, kind, getattr(self, kind) + int(value))
+
+    def merge(self, other: 'EndpointStats'):
+        for series, value in other.series():
+            self.add(series, value)
+
+
+class RequestMetrics:
+    """
+    Aggregation of provider requests, labeled by provider, method and endpoint
+    name. Every make_request call is observed once with its total duration,
+    final status ("error" if no response was received), response size and the
+    number of times it was resent.
+
+    Requests are counted in process and added to totals in a Redis hash at
+    most every METRICS_FLUSH_INTERVAL seconds, so the scrape endpoint of any
+    web process exposes the requests of Celery workers too. Counts stay in
+    process while Redis is unavailable.
+    """
+    key = 'metrics:provider_requests'
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self.endpoints = defaultdict(EndpointStats)
+        self._flushed_at = time.monotonic()
+
+    @property
+    def redis(self):
+        return get_redis_connection('default')
+
+    def observe(self, provider: str, end_point: str, method: str, status,
+                duration: float, size: int, retries: int):
+        with self._lock:
+            stats = self.endpoints[(provider, method, endpoint_name(end_point))]
+            stats.statuses[str(status)] += 1
+            index = bisect.bisect_left(LATENCY_BUCKETS, duration)
+            if index < len(LATENCY_BUCKETS):
+                stats.buckets[index] += 1
+            stats.duration += duration
+            stats.count += 1
+            stats.response_bytes += size
+            stats.retries += retries
+        self.flush_due()
+
+    def rate_limit(self, provider: str, end_point: str, method: str):
+        with self._lock:
+            self.endpoints[(provider, method, endpoint_name(end_point))].rate_limited += 1
+        self.flush_due()
+
+    def flush_due(self):
+        with self._lock:
+            due = time.monotonic() - self._flushed_at >= settings.METRICS_FLUSH_INTERVAL
+            if due:
+                self._flushed_at = time.monotonic()
+        if due:
+            run_off_loop(self.flush)
+
+    @staticmethod
+    def field(labels: tuple, series: str) -> str:
+        return '|'.join((*labels, series))
+
+    def flush(self):
+        """
+        Add counts of this process to the totals in Redis.
+        """
+        with self._lock:
+            pending, self.endpoints = self.endpoints, defaultdict(EndpointStats)
+        if not pending:
+            return
+
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for labels, stats in pending.items():
+                for series, value in stats.series():
+                    if isinstance(value, float):
+                        pipeline.hincrbyfloat(self.key, self.field(labels, series), value)
+                    else:
+                        pipeline.hincrby(self.key, self.field(labels, series), value)
+            pipeline.execute()
+        except UNAVAILABLE as e:
+            logger.warning(f"Metrics are not shared: {e}")
+            with self._lock:
+                for labels, stats in pending.items():
+                    self.endpoints[labels].merge(stats)
+
+    def collect(self) -> Dict[tuple, EndpointStats]:
+        """
+        Totals of every process with the counts of this one which are not
+        flushed yet.
+        """
+        endpoints = defaultdict(EndpointStats)
+        try:
+            values = self.redis.hgetall(self.key)
+        except UNAVAILABLE as e:
+            logger.warning(f"Metrics are not shared: {e}")
+            values = {}
+
+        for field, value in values.items():
+            *labels, series = field.decode().split('|')
+            endpoints[tuple(labels)].add(series, value.decode())
+        with self._lock:
+            for labels, stats in self.endpoints.items():
+                endpoints[labels].merge(stats)
+        return endpoints
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition of the metrics.
+        """
+        lines = [
+            '# TYPE provider_requests_total counter',
+            '# TYPE provider_request_duration_seconds histogram',
+            '# TYPE provider_response_bytes_total counter',
+            '# TYPE provider_retries_total counter',
+            '# TYPE provider_rate_limited_total counter',
+        ]
+        for (provider, method, name), stats in sorted(self.collect().items()):
+            labels = f'provider="{provider}",method="{method}",endpoint="{name}"'
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(f'provider_requests_total{{{labels},status="{status}"}} '
+                             f'{count}')
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(f'provider_request_duration_seconds_bucket'
+                             f'{{{labels},le="{bound}"}} {cumulative}')
+            lines.extend([
+                f'provider_request_duration_seconds_bucket{{{labels},le="+Inf"}} '
+                f'{stats.count}',
+                f'provider_request_duration_seconds_sum{{{labels}}} {stats.duration:.6f}',
+                f'provider_request_duration_seconds_count{{{labels}}} {stats.count}',
+                f'provider_response_bytes_total{{{labels}}} {stats.response_bytes}',
+                f'provider_retries_total{{{labels}}} {stats.retries}',
+                f'provider_rate_limited_total{{{labels}}} {stats.rate_limited}',
+            ])
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+# A forked worker starts counting from zero instead of repeating its parent's.
+os.register_at_fork(after_in_child=request_metrics.reset)
+atexit.register(request_metrics.flush)
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('provider', '0002_auto_20200620_2250'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('spotify', 'spotify'), ('youtube', 'youtube')], max_length=64)),
+                ('token', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='account.UserProfile')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:27
+
+from django.db import migrations
+
+
+def delete_duplicates(apps, schema_editor):
+    """
+    Keep the latest token of a user's provider, concurrent tasks may have
+    stored more than one.
+    """
+    ProviderToken = apps.get_model('provider', 'ProviderToken')
+    seen = set()
+    for token in ProviderToken.objects.order_by('-updated_at', '-id'):
+        if (token.user_id, token.provider) in seen:
+            token.delete()
+        seen.add((token.user_id, token.provider))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('provider', '0003_providertoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='providertoken',
+            unique_together={('user', 'provider')},
+        ),
+    ]
@@ -1,4 +1,9 @@
+import datetime
+from typing import Optional
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 from musicwire.provider.helpers import import_provider_class
 
@@ -19,10 +24,48 @@ class Provider(models.Model):
         return self.name
 
     @staticmethod
-    def get_provider(provider: str, token: str, user: object):
+    def get_provider(provider: str, token: str, user: object, asynchronous: bool = False):
         """
-        Get interested Adapter.
+        Get interested Adapter, the coroutine version of it if asynchronous.
         """
-        provider_module = import_provider_class(provider)
+        provider_module = import_provider_class(provider, asynchronous)
         adapter = provider_module(token=token, user=user)
         return adapter
+
+
+class ProviderToken(models.Model):
+    """
+    Latest access token a user started a task with for a provider. Tasks
+    resumed later take it instead of the one they were started with, as long
+    as it has not expired.
+    """
+    user = models.ForeignKey('account.UserProfile', on_delete=models.CASCADE)
+    provider = models.CharField(max_length=64, choices=Provider.PROVIDERS)
+    token = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'provider')
+
+    def __str__(self):
+        return f"{self.user} {self.provider}"
+
+    @staticmethod
+    def remember(user: object, provider: str, token: str):
+        ProviderToken.objects.update_or_create(
+            user=user,
+            provider=provider,
+            defaults={'token': token}
+        )
+
+    @staticmethod
+    def latest(user: object, provider: str) -> Optional[str]:
+        """
+        Token of the user if it is not older than PROVIDER_TOKEN_LIFETIME.
+        """
+        expired_at = timezone.now() - datetime.timedelta(seconds=settings.PROVIDER_TOKEN_LIFETIME)
+        return ProviderToken.objects.filter(
+            user=user,
+            provider=provider,
+            updated_at__gt=expired_at
+        ).values_list('token', flat=True).first()
@@ -0,0 +1,85 @@
+import threading
+from collections import deque
+from contextvars import copy_context
+from typing import Callable, Iterator, Optional, TypeVar
+
+from musicwire.provider.datastructures import ClientResult
+from musicwire.provider.executors import FairExecutor
+
+Page = TypeVar('Page')
+
+
+def next_page_token(response: ClientResult) -> Optional[str]:
+    """
+    Token of the next page, None after the last page or a failed one.
+    """
+    if response.error or not response.result:
+        return None
+    return response.result.get('nextPageToken')
+
+
+def prefetch_pages(
+        executor: FairExecutor, key, fetch: Callable[[Optional[str]], Page],
+        token: Optional[str] = None, depth: int = 2,
+        next_token: Callable[[Page], Optional[str]] = next_page_token
+) -> Iterator[Page]:
+    """
+    Read token paged responses ahead of the consumer. Every page is a call of
+    its own on the executor, submitted as soon as the token of the previous
+    one is known, so a crawl takes a worker only while it waits for a page and
+    calls of other users are served in between. At most depth pages wait for
+    the consumer, a stopped consumer stops the reader. Fetch may return more
+    than the response, next_token then tells the token of what it returns.
+    """
+    # Pages are requested in a copy of caller's context to keep its time budget.
+    context = copy_context()
+    condition = threading.Condition()
+    pages = deque()
+    requesting = finished = stopped = False
+
+    def request():
+        # Called with the condition held, requests the next page if there is room.
+        nonlocal requesting, finished
+        if requesting or finished or stopped or len(pages) >= depth:
+            return
+        requesting = True
+        try:
+            future = executor.submit(key, context.copy().run, fetch, token)
+        except RuntimeError as e:
+            requesting, finished = False, True
+            pages.append(e)
+            return
+        future.add_done_callback(received)
+
+    def received(future):
+        nonlocal requesting, finished, token
+        with condition:
+            requesting = False
+            try:
+                response = future.result()
+            except BaseException as e:
+                pages.append(e)
+                finished = True
+            else:
+                pages.append(response)
+                token = next_token(response)
+                finished = token is None
+            request()
+            condition.notify()
+
+    try:
+        while True:
+            with condition:
+                request()
+                while not pages and not finished:
+                    condition.wait()
+                if not pages:
+                    return
+                item = pages.popleft()
+                request()
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        with condition:
+            stopped = True
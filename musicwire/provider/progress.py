@@ -0,0 +1,167 @@
+import inspect
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from musicwire.core.redis import UNAVAILABLE, run_off_loop
+
+logger = logging.getLogger(__name__)
+
+# Stage of the running task. Executor threads and coroutines run in a copy of
+# the context, adapters count to the stage of the task which called them.
+current_stage = ContextVar('progress_stage', default='crawl')
+
+_reporters = {}
+_reporters_lock = threading.Lock()
+
+
+class ProgressReporter:
+    """
+    Progress counters of a user's crawl or transfer stage, kept in a Redis hash
+    per user and stage any process can read. Stages of a user may run at the
+    same time and do not reset each other. Increments are summed in process and written at most
+    every PROGRESS_FLUSH_INTERVAL seconds, so a page costs no round trip.
+    """
+    counters = ('pages_done', 'pages_total', 'tracks_ingested', 'searches', 'adds',
+                'errors')
+
+    def __init__(self, user_id, stage: str, interval: float = None):
+        self.stage_name = stage
+        self.key = f"progress:{user_id}:{stage}"
+        self.interval = settings.PROGRESS_FLUSH_INTERVAL if interval is None else interval
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._flushed_at = time.monotonic()
+
+    @property
+    def redis(self):
+        return get_redis_connection('default')
+
+    def incr(self, counter: str, amount: int = 1):
+        if not amount:
+            return
+        with self._lock:
+            self._pending[counter] += amount
+            due = time.monotonic() - self._flushed_at >= self.interval
+        if due:
+            self.flush_due()
+
+    def flush_due(self):
+        run_off_loop(self.flush)
+
+    def flush(self, **fields):
+        """
+        Write pending increments, and given fields as they are.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed_at = time.monotonic()
+
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for counter, amount in pending.items():
+                pipeline.hincrby(self.key, counter, amount)
+            pipeline.hset(self.key, 'updated_at', timezone.now().isoformat())
+            for name, value in fields.items():
+                pipeline.hset(self.key, name, value)
+            pipeline.expire(self.key, settings.PROGRESS_EXPIRE_TIME)
+            pipeline.execute()
+        except UNAVAILABLE as e:
+            logger.warning(f"Progress is not reported: {e}")
+
+    @contextmanager
+    def stage(self):
+        """
+        Count the stage from zero and mark it running, finished or failed.
+        """
+        with self._lock:
+            self._pending.clear()
+        try:
+            self.redis.delete(self.key)
+        except UNAVAILABLE as e:
+            logger.warning(f"Progress is not reported: {e}")
+        self.flush(stage=self.stage_name, state='running')
+        try:
+            yield self
+        except BaseException:
+            self.flush(state='failed')
+            raise
+        self.flush(state='finished')
+
+    def read(self) -> dict:
+        """
+        Last written progress of the stage, empty if nothing was reported lately.
+        """
+        try:
+            values = self.redis.hgetall(self.key)
+        except UNAVAILABLE as e:
+            logger.warning(f"Progress is not available: {e}")
+            return {}
+
+        progress = {key.decode(): value.decode() for key, value in values.items()}
+        for counter in self.counters:
+            progress[counter] = int(progress.get(counter, 0))
+        return progress if values else {}
+
+
+def _reset_reporters():
+    """
+    Pending increments of the parent are its own to write.
+    """
+    global _reporters, _reporters_lock
+    _reporters = {}
+    _reporters_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_reporters)
+
+
+def get_progress(user_id, stage: str = None) -> ProgressReporter:
+    """
+    Return the reporter of the user's stage for this process, adapters and
+    tasks of a job add to the same counters. Stage is the current one if not
+    given. Reporters are kept until the stage's task returns, reading progress
+    needs none of them.
+    """
+    stage = stage or current_stage.get()
+    with _reporters_lock:
+        reporter = _reporters.get((user_id, stage))
+        if reporter is None:
+            reporter = ProgressReporter(user_id, stage)
+            _reporters[(user_id, stage)] = reporter
+    return reporter
+
+
+def with_progress(stage: str):
+    """
+    Report progress of the decorated task under the stage name for its user
+    argument, counted from zero for every run.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def aux(*args, **kwargs):
+            user = signature.bind(*args, **kwargs).arguments['user']
+            key = (getattr(user, 'pk', user), stage)
+            token = current_stage.set(stage)
+            try:
+                with get_progress(*key).stage():
+                    return func(*args, **kwargs)
+            finally:
+                current_stage.reset(token)
+                # Counters are written when the stage exits, a long lived
+                # worker does not keep a reporter per user it ever served.
+                with _reporters_lock:
+                    _reporters.pop(key, None)
+        return aux
+    return decorator
@@ -0,0 +1,193 @@
+import datetime
+import inspect
+import logging
+from functools import wraps
+from typing import Callable, Optional
+
+import pytz
+from celery import current_app
+from django.conf import settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from musicwire.account.models import UserProfile
+from musicwire.core.exceptions import ProviderTokenExpired, QuotaExceeded
+from musicwire.core.redis import UNAVAILABLE
+from musicwire.provider.models import ProviderToken
+
+logger = logging.getLogger(__name__)
+
+# Reason of the 403 YouTube answers once the quota of the day is used up.
+QUOTA_EXCEEDED_REASON = b'quotaExceeded'
+
+
+class QuotaLedger:
+    """
+    Daily quota units the app spent on a provider, kept in Redis per quota
+    day so every worker spends from the same budget. Quota belongs to the
+    app's API project, requests of every user and token spend from it. Days
+    start at midnight of the provider's quota time zone, e.g. Pacific time for
+    YouTube, not at midnight UTC.
+    """
+
+    def __init__(self, provider: str):
+        config = settings.PROVIDER_DAILY_QUOTAS[provider]
+        self.provider = provider
+        self.units = config['units']
+        self.tz = pytz.timezone(config['timezone'])
+        self.prefix = f"quota:{provider}"
+
+    @property
+    def redis(self):
+        return get_redis_connection('default')
+
+    def day(self, now: datetime.datetime = None) -> datetime.date:
+        return (now or timezone.now()).astimezone(self.tz).date()
+
+    def reset_at(self, now: datetime.datetime = None) -> datetime.datetime:
+        """
+        When the quota of the current day is renewed.
+        """
+        next_day = datetime.datetime.combine(self.day(now) + datetime.timedelta(days=1),
+                                             datetime.time.min)
+        return self.tz.localize(next_day).astimezone(pytz.utc)
+
+    @property
+    def key(self) -> str:
+        return f"{self.prefix}:{self.day().isoformat()}"
+
+    def exceeded(self) -> QuotaExceeded:
+        return QuotaExceeded(f"Daily {self.provider} quota of {self.units} units is "
+                             f"used up until {self.reset_at().isoformat()}.")
+
+    def spend(self, cost: int = 1):
+        """
+        Record cost of a request before it is sent. Raises QuotaExceeded
+        instead, if the day's quota cannot cover it. Ledger fails open if Redis
+        is unreachable, the provider still refuses requests beyond the quota.
+        """
+        key = self.key
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            pipeline.incrby(key, cost)
+            pipeline.expireat(key, self.reset_at() + datetime.timedelta(days=1))
+            used, _ = pipeline.execute()
+            if used > self.units:
+                self.redis.decrby(key, cost)
+        except UNAVAILABLE as e:
+            logger.warning(f"Quota ledger is not available: {e}")
+            return
+        if used > self.units:
+            raise self.exceeded()
+
+    def used(self) -> int:
+        try:
+            return int(self.redis.get(self.key) or 0)
+        except UNAVAILABLE as e:
+            logger.warning(f"Quota ledger is not available: {e}")
+            return 0
+
+    def remaining(self) -> int:
+        return max(self.units - self.used(), 0)
+
+    def exhaust(self):
+        """
+        Mark the day's quota as used up, e.g. spent by requests which were not
+        recorded.
+        """
+        key = self.key
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            pipeline.set(key, self.units)
+            pipeline.expireat(key, self.reset_at() + datetime.timedelta(days=1))
+            pipeline.execute()
+        except UNAVAILABLE as e:
+            logger.warning(f"Quota ledger is not available: {e}")
+
+    def observe(self, response):
+        """
+        Exhaust the ledger if the provider tells the quota is used up.
+        """
+        if (response is not None and response.status_code == 403
+                and QUOTA_EXCEEDED_REASON in (response.content or b'')):
+            self.exhaust()
+
+
+def get_quota(provider: str) -> Optional[QuotaLedger]:
+    """
+    Ledger of the provider, None for providers without a daily quota.
+    """
+    if provider not in settings.PROVIDER_DAILY_QUOTAS:
+        return None
+    return QuotaLedger(provider)
+
+
+def resume_arguments(arguments: dict, credentials) -> dict:
+    """
+    Keyword arguments a paused task is sent again with. Messages are JSON,
+    user is sent by its pk. Tokens are left out, they expire before the quota
+    resets and the latest ones of the user are taken when the task resumes.
+    Tasks are sent with a user only, nothing resumes them without one.
+    """
+    kwargs = dict(arguments)
+    if 'user' in kwargs:
+        kwargs['user'] = getattr(kwargs['user'], 'pk', kwargs['user'])
+    for _, token in credentials:
+        kwargs[token] = None
+    return kwargs
+
+
+def with_quota(*credentials, on_expired: Callable = None):
+    """
+    Pause the decorated task when a daily quota runs out and send it again to
+    resume after the quota resets. Credentials are (provider, token) argument
+    name pairs of the task, user argument is a UserProfile or its pk. Given
+    tokens are stored as the user's latest ones, missing tokens are taken from
+    them. Task does not start if one of the quotas is already used up, or if
+    a stored token expired. on_expired(arguments, provider, error) is called
+    then, ProviderTokenExpired is raised without it.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        task_name = f"{func.__module__}.{func.__name__}"
+
+        @wraps(func)
+        def aux(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            arguments = bound.arguments
+            user = arguments.get('user')
+            if user is not None and not isinstance(user, UserProfile):
+                user = arguments['user'] = UserProfile.objects.get(pk=user)
+            for provider, token in credentials:
+                if user is None:
+                    continue
+                if arguments.get(token):
+                    ProviderToken.remember(user, arguments[provider], arguments[token])
+                    continue
+                arguments[token] = ProviderToken.latest(user, arguments[provider])
+                if not arguments[token]:
+                    error = ProviderTokenExpired(
+                        f"{arguments[provider]} token of the user expired before "
+                        f"{func.__name__} resumed.")
+                    if on_expired is None:
+                        raise error
+                    logger.warning(error)
+                    on_expired(arguments, arguments[provider], error)
+                    return None
+
+            quotas = [get_quota(arguments.get(provider)) for provider, _ in credentials]
+            quotas = [quota for quota in quotas if quota]
+            try:
+                for quota in quotas:
+                    if not quota.remaining():
+                        raise quota.exceeded()
+                return func(*bound.args, **bound.kwargs)
+            except QuotaExceeded as e:
+                if not quotas:
+                    raise
+                eta = max(quota.reset_at() for quota in quotas)
+                logger.warning(f"{func.__name__} paused until {eta.isoformat()}: {e}")
+                current_app.send_task(task_name, kwargs=resume_arguments(arguments, credentials),
+                                      eta=eta)
+        return aux
+    return decorator
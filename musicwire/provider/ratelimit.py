@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import logging
+import time
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from musicwire.core.deadline import check_deadline
+from musicwire.core.helpers import run_sync
+from musicwire.core.redis import UNAVAILABLE
+
+logger = logging.getLogger(__name__)
+
+# Refills the bucket for the elapsed time and takes the cost from it. Returns
+# milliseconds to wait before the cost can be taken, 0 means it is taken.
+TOKEN_BUCKET_SCRIPT = """
+local paused = redis.call('PTTL', KEYS[2])
+if paused > 0 then
+    return paused
+end
+
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = math.ceil((cost - tokens) * 1000 / rate)
+end
+
+redis.call('HMSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+
+def parse_retry_after(value, default: float) -> float:
+    """
+    Retry-After header is either delay seconds or a http date.
+    """
+    if not value:
+        return default
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    return max((retry_at - timezone.now()).total_seconds(), 0)
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every worker through Redis. Buckets are kept per
+    provider and access token so a throttled token does not slow down others.
+    """
+    script = None
+
+    def __init__(self, provider: str, token: str):
+        config = settings.PROVIDER_RATE_LIMITS[provider]
+        self.rate = config['rate']
+        self.capacity = config['capacity']
+
+        token_hash = hashlib.sha1(token.encode()).hexdigest()
+        self.key = f"ratelimit:{provider}:{token_hash}"
+        self.pause_key = f"{self.key}:pause"
+
+    @property
+    def redis(self):
+        return get_redis_connection('default')
+
+    def reserve(self, cost: int = 1) -> float:
+        """
+        Try to take cost from the bucket. Returns seconds to wait before trying
+        again, 0 if it is taken. Limiter fails open if Redis is unreachable or
+        the cache is not Redis.
+        """
+        cost = min(cost, self.capacity)
+        now = int(time.time() * 1000)
+        try:
+            if RateLimiter.script is None:
+                RateLimiter.script = self.redis.register_script(TOKEN_BUCKET_SCRIPT)
+            wait = RateLimiter.script(
+                keys=[self.key, self.pause_key],
+                args=[self.rate, self.capacity, cost, now],
+                client=self.redis
+            )
+        except UNAVAILABLE as e:
+            logger.warning(f"Rate limiter is not available: {e}")
+            return 0
+        return int(wait) / 1000
+
+    def acquire(self, cost: int = 1):
+        """
+        Block until cost is taken from the bucket. Raises DeadlineExceeded
+        instead of waiting beyond the time budget.
+        """
+        wait = self.reserve(cost)
+        while wait:
+            check_deadline(wait)
+            time.sleep(wait)
+            wait = self.reserve(cost)
+
+    async def acquire_async(self, cost: int = 1):
+        """
+        Coroutine version of acquire, neither Redis calls nor waits block the
+        event loop.
+        """
+        wait = await run_sync(self.reserve, cost)
+        while wait:
+            check_deadline(wait)
+            await asyncio.sleep(wait)
+            wait = await run_sync(self.reserve, cost)
+
+    def pause(self, seconds: float):
+        """
+        Stop every worker using this token for given seconds.
+        """
+        try:
+            self.redis.set(self.pause_key, 1, px=max(int(seconds * 1000), 1))
+        except UNAVAILABLE as e:
+            logger.warning(f"Rate limiter is not available: {e}")
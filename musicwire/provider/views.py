@@ -1,3 +1,21 @@
-from django.shortcuts import render
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from musicwire.provider.metrics import request_metrics
+
+
+def metrics_view(request):
+    """
+    Scrape endpoint of provider request metrics of all processes. Requires
+    "Authorization: Bearer <METRICS_TOKEN>", it is closed if METRICS_TOKEN is
+    not set.
+    """
+    token = settings.METRICS_TOKEN
+    if not token or not hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', ''), f"Bearer {token}"):
+        return HttpResponseForbidden()
+
+    return HttpResponse(request_metrics.render(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,116 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.test import override_settings
+
+from musicwire.account.models import UserProfile
+from musicwire.core.helpers import generate_uniq_id
+from musicwire.music.models import CreatedPlaylist, Playlist, PlaylistTrack
+from musicwire.provider.fakes.data import FakeLibrary
+from musicwire.provider.fakes.server import FakeProviderServer
+from musicwire.provider.metrics import request_metrics
+from musicwire.provider.models import Provider
+from musicwire.provider.progress import ProgressReporter
+from musicwire.transfer.tasks import (PROGRESS_STAGES, transfer_playlists_task,
+                                      transfer_tracks_task)
+
+# Far above anything a local run reaches, the fake server is the only limit.
+UNLIMITED_RATES = {
+    provider: {'rate': 100000, 'capacity': 100000} for provider in settings.PROVIDER_RATE_LIMITS
+}
+
+
+class Command(BaseCommand):
+    help = 'Run a full transfer against local fake providers and report throughput.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=Provider.SPOTIFY,
+                            choices=[Provider.SPOTIFY, Provider.YOUTUBE])
+        parser.add_argument('--end', default=Provider.YOUTUBE,
+                            choices=[Provider.SPOTIFY, Provider.YOUTUBE])
+        parser.add_argument('--playlists', type=int, default=20)
+        parser.add_argument('--tracks', type=int, default=100,
+                            help='Tracks per playlist.')
+        parser.add_argument('--saved-tracks', type=int, default=500)
+        parser.add_argument('--latency', type=float, default=0.02,
+                            help='Seconds the fake server waits per request.')
+        parser.add_argument('--rate-limit-every', type=int, default=0,
+                            help='Answer every nth request with 429.')
+        parser.add_argument('--real-rate-limits', action='store_true',
+                            help='Keep PROVIDER_RATE_LIMITS and PROVIDER_DAILY_QUOTAS '
+                                 'of the settings.')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the benchmark user and its rows.')
+
+    def run_step(self, name, fn, server, count):
+        calls = server.total_calls
+        tracemalloc.start()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(f"{name:<10} {elapsed:8.2f} s  {count / elapsed:10.1f} {name}/s  "
+                          f"{server.total_calls - calls:7d} calls  "
+                          f"peak {peak / 1024 / 1024:7.1f} MiB")
+
+    def handle(self, *args, **options):
+        source, end = options['source'], options['end']
+        library = FakeLibrary(
+            playlists=options['playlists'],
+            tracks_per_playlist=options['tracks'],
+            saved_tracks=options['saved_tracks'] if source == Provider.SPOTIFY else 0,
+        )
+        user = UserProfile.objects.create(
+            username=f"benchmark-{generate_uniq_id(8)}",
+            password=generate_uniq_id(16),
+            email='benchmark@musicwire.local',
+        )
+        source_token, end_token = generate_uniq_id(), generate_uniq_id()
+        overrides = {} if options['real_rate_limits'] else {
+            'PROVIDER_RATE_LIMITS': UNLIMITED_RATES,
+            'PROVIDER_DAILY_QUOTAS': {},
+        }
+
+        self.stdout.write(f"{source} -> {end}: {library.playlist_count} playlists, "
+                          f"{library.track_count} tracks, latency "
+                          f"{options['latency'] * 1000:.0f} ms")
+
+        request_metrics.reset()
+        server = FakeProviderServer(library, latency=options['latency'],
+                                    rate_limit_every=options['rate_limit_every'])
+        try:
+            # Requests of the run are reported from this process, they are not
+            # added to the shared metrics.
+            with server, override_settings(PROVIDER_BASE_URLS=server.base_urls,
+                                           METRICS_FLUSH_INTERVAL=float('inf'), **overrides):
+                args = (source, source_token, end, end_token, user)
+                self.run_step('playlists', lambda: transfer_playlists_task(*args),
+                              server, library.playlist_count)
+                self.run_step('tracks', lambda: transfer_tracks_task(*args),
+                              server, library.track_count)
+
+            self.stdout.write(
+                f"stored {Playlist.objects.filter(user=user).count()} playlists, "
+                f"{PlaylistTrack.objects.filter(user=user).count()} tracks, created "
+                f"{CreatedPlaylist.objects.filter(user=user).count()} playlists"
+            )
+            for stage in PROGRESS_STAGES:
+                progress = ProgressReporter(user.pk, stage).read()
+                self.stdout.write(f"progress of {stage} " + ', '.join(
+                    f"{counter} {progress.get(counter, 0)}"
+                    for counter in ProgressReporter.counters
+                ))
+            for (provider, method, name), stats in sorted(request_metrics.endpoints.items()):
+                self.stdout.write(
+                    f"  {provider} {method} {name:<26} {stats.count:7d} calls  "
+                    f"{stats.duration / stats.count * 1000:7.1f} ms avg  "
+                    f"{stats.retries:5d} retries  {stats.rate_limited:5d} rate limited"
+                )
+        finally:
+            request_metrics.reset()
+            if not options['keep']:
+                user.delete()
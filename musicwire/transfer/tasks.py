@@ -1,17 +1,49 @@
+import asyncio
 import logging
+from typing import Callable, List
 
 from celery.schedules import crontab
 from celery.task import periodic_task
+from django.conf import settings
 
-from musicwire.core.exceptions import ProviderResponseError
-from musicwire.music.models import CreatedPlaylist, Playlist
+from musicwire.core.deadline import with_deadline
+from musicwire.core.exceptions import ProviderResponseError, QuotaExceeded
+from musicwire.core.helpers import gather_limited, run_sync
+from musicwire.music.models import CreatedPlaylist, Playlist, PlaylistTrack
+from musicwire.provider.clients.base import run_async
 from musicwire.provider.models import Provider
+from musicwire.provider.progress import with_progress
+from musicwire.provider.quota import get_quota, with_quota
 from musicwire.transfer.models import TransferError
 
 logger = logging.getLogger(__name__)
 
+# Stages the tasks report progress under, both run at the same time.
+PROGRESS_STAGES = ('transfer_playlists', 'transfer_tracks')
+
+
+def token_expired(transfer_type: str) -> Callable:
+    """
+    Record a paused task, which cannot resume with an expired token, as a
+    TransferError of the user.
+    """
+    def aux(arguments: dict, provider: str, error):
+        TransferError.objects.create(
+            request_data={"provider": provider},
+            error=error,
+            source=arguments['source_slug'],
+            end=arguments['end_slug'],
+            type=transfer_type,
+            user=arguments['user']
+        )
+    return aux
+
 
 @periodic_task(run_every=(crontab(hour=0, minute=0)))
+@with_deadline(settings.TRANSFER_TASK_DEADLINE)
+@with_quota(('source_slug', 'source_token'), ('end_slug', 'end_token'),
+            on_expired=token_expired(TransferError.PLAYLIST))
+@with_progress('transfer_playlists')
 def transfer_playlists_task(source_slug, source_token, end_slug, end_token, user):
     adapter = Provider.get_provider(
         provider=source_slug,
@@ -56,11 +88,12 @@ def transfer_playlists_task(source_slug, source_token, end_slug, end_token, user
             "privacy_status": playlist.status,
         }
         try:
-            adapter.create_playlist(**playlist_data)
+            adapter.create_playlist(playlist_data)
             playlist.is_transferred = True
             playlist.save()
         except ProviderResponseError as pre:
             logger.warning(pre)
+            adapter.progress.incr('errors')
             TransferError.objects.create(
                 request_data=playlist_data,
                 error=pre,
@@ -72,38 +105,104 @@ def transfer_playlists_task(source_slug, source_token, end_slug, end_token, user
             continue
 
 
+def flush_tracks(adapter, playlist_id: str, pending: list, source_slug, end_slug, user):
+    """
+    Add buffered (track, remote id) pairs to the playlist with a batch request
+    and mark the added tracks as transferred.
+    """
+    if not pending:
+        return
+
+    track_ids = [remote_id for _, remote_id in pending]
+    added = set(adapter.add_tracks_to_playlist(playlist_id, track_ids))
+    PlaylistTrack.objects.filter(
+        id__in=[track.id for track, remote_id in pending if remote_id in added]
+    ).update(is_transferred=True)
+
+    failed = [remote_id for remote_id in track_ids if remote_id not in added]
+    adapter.progress.incr('adds', len(track_ids) - len(failed))
+    adapter.progress.incr('errors', len(failed))
+    if failed:
+        TransferError.objects.create(
+            request_data={"playlist_id": playlist_id, "track_ids": failed},
+            error=f"{len(failed)} tracks could not be added to playlist.",
+            source=source_slug,
+            end=end_slug,
+            type=TransferError.TRACK,
+            user=user
+        )
+    pending.clear()
+
+
+def crawl_playlist(adapter, playlist_id: str):
+    """
+    Write tracks of the playlist, they are read back from the database later so
+    pages are not kept. Playlists which did not change since they were crawled
+    are skipped. Async adapters return the crawl coroutine.
+    """
+    if playlist_id == "spotify_saved_tracks":
+        return adapter.saved_tracks(playlist_id=playlist_id, keep_tracks=False)
+    return adapter.playlist_tracks(playlist_id=playlist_id, keep_tracks=False,
+                                   skip_synced=True)
+
+
+def crawl_playlists(adapter, playlist_ids: List[str], on_error: Callable):
+    """
+    Crawl the playlists, on_error is called with the id and the error of a
+    playlist which failed. Async adapters crawl PROVIDER_ASYNC_PLAYLISTS
+    playlists at a time on one event loop, which shares its connections
+    between them.
+    """
+    if not asyncio.iscoroutinefunction(adapter.playlist_tracks):
+        for playlist_id in playlist_ids:
+            try:
+                crawl_playlist(adapter, playlist_id)
+            except ProviderResponseError as pre:
+                on_error(playlist_id, pre)
+        return
+
+    async def crawl(playlist_id):
+        try:
+            await crawl_playlist(adapter, playlist_id)
+        except ProviderResponseError as pre:
+            await run_sync(on_error, playlist_id, pre)
+
+    run_async(gather_limited(settings.PROVIDER_ASYNC_PLAYLISTS,
+                             [crawl(playlist_id) for playlist_id in playlist_ids]))
+
+
 @periodic_task(run_every=(crontab(hour=0, minute=0)))
+@with_deadline(settings.TRANSFER_TASK_DEADLINE)
+@with_quota(('source_slug', 'source_token'), ('end_slug', 'end_token'),
+            on_expired=token_expired(TransferError.TRACK))
+@with_progress('transfer_tracks')
 def transfer_tracks_task(source_slug, source_token, end_slug, end_token, user):
     adapter = Provider.get_provider(
         provider=source_slug,
         token=source_token,
-        user=user
+        user=user,
+        asynchronous=settings.PROVIDER_ASYNC_CRAWL
     )
 
     # Get all playlists of user and get tracks of those playlists.
-    playlists = Playlist.objects.filter(
+    playlist_ids = Playlist.objects.filter(
         user=user,
         provider=source_slug
-    )
+    ).values_list('remote_id', flat=True)
 
-    for playlist in playlists:
-        playlist_remote_id = playlist.remote_id
-        try:
-            if playlist_remote_id == "spotify_saved_tracks":
-                adapter.saved_tracks(playlist_id=playlist_remote_id)
-            else:
-                adapter.playlist_tracks(playlist_id=playlist_remote_id)
-        except ProviderResponseError as pre:
-            logger.warning(pre)
-            TransferError.objects.create(
-                request_data={"playlist_id": playlist_remote_id},
-                error=pre,
-                source=source_slug,
-                end=end_slug,
-                type=TransferError.PLAYLIST,
-                user=user
-            )
-            continue
+    def crawl_failed(playlist_remote_id, pre):
+        logger.warning(pre)
+        adapter.progress.incr('errors')
+        TransferError.objects.create(
+            request_data={"playlist_id": playlist_remote_id},
+            error=pre,
+            source=source_slug,
+            end=end_slug,
+            type=TransferError.PLAYLIST,
+            user=user
+        )
+
+    crawl_playlists(adapter, list(playlist_ids), crawl_failed)
 
     # Search inserted tracks and try to upload them.
     adapter = Provider.get_provider(
@@ -116,19 +215,36 @@ def transfer_tracks_task(source_slug, source_token, end_slug, end_token, user):
         provider=end_slug
     )
 
+    quota = get_quota(end_slug)
+
+    # The adapter keeps its search results for the job, a song of many
+    # playlists is looked up once.
     for created_playlist in created_playlists:
         playlist = Playlist.objects.prefetch_related(
             "playlisttrack_set"
-        ).get(name=created_playlist.name, provider=source_slug)
-        tracks = playlist.playlisttrack_set.filter(is_transferred=False)
-        for track in tracks:
-            try:
-                response = adapter.search(track.name)
-                adapter.add_track_to_playlist(
-                    playlist_id=created_playlist.remote_id,
-                    track_id=response['id']
-                )
-            except ProviderResponseError as pre:
-                logger.warning(pre)
-                # In search part it create search error.
+        ).get(name=created_playlist.name, provider=source_slug, user=user)
+        tracks = list(playlist.playlisttrack_set.filter(is_transferred=False))
+
+        # Only the tracks today's quota covers are transferred, rest waits for
+        # the next day instead of failing one by one.
+        affordable = len(tracks)
+        if quota and adapter.track_quota_cost:
+            affordable = quota.remaining() // adapter.track_quota_cost
+        matches = adapter.match_tracks(tracks[:affordable])
+
+        # Found tracks are added in batches, see add_tracks_batch_size.
+        pending = []
+        for track, response in zip(tracks, matches):
+            if not response:
+                # Not found or failed, search error is already recorded by the adapter.
                 continue
+
+            pending.append((track, response['id']))
+            if len(pending) >= adapter.add_tracks_batch_size:
+                flush_tracks(adapter, created_playlist.remote_id, pending,
+                             source_slug, end_slug, user)
+        flush_tracks(adapter, created_playlist.remote_id, pending,
+                     source_slug, end_slug, user)
+        if affordable < len(tracks):
+            raise QuotaExceeded(f"{len(tracks) - affordable} tracks of {playlist.name} "
+                                f"are over the daily quota.")
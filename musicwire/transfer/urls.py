@@ -4,4 +4,5 @@ from musicwire.transfer import views
 
 urlpatterns = [
     path('', views.TransferPlaylistsView.as_view(), name='transfer'),
+    path('progress/', views.TransferProgressView.as_view(), name='transfer-progress'),
 ]
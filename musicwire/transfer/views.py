@@ -3,9 +3,12 @@ import logging
 from django.conf import settings
 from django.core.cache import cache
 from django.http import HttpResponse
+from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from musicwire.provider.progress import ProgressReporter
 from musicwire.transfer.serializers import TransferPlaylistSerializer
+from musicwire.transfer.tasks import PROGRESS_STAGES
 
 logger = logging.getLogger(__name__)
 
@@ -36,15 +39,16 @@ class TransferPlaylistsView(APIView):
     def add_tracks_to_playlists(adapter, created_playlists: list):
         for created_playlist in created_playlists:
             search_tracks = cache.get(created_playlist['playlist_name'])
-            for track in search_tracks:
-                search_result = adapter.search(track['track_name'])
-                if not search_result:
-                    continue
+            search_results = adapter.search_many(
+                track['track_name'] for track in search_tracks
+            )
+            track_ids = [search_result['id'] for search_result in search_results.values()
+                         if search_result]
 
-                adapter.add_tracks_to_playlist(
-                    playlist_id=created_playlist['playlist_id'],
-                    track=search_result['id']
-                )
+            adapter.add_tracks_to_playlist(
+                playlist_id=created_playlist['playlist_id'],
+                track_ids=track_ids
+            )
 
     def post(self, request, *args, **kwargs):
         serialized = TransferPlaylistSerializer(data=self.request.data)
@@ -85,3 +89,13 @@ class TransferPlaylistsView(APIView):
 
         x = {"success": True}
         return HttpResponse(**x, status=200)
+
+
+class TransferProgressView(APIView):
+    def get(self, request, *args, **kwargs):
+        """
+        Counters of the user's running or last transfer stages, cheap to poll.
+        """
+        progress = {stage: ProgressReporter(request.account.pk, stage).read()
+                    for stage in PROGRESS_STAGES}
+        return Response(progress, status=200)
@@ -0,0 +1,30 @@
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+
+from musicwire.core import codec
+from musicwire.core.renderers import JSONRenderer
+
+
+class CodecTestCase(TestCase):
+    def test_dumps_if_same_as_stdlib(self):
+        data = {'name': 'Şarkı', 'items': [1, 2.5, None, True], 1: 'key'}
+
+        self.assertEqual(codec.loads(codec.dumps(data)),
+                         codec.stdlib_loads(codec.stdlib_dumps(data)))
+
+    def test_renderer_if_data_has_rest_framework_types(self):
+        """
+        Expect datetimes and decimals to be rendered like the rest framework does.
+        """
+        data = {
+            'date': datetime.datetime(2020, 8, 26, 12, 38, 1, 123456,
+                                      tzinfo=datetime.timezone.utc),
+            'price': Decimal('1.50')
+        }
+
+        rendered = JSONRenderer().render(data)
+
+        self.assertEqual(codec.loads(rendered),
+                         {'date': '2020-08-26T12:38:01.123456Z', 'price': 1.5})
@@ -0,0 +1,48 @@
+from django.test import TestCase, override_settings
+
+from musicwire.core.deadline import (check_deadline, deadline, remaining_time,
+                                     request_timeout, with_deadline)
+from musicwire.core.exceptions import DeadlineExceeded
+
+
+@override_settings(PROVIDER_CONNECT_TIMEOUT=5, PROVIDER_READ_TIMEOUT=30)
+class DeadlineTestCase(TestCase):
+    def test_request_timeout_if_no_deadline(self):
+        self.assertIsNone(remaining_time())
+        self.assertEqual(request_timeout(), (5, 30))
+
+    def test_request_timeout_if_deadline_is_shorter(self):
+        """
+        Expect timeouts to be shrunk to the remaining budget.
+        """
+        with deadline(2):
+            connect, read = request_timeout()
+
+        self.assertLessEqual(connect, 2)
+        self.assertLessEqual(read, 2)
+
+    def test_deadline_if_nested_budget_is_longer(self):
+        """
+        Expect nested blocks not to extend the budget of the caller.
+        """
+        with deadline(1):
+            with deadline(100):
+                self.assertLessEqual(remaining_time(), 1)
+
+    def test_check_deadline_if_budget_is_exhausted(self):
+        with deadline(0):
+            with self.assertRaises(DeadlineExceeded):
+                request_timeout()
+            with self.assertRaises(DeadlineExceeded):
+                check_deadline()
+
+    def test_with_deadline_if_task_runs_out_of_time(self):
+        """
+        Expect task to stop without raising when the budget runs out.
+        """
+        @with_deadline(0)
+        def task():
+            check_deadline()
+            return True
+
+        self.assertIsNone(task())
@@ -0,0 +1,138 @@
+import asyncio
+import datetime
+from unittest import mock
+
+from django.test import TestCase
+from model_mommy import mommy
+
+from musicwire.account.models import UserProfile
+from musicwire.music.ingest import BulkWriter, copy_value
+from musicwire.music.models import Playlist, PlaylistTrack
+
+
+class BulkWriterTestCase(TestCase):
+    fields = ('name', 'remote_id', 'added_at', 'playlist', 'provider', 'user')
+
+    def setUp(self) -> None:
+        self.user = mommy.make(UserProfile)
+        self.playlist = mommy.make(Playlist, user=self.user)
+
+    def row(self, index):
+        added_at = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        return (f'Name {index}', f'Uri {index}', added_at, self.playlist.pk, 'spotify',
+                self.user.pk)
+
+    def test_add_if_rows_over_batch_size(self):
+        """
+        Expect a write per full batch and the rest written on exit.
+        """
+        with BulkWriter(PlaylistTrack, self.fields, batch_size=10,
+                        use_copy=False) as writer:
+            with mock.patch.object(writer, 'insert', wraps=writer.insert) as insert:
+                writer.add(self.row(index) for index in range(15))
+                self.assertEqual(insert.call_count, 1)
+
+        self.assertEqual(writer.written, 15)
+        self.assertEqual(PlaylistTrack.objects.filter(playlist=self.playlist).count(), 15)
+
+    def test_add_if_on_write(self):
+        """
+        Expect callbacks to be called after the rows of their page are written
+        and not if the write fails.
+        """
+        written = mock.MagicMock()
+        writer = BulkWriter(PlaylistTrack, self.fields, use_copy=False)
+        writer.add([self.row(0)], on_write=written)
+        written.assert_not_called()
+
+        with mock.patch.object(writer, 'insert', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                writer.flush()
+        written.assert_not_called()
+
+        writer.add([self.row(1)], on_write=written)
+        writer.flush()
+        written.assert_called_once()
+
+    def test_add_if_page_fails(self):
+        """
+        Expect rows of completed pages to be written and the error raised.
+        """
+        with self.assertRaises(RuntimeError):
+            with BulkWriter(PlaylistTrack, self.fields, use_copy=False) as writer:
+                writer.add([self.row(0)])
+                raise RuntimeError
+
+        self.assertEqual(PlaylistTrack.objects.filter(playlist=self.playlist).count(), 1)
+
+    def test_add_if_page_of_coroutine_fails(self):
+        """
+        Expect buffered rows to be written off the event loop and the error raised.
+        """
+        async def crawl(writer):
+            async with writer:
+                writer.add([self.row(0)])
+                raise RuntimeError
+
+        writer = BulkWriter(PlaylistTrack, self.fields, use_copy=False)
+        with mock.patch.object(writer, 'flush') as flush, self.assertRaises(RuntimeError):
+            asyncio.run(crawl(writer))
+
+        flush.assert_called_once_with()
+
+    def test_add_if_value_over_max_length(self):
+        """
+        Expect strings to be cut to the length of their field.
+        """
+        row = ('N' * 300,) + self.row(0)[1:]
+
+        with BulkWriter(PlaylistTrack, self.fields, use_copy=False) as writer:
+            writer.add([row])
+
+        self.assertEqual(PlaylistTrack.objects.get(remote_id='Uri 0').name, 'N' * 255)
+
+    def test_add_if_defaults(self):
+        """
+        Expect fields which are not given to be written with their default.
+        """
+        with BulkWriter(PlaylistTrack, self.fields, use_copy=False) as writer:
+            writer.add([self.row(0)])
+
+        track = PlaylistTrack.objects.get(remote_id='Uri 0')
+        self.assertFalse(track.is_transferred)
+        self.assertEqual(track.added_at.year, 2020)
+
+    def test_add_if_over_query_params_limit(self):
+        """
+        Expect one batch to be split into inserts the database accepts.
+        """
+        with BulkWriter(PlaylistTrack, self.fields, use_copy=False) as writer:
+            writer.add(self.row(index) for index in range(1000))
+
+        self.assertEqual(PlaylistTrack.objects.filter(playlist=self.playlist).count(), 1000)
+
+    def test_copy(self):
+        """
+        Expect rows to be sent in COPY text format.
+        """
+        writer = BulkWriter(PlaylistTrack, ('name', 'remote_id'), use_copy=True)
+        cursor = mock.MagicMock()
+
+        writer.copy(cursor, [('Tab\\tName', None)])
+
+        sql, buffer = cursor.copy_expert.call_args[0]
+        self.assertTrue(sql.startswith('COPY "music_playlisttrack" ("name", "remote_id", '))
+        self.assertTrue(buffer.read().startswith('Tab\\\\tName\t\\N\t'))
+
+    def test_copy_value(self):
+        self.assertEqual(copy_value('a\tb\nc'), 'a\\tb\\nc')
+        self.assertEqual(copy_value(None), '\\N')
+
+    def test_instances(self):
+        writer = BulkWriter(PlaylistTrack, self.fields)
+
+        objs = writer.instances([self.row(0)], playlist=self.playlist)
+
+        self.assertEqual(objs[0].playlist, self.playlist)
+        self.assertEqual(objs[0].remote_id, 'Uri 0')
+        self.assertIsNone(objs[0].pk)
@@ -0,0 +1,57 @@
+from django.test import TestCase
+
+from musicwire.music.data import youtube_titles
+from musicwire.music.normalize import (TrackTitle, channel_artist, normalize_isrc, parse_title,
+                                       parse_titles)
+
+
+class NormalizeTestCase(TestCase):
+    def test_parse_title_corpus(self):
+        """
+        Expect artist, title and featured artists of every title in the corpus.
+        """
+        for case in youtube_titles():
+            with self.subTest(title=case['title']):
+                title = parse_title(case['title'], channel_artist(case['channel']))
+
+                self.assertEqual(title.artist, case['artist'])
+                self.assertEqual(title.title, case['name'])
+                self.assertListEqual(list(title.featured), case['featured'])
+
+    def test_parse_title(self):
+        title = parse_title('Artist - Title (Official Video) [HD] ft. X & Y')
+
+        self.assertEqual(title, TrackTitle(title='Title', artist='Artist',
+                                           featured=('X', 'Y')))
+
+    def test_parse_title_if_title_has_no_artist(self):
+        """
+        Expect the given artist, and the title as it is if nothing is noise.
+        """
+        self.assertEqual(parse_title('Title', 'Channel Artist'),
+                         TrackTitle(title='Title', artist='Channel Artist'))
+        self.assertEqual(parse_title('Title'), TrackTitle(title='Title'))
+
+    def test_parse_title_if_only_noise(self):
+        self.assertEqual(parse_title('(Official Video)').title, '(Official Video)')
+
+    def test_parse_titles(self):
+        titles = parse_titles(['A - Song', 'Other Song'], ['Channel', 'Channel'])
+
+        self.assertEqual([title.artist for title in titles], ['A', 'Channel'])
+
+    def test_channel_artist(self):
+        self.assertEqual(channel_artist('Test Artist - Topic'), 'Test Artist')
+        self.assertEqual(channel_artist('TestArtistVEVO'), 'TestArtist')
+        self.assertIsNone(channel_artist('Test Records'))
+
+    def test_normalize_isrc(self):
+        """
+        Expect separators to be removed, letters uppercased and invalid ones dropped.
+        """
+        self.assertEqual(normalize_isrc('us-s1z-99-00001'), 'USS1Z9900001')
+        self.assertEqual(normalize_isrc(' USS1Z 99 00001 '), 'USS1Z9900001')
+        self.assertIsNone(normalize_isrc('USS1Z990000'))
+        self.assertIsNone(normalize_isrc('USS1Z99000012'))
+        self.assertIsNone(normalize_isrc('USS1Z99/0001'))
+        self.assertIsNone(normalize_isrc(None))
@@ -1,203 +1,439 @@
+import datetime
 from unittest import mock
 from unittest.mock import patch
 
 from django.test import TestCase
-from rest_framework.test import APIClient
+from model_mommy import mommy
 
-from musicwire.core.exceptions import ValidationError
+from musicwire.account.models import UserProfile
+from musicwire.core.exceptions import ProviderResponseError, ValidationError
+from musicwire.music.models import Playlist, PlaylistTrack
 from musicwire.provider.adapters.spotify import Adapter
+from musicwire.provider.datastructures import ClientResult
+
+
+def page(items, total=None):
+    result = {'items': items, 'total': len(items) if total is None else total}
+    return ClientResult(result=result, error=False, error_msg=None)
+
+
+def track_item(uri, added_at='2020-12-31T00:00:00Z'):
+    return {
+        'added_at': added_at,
+        'track': {
+            'album': {'name': 'Test Album Name'},
+            'name': 'Test Name',
+            'artists': [{'name': 'Test Artist Name'}],
+            'external_ids': {'isrc': 'USTEST000001'},
+            'uri': uri
+        }
+    }
 
 
 class SpotifyAdapterTestCase(TestCase):
     def setUp(self) -> None:
-        self.spotify_client = APIClient()
-        self.adapter = Adapter(token='test')
+        self.user = mommy.make(UserProfile)
+        self.adapter = Adapter(token='test', user=self.user)
 
-    def test_collector_if_limit_over_50(self):
+    def test_collector_if_limit_over_max_page_size(self):
         """
         Expect validation error for too big limit parameter.
         """
         with self.assertRaises(ValidationError) as ve:
-            self.adapter.collector(mock.MagicMock(), limit=100, offset=0)
+            self.adapter.collector(mock.MagicMock(), 'me/tracks', limit=100, offset=0)
 
         self.assertIsNotNone(ve)
 
-    def test_collector_if_response_is_empty(self):
+    def test_collector_if_response_has_error(self):
         """
-        Expect to get None result from method.
+        Expect provider error of the first page to be raised before paging.
         """
-        fn = mock.MagicMock(return_value=None)
+        fn = mock.MagicMock(return_value=ClientResult(result=None, error=True,
+                                                      error_msg='Invalid token'))
 
-        response = self.adapter.collector(fn, limit=50, offset=0)
+        with self.assertRaises(ProviderResponseError):
+            self.adapter.collector(fn, 'me/tracks', limit=50, offset=0)
 
-        self.assertListEqual(response, [])
+        fn.assert_called_once()
 
-    def test_collector_if_collect_concurrently_called(self):
+    def test_collector_if_single_page(self):
         """
-        Expect everything goes well and collect_concurrently called end of the program.
+        Expect first page to be reused instead of being requested again.
         """
-        return_value = {'total': 20}
-        fn = mock.MagicMock(return_value=return_value)
+        fn = mock.MagicMock(return_value=page([], total=20))
         fn.__name__ = 'test'
 
-        with patch("musicwire.provider.adapters.spotify.Adapter.collect_concurrently") as cc:
-            self.adapter.collector(fn, limit=50, offset=0)
+        responses = list(self.adapter.collector(fn, 'me/tracks', limit=50, offset=0))
 
-        cc.assert_called()
-        cc.assert_called_once_with(fn, [{'limit': 50, 'offset': 0}], 'test')
+        fn.assert_called_once_with(request_data={'limit': 50, 'offset': 0})
+        self.assertEqual(len(responses), 1)
 
-    def test_saved_tracks_if_no_tracks_returns(self):
+    def test_collector_if_total_is_multiple_of_limit(self):
+        fn = mock.MagicMock(return_value=page([], total=100))
+        fn.__name__ = 'test'
+
+        responses = list(self.adapter.collector(fn, 'me/tracks', limit=50, offset=0))
+
+        self.assertEqual(fn.call_count, 2)
+        fn.assert_called_with({'limit': 50, 'offset': 50})
+        self.assertEqual(len(responses), 2)
+
+    def test_collector_if_limit_not_given(self):
         """
-        Expect no result due to access token is wrong.
+        Expect pages as large as the endpoint allows.
         """
-        result = self.adapter.saved_tracks(50, 0)
+        fn = mock.MagicMock(return_value=page([], total=20))
 
-        self.assertListEqual(result, [])
+        list(self.adapter.collector(fn, 'playlists/Test Id/tracks', limit=None, offset=0))
+
+        fn.assert_called_once_with(request_data={'limit': 100, 'offset': 0})
+
+    def test_collect_concurrently_if_window_is_bounded(self):
+        """
+        Expect at most max_in_flight calls to be submitted ahead of the consumer.
+        """
+        self.adapter.max_in_flight = 2
+        fn = mock.MagicMock(side_effect=lambda data: data)
+
+        executor = self.adapter.executor
+        with patch.object(executor, 'submit', wraps=executor.submit) as submit:
+            results = self.adapter.collect_concurrently(fn, range(10))
+            next(results)
+            self.assertLessEqual(submit.call_count, 3)
+            self.assertEqual(len([next(results)] + list(results)), 9)
 
     def test_saved_tracks_if_track_exists(self):
-        return_value = [
-            {
-                "items": [
-                    {
-                        "track": {
-                            "id": "Test ID",
-                            "album": {"name": "Test Album Name"},
-                            "name": "Test Name",
-                            "artists": [
-                                {"name": "Test Artist Name"}
-                            ],
-                            "uri": "Test Uri"
-                        }
-                    }
-                ]
-            }
-        ]
-        expected_result = [
-            {
-                'track_id': return_value[0]['items'][0]['track']['id'],
-                'track_album_name': return_value[0]['items'][0]['track']['album'][
-                    'name'],
-                'track_name': return_value[0]['items'][0]['track']['name'],
-                'track_artist': return_value[0]['items'][0]['track']['artists'][0][
-                    'name'],
-                'track_uri': return_value[0]['items'][0]['track']['uri']
-            }
-        ]
-
-        self.adapter.collector = mock.MagicMock(return_value=return_value)
-
-        result = self.adapter.saved_tracks()
-
-        self.assertEqual(result, expected_result)
-
-    def test_playlists_if_no_playlist_returns(self):
-        """
-        Expect no result due to access token is wrong so client returns error.
+        self.adapter.collector = mock.MagicMock(
+            return_value=[page([track_item('Test Uri')])]
+        )
+
+        result = self.adapter.saved_tracks(playlist_id=self.adapter.saved_tracks_id)
+
+        self.assertEqual([track.remote_id for track in result[0]], ['Test Uri'])
+        self.assertEqual(result[0][0].isrc, 'USTEST000001')
+        self.assertEqual(PlaylistTrack.objects.filter(user=self.user).count(), 1)
+
+    def test_saved_tracks_if_tracks_not_kept(self):
         """
-        result = self.adapter.playlists()
+        Expect pages to be written without keeping created tracks.
+        """
+        self.adapter.collector = mock.MagicMock(return_value=[
+            page([track_item('Test Uri 1')]), page([track_item('Test Uri 2')])
+        ])
+
+        result = self.adapter.saved_tracks(playlist_id=self.adapter.saved_tracks_id,
+                                           keep_tracks=False)
+
+        self.assertListEqual(result, [])
+        self.assertEqual(PlaylistTrack.objects.filter(user=self.user).count(), 2)
+
+    def test_saved_tracks_if_page_has_etag(self):
+        """
+        Expect ETag of a page to be stored once its tracks are written.
+        """
+        response = page([track_item('Test Uri')])
+        response.etag, response.validator_key = '"v1"', 'etag:test'
+        self.adapter.collector = mock.MagicMock(return_value=[response])
+
+        with mock.patch('musicwire.provider.etags.cache') as cache:
+            self.adapter.saved_tracks(playlist_id=self.adapter.saved_tracks_id)
+
+        self.assertEqual(PlaylistTrack.objects.filter(user=self.user).count(), 1)
+        cache.set.assert_called_once()
+        self.assertEqual(cache.set.call_args[0][:2],
+                         ('etag:test', {'etag': '"v1"', 'page': {'total': 1}}))
+
+    def test_saved_tracks_if_write_fails(self):
+        """
+        Expect ETag of a page not to be stored if its tracks are not written.
+        """
+        response = page([track_item('Test Uri')])
+        response.etag, response.validator_key = '"v1"', 'etag:test'
+        self.adapter.collector = mock.MagicMock(return_value=[response])
+
+        with mock.patch('musicwire.provider.etags.cache') as cache, \
+                mock.patch('musicwire.music.ingest.BulkWriter.insert',
+                           side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.adapter.saved_tracks(playlist_id=self.adapter.saved_tracks_id)
+
+        cache.set.assert_not_called()
+
+    def test_saved_tracks_if_not_modified(self):
+        """
+        Expect pages answered as not modified to be skipped.
+        """
+        not_modified = ClientResult(result={'items': [], 'total': 1}, error=False,
+                                    error_msg=None, not_modified=True)
+        self.adapter.collector = mock.MagicMock(return_value=[not_modified])
+
+        result = self.adapter.saved_tracks(playlist_id=self.adapter.saved_tracks_id)
 
         self.assertListEqual(result, [])
 
+    def test_saved_tracks_if_cursor_reached(self):
+        """
+        Expect pages to be fetched one by one until a page reaches ingested tracks.
+        """
+        cursor = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        playlist = mommy.make(Playlist, remote_id=self.adapter.saved_tracks_id,
+                              user=self.user, synced_added_at=cursor)
+        mommy.make(PlaylistTrack, remote_id='Old Uri', playlist=playlist, user=self.user,
+                   added_at=cursor)
+        self.adapter.collector = mock.MagicMock()
+        client = self.adapter.spotify_client
+        client.get_saved_tracks = mock.MagicMock(side_effect=[
+            page([track_item('New Uri 1', '2020-03-01T00:00:00Z')], total=150),
+            page([track_item('New Uri 2', '2020-02-01T00:00:00Z'),
+                  track_item('Old Uri', '2020-01-01T00:00:00Z'),
+                  track_item('Older Uri', '2019-01-01T00:00:00Z')], total=150),
+        ])
+
+        self.adapter.saved_tracks(playlist_id=self.adapter.saved_tracks_id, limit=50)
+
+        self.adapter.collector.assert_not_called()
+        self.assertEqual(client.get_saved_tracks.call_count, 2)
+        client.get_saved_tracks.assert_called_with(request_data={'limit': 50, 'offset': 50})
+        self.assertEqual(PlaylistTrack.objects.filter(user=self.user).count(), 4)
+        playlist.refresh_from_db()
+        self.assertEqual(playlist.synced_added_at,
+                         datetime.datetime(2020, 3, 1, tzinfo=datetime.timezone.utc))
+
+    def test_saved_tracks_if_added_at_cursor(self):
+        """
+        Expect the page after one whose tracks were all added at the cursor to
+        be fetched too, and those tracks to be ingested if they are new.
+        """
+        cursor = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        mommy.make(Playlist, remote_id=self.adapter.saved_tracks_id, user=self.user,
+                   synced_added_at=cursor)
+        client = self.adapter.spotify_client
+        client.get_saved_tracks = mock.MagicMock(return_value=page(
+            [track_item('Test Uri', '2020-01-01T00:00:00Z')], total=150
+        ))
+
+        self.adapter.saved_tracks(playlist_id=self.adapter.saved_tracks_id, limit=50)
+
+        client.get_saved_tracks.assert_called_once()
+        self.assertTrue(PlaylistTrack.objects.filter(remote_id='Test Uri').exists())
+
+    def test_saved_tracks_if_first_crawl_interrupted(self):
+        """
+        Expect no cursor to be stored, next crawl fetches every page again.
+        """
+        playlist = mommy.make(Playlist, remote_id=self.adapter.saved_tracks_id,
+                              user=self.user)
+
+        def pages():
+            yield page([track_item('Test Uri', '2020-03-01T00:00:00Z')], total=100)
+            raise ProviderResponseError('Test Error')
+
+        self.adapter.collector = mock.MagicMock(return_value=pages())
+
+        with self.assertRaises(ProviderResponseError):
+            self.adapter.saved_tracks(playlist_id=self.adapter.saved_tracks_id)
+
+        playlist.refresh_from_db()
+        self.assertIsNone(playlist.synced_added_at)
+
+    def test_saved_tracks_if_cursor_and_not_modified(self):
+        """
+        Expect a single request when the newest page did not change.
+        """
+        mommy.make(Playlist, remote_id=self.adapter.saved_tracks_id, user=self.user,
+                   synced_added_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        client = self.adapter.spotify_client
+        client.get_saved_tracks = mock.MagicMock(return_value=ClientResult(
+            result={'items': [], 'total': 500}, error=False, error_msg=None,
+            not_modified=True
+        ))
+
+        self.adapter.saved_tracks(playlist_id=self.adapter.saved_tracks_id)
+
+        client.get_saved_tracks.assert_called_once()
+
     def test_playlists_if_playlist_exists(self):
-        return_value = [
-            {
-                "items": [
-                    {
-                        "id": "Test Playlist ID",
-                        "name": "Test Name",
-                        "public": True,
-                        "uri": "Test Uri"
-                    }
-                ]
-            }
-        ]
-
-        expected_result = [
-            {
-                'playlist_id': return_value[0]['items'][0]['id'],
-                'playlist_name': return_value[0]['items'][0]['name'],
-                'playlist_public': return_value[0]['items'][0]['public'],
-                'playlist_uri': return_value[0]['items'][0]['uri']
-            }
-        ]
-
-        self.adapter.collector = mock.MagicMock(return_value=return_value)
+        self.adapter.collector = mock.MagicMock(return_value=[
+            page([{'id': 'Test Playlist ID 1', 'name': 'Test Name', 'public': True}]),
+            page([{'id': 'Test Playlist ID 2', 'name': 'Test Name', 'public': False}]),
+        ])
 
         result = self.adapter.playlists()
 
-        self.assertEqual(result, expected_result)
+        self.assertEqual([playlist.status for playlist in result], ['public', 'private'])
+        self.assertEqual(Playlist.objects.filter(user=self.user).count(), 2)
+
+    def test_albums_if_albums_exists(self):
+        album = {'album': {'name': 'Test Name', 'popularity': 1, 'uri': 'Test Uri'}}
+        self.adapter.collector = mock.MagicMock(return_value=[page([album])])
 
-    def test_albums_if_no_album_returns(self):
         result = self.adapter.albums()
 
+        self.assertEqual(result, [{'album_id': 'Test Uri', 'album_name': 'Test Name',
+                                   'album_popularity': 1}])
+
+    def test_playlist_tracks(self):
+        self.adapter.collector = mock.MagicMock(return_value=[])
+
+        self.adapter.playlist_tracks("Test Id")
+
+        fields = self.adapter.collector.call_args[1]
+        self.assertEqual(fields['playlist_id'], "Test Id")
+        self.assertEqual(fields['fields'], self.adapter.playlist_tracks_fields)
+
+    def test_playlist_tracks_if_snapshot_synced(self):
+        """
+        Expect no request for a playlist whose snapshot was crawled before.
+        """
+        mommy.make(Playlist, remote_id='Test Id', user=self.user, snapshot_id='1',
+                   synced_snapshot_id='1')
+        self.adapter.collector = mock.MagicMock()
+
+        result = self.adapter.playlist_tracks("Test Id", skip_synced=True)
+
+        self.adapter.collector.assert_not_called()
         self.assertListEqual(result, [])
 
-    def test_albums_if_albums_exists(self):
-        return_value = [
-            {
-                "items": [
-                    {
-                        "album": {
-                            "id": "Test Album ID",
-                            "name": "Test Name",
-                            "popularity": 1,
-                            "uri": "Test Uri"
-                        }
-                    }
-                ]
-            }
-        ]
-
-        expected_result = [
-            {
-                'album_id': return_value[0]['items'][0]["album"]['id'],
-                'album_name': return_value[0]['items'][0]["album"]['name'],
-                'album_popularity': return_value[0]['items'][0]["album"]['popularity'],
-                'album_uri': return_value[0]['items'][0]["album"]['uri']
-            }
-        ]
-
-        self.adapter.collector = mock.MagicMock(return_value=return_value)
+    def test_playlist_tracks_if_synced_playlist_is_asked(self):
+        """
+        Expect tracks of a synced playlist to be returned unless asked to skip it.
+        """
+        mommy.make(Playlist, remote_id='Test Id', user=self.user, snapshot_id='1',
+                   synced_snapshot_id='1')
+        self.adapter.collector = mock.MagicMock(return_value=[page([track_item('Uri')])])
 
-        result = self.adapter.albums()
+        result = self.adapter.playlist_tracks("Test Id")
 
-        self.assertEqual(result, expected_result)
+        self.adapter.collector.assert_called_once()
+        self.assertEqual(len(result[0]), 1)
+
+    def test_playlist_tracks_if_snapshot_changed(self):
+        """
+        Expect tracks to be crawled and the snapshot to be marked as synced.
+        """
+        playlist = mommy.make(Playlist, remote_id='Test Id', user=self.user,
+                              snapshot_id='2', synced_snapshot_id='1')
+        self.adapter.collector = mock.MagicMock(return_value=[page([track_item('Uri')])])
 
-    @patch("musicwire.provider.adapters.spotify.Adapter.get_saved_tracks")
-    def test_playlist_tracks(self, get_saved_tracks):
         self.adapter.playlist_tracks("Test Id")
 
-        get_saved_tracks.assert_called_once()
+        playlist.refresh_from_db()
+        self.assertEqual(playlist.synced_snapshot_id, '2')
+        self.assertEqual(PlaylistTrack.objects.filter(playlist=playlist).count(), 1)
+
+    def test_playlists_if_snapshot_changed(self):
+        playlist = mommy.make(Playlist, remote_id='Test Id', user=self.user,
+                              provider='spotify', snapshot_id='1', synced_snapshot_id='1')
+        self.adapter.collector = mock.MagicMock(return_value=[page([
+            {'id': 'Test Id', 'name': 'Test Name', 'public': True, 'snapshot_id': '2'}
+        ])])
+
+        self.adapter.playlists()
+
+        playlist.refresh_from_db()
+        self.assertEqual(playlist.snapshot_id, '2')
+        self.assertFalse(playlist.is_synced)
 
     def test_create_playlist_if_playlist_has_error(self):
-        request_data = {
-            'name': 'Test Name'
-        }
-        result = self.adapter.create_playlist("Test User ID", **request_data)
+        self.adapter.spotify_client.create_a_playlist = mock.MagicMock(
+            return_value=ClientResult(result=None, error=True, error_msg='Test Error')
+        )
+
+        with self.assertRaises(ProviderResponseError):
+            self.adapter.create_playlist({'playlist_name': 'Test Name',
+                                          'user_id': 'Test User ID'})
+
+    def test_current_user_id_if_asked_again(self):
+        """
+        Expect the user to be requested once per adapter.
+        """
+        client = self.adapter.spotify_client
+        client.get_current_user = mock.MagicMock(return_value=ClientResult(
+            result={'id': 'Test User ID'}, error=False, error_msg=None
+        ))
+
+        self.assertEqual(self.adapter.current_user_id(), 'Test User ID')
+        self.assertEqual(self.adapter.current_user_id(), 'Test User ID')
 
-        self.assertIsNone(result)
+        client.get_current_user.assert_called_once_with()
 
     def test_create_playlist_if_playlist_created(self):
         client = self.adapter.spotify_client
+        client.create_a_playlist = mock.MagicMock(return_value=ClientResult(
+            result={'id': 'Test ID', 'name': 'Test Name', 'public': True},
+            error=False, error_msg=None
+        ))
+
+        result = self.adapter.create_playlist({
+            'playlist_name': 'Test Name',
+            'privacy_status': True,
+            'description': 'Test Description',
+            'user_id': 'Test User ID'
+        })
+
+        client.create_a_playlist.assert_called_with("Test User ID", {
+            'name': 'Test Name', 'public': True, 'description': 'Test Description'
+        })
+        self.assertEqual(result['remote_id'], 'Test ID')
+
+    def test_add_tracks_to_playlist_if_chunked(self):
+        """
+        Expect 100 uris per request and tracks of a failed request left out.
+        """
+        client = self.adapter.spotify_client
+        client.add_tracks_to_playlist = mock.MagicMock(side_effect=[
+            ClientResult(result={}, error=False, error_msg=None),
+            ClientResult(result=None, error=True, error_msg='Test Error'),
+            ClientResult(result={}, error=False, error_msg=None),
+        ])
+        track_ids = [f'spotify:track:{i}' for i in range(250)]
 
-        request_data = {
-            'name': 'Test Name',
-            'public': True,
-            'collaborative': 'Test Collaborative',
-            'description': 'Test Description'
-        }
+        added = self.adapter.add_tracks_to_playlist('Test Playlist', track_ids)
+
+        sizes = [len(call[0][1]['uris']) for call in client.add_tracks_to_playlist.call_args_list]
+        self.assertEqual(sizes, [100, 100, 50])
+        self.assertEqual(added, track_ids[:100] + track_ids[200:])
 
-        client.create_a_playlist = mock.MagicMock()
+    def test_match_tracks_if_isrc_found(self):
+        """
+        Expect tracks sharing an ISRC to be looked up once and not searched by name.
+        """
+        tracks = [PlaylistTrack(name='Song', isrc='USTEST000001'),
+                  PlaylistTrack(name='Song (Live)', isrc='USTEST000001')]
+        self.adapter.spotify_client.search = mock.MagicMock(return_value=ClientResult(
+            result={'tracks': {'items': [{'uri': 'Uri', 'name': 'Song', 'type': 'track'}]}},
+            error=False, error_msg=None
+        ))
 
-        self.adapter.create_playlist("Test User ID", **request_data)
+        result = self.adapter.match_tracks(tracks)
 
-        client.create_a_playlist.assert_called_with("Test User ID", request_data)
+        self.adapter.spotify_client.search.assert_called_once_with(
+            params={'type': 'track', 'q': 'isrc:USTEST000001', 'limit': 1}
+        )
+        self.assertEqual([match['id'] for match in result], ['Uri', 'Uri'])
 
-    def test_add_tracks_to_playlist(self):
-        ...
+    def test_match_tracks_if_isrc_not_found(self):
+        """
+        Expect tracks without a known ISRC to fall back to search by name, in order.
+        """
+        tracks = [PlaylistTrack(name='Unknown', isrc='USTEST000002'),
+                  PlaylistTrack(name='Known', isrc='USTEST000001'),
+                  PlaylistTrack(name='No Isrc')]
+        self.adapter.search_isrc = mock.MagicMock(
+            side_effect=lambda isrc: {'id': isrc} if isrc == 'USTEST000001' else {}
+        )
+        self.adapter.search = mock.MagicMock(
+            side_effect=lambda name: {'id': name}
+        )
+
+        result = self.adapter.match_tracks(tracks)
+
+        self.assertEqual([match['id'] for match in result],
+                         ['Unknown', 'USTEST000001', 'No Isrc'])
+        self.assertEqual(self.adapter.search.call_count, 2)
 
     def test_upload_playlist_cover_image(self):
         ...
 
     def test_search(self):
-        ...
\ No newline at end of file
+        ...
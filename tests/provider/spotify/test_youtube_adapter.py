@@ -0,0 +1,214 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase
+from model_mommy import mommy
+
+from musicwire.account.models import UserProfile
+from musicwire.core.exceptions import ProviderResponseError
+from musicwire.music.models import PlaylistTrack, SearchErrorTrack
+from musicwire.provider.adapters.youtube import Adapter
+from musicwire.provider.datastructures import ClientResult
+
+
+class YoutubeAdapterTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = mommy.make(UserProfile)
+        self.adapter = Adapter(token='test', user=self.user)
+
+    def test_add_tracks_to_playlist_if_one_fails(self):
+        """
+        Expect a request per track and the failed track left out.
+        """
+        def add_track_to_playlist(playlist_id, track_id):
+            if track_id == 'Test Video 2':
+                raise ProviderResponseError('Test Error')
+
+        self.adapter.add_track_to_playlist = mock.MagicMock(
+            side_effect=add_track_to_playlist
+        )
+
+        added = self.adapter.add_tracks_to_playlist(
+            'Test Playlist', ['Test Video 1', 'Test Video 2', 'Test Video 3']
+        )
+
+        self.assertEqual(self.adapter.add_track_to_playlist.call_count, 3)
+        self.assertEqual(added, ['Test Video 1', 'Test Video 3'])
+
+    def test_search_many_if_queries_repeat(self):
+        """
+        Expect one search per normalized query and results for every query.
+        """
+        def search(query):
+            if query == 'Missing':
+                raise ProviderResponseError('Test Error')
+            return {'id': query}
+
+        self.adapter.search = mock.MagicMock(side_effect=search)
+
+        results = self.adapter.search_many(['Test Song', 'test  song ', 'Missing'])
+
+        self.assertEqual(self.adapter.search.call_count, 2)
+        self.assertEqual(results, {
+            'Test Song': {'id': 'Test Song'},
+            'test  song ': {'id': 'Test Song'},
+            'Missing': None,
+        })
+
+    def test_search_many_if_search_fails(self):
+        """
+        Expect a search error to be recorded and the query to be searched again
+        by the next call instead of the failure being kept.
+        """
+        self.adapter.search = mock.MagicMock(side_effect=[
+            ProviderResponseError('Test Error'), {'id': 'Test Video'}
+        ])
+
+        first = self.adapter.search_many(['Test Song'])
+        second = self.adapter.search_many(['Test Song'])
+
+        self.assertEqual(first, {'Test Song': None})
+        self.assertEqual(second, {'Test Song': {'id': 'Test Video'}})
+        error = SearchErrorTrack.objects.get(user=self.user)
+        self.assertEqual(error.name, 'Test Song')
+        self.assertIn('Test Error', error.response)
+
+    def test_match_tracks_if_artist_is_known(self):
+        """
+        Expect the artist to be searched with the name of tracks which have one.
+        """
+        self.adapter.search = mock.MagicMock(side_effect=lambda query: {'id': query})
+        tracks = [PlaylistTrack(name='Song', artist='Artist'), PlaylistTrack(name='Song')]
+
+        result = self.adapter.match_tracks(tracks)
+
+        self.assertEqual([match['id'] for match in result], ['Artist Song', 'Song'])
+
+    def test_videos_if_many_ids(self):
+        """
+        Expect a request per 50 videos and their details by id.
+        """
+        def get_videos(params):
+            return ClientResult(result={'items': [{
+                'id': video_id,
+                'snippet': {'channelTitle': 'Test Artist - Topic', 'categoryId': '10'},
+                'contentDetails': {'duration': 'PT1H2M3S'},
+            } for video_id in params['id'].split(',')]}, error=False, error_msg=None)
+
+        self.adapter.youtube_client.get_videos = mock.MagicMock(side_effect=get_videos)
+        video_ids = [f'video{i}' for i in range(120)]
+
+        videos = self.adapter.videos(video_ids)
+
+        self.assertEqual(self.adapter.youtube_client.get_videos.call_count, 3)
+        self.assertNotIn('maxResults', self.adapter.youtube_client.get_videos.call_args[1]['params'])
+        self.assertEqual(len(videos), 120)
+        self.assertDictEqual(videos['video119'], {
+            'channel': 'Test Artist - Topic', 'artist': 'Test Artist', 'duration_ms': 3723000,
+            'category': '10'
+        })
+
+    def test_save_tracks_if_not_a_music_channel(self):
+        """
+        Expect the channel to be kept but not used as the artist.
+        """
+        tracks = {'items': [{'id': 'Test Item', 'snippet': {
+            'title': 'Test Song', 'resourceId': {'videoId': 'Test Video'}
+        }}]}
+        response = ClientResult(result={'items': [{
+            'id': 'Test Video',
+            'snippet': {'channelTitle': 'Test Records', 'categoryId': '10'},
+            'contentDetails': {'duration': 'PT3M'},
+        }]}, error=False, error_msg=None)
+        writer = mock.MagicMock()
+
+        rows = self.adapter.save_tracks(writer, tracks, None, set(),
+                                        self.adapter.parse_videos(response))
+
+        row = dict(zip(self.adapter.track_fields, rows[0]))
+        self.assertIsNone(row['artist'])
+        self.assertEqual(row['channel'], 'Test Records')
+        self.assertEqual(row['remote_id'], 'Test Video')
+
+    def test_save_tracks_if_title_names_featured_artists(self):
+        tracks = {'items': [{'id': 'Test Item', 'snippet': {
+            'title': 'Test Artist - Test Song (feat. X & Y) [Official Video]',
+            'resourceId': {'videoId': 'Test Video'}
+        }}]}
+
+        rows = self.adapter.save_tracks(mock.MagicMock(), tracks, None, set())
+
+        row = dict(zip(self.adapter.track_fields, rows[0]))
+        self.assertEqual(row['name'], 'Test Song')
+        self.assertEqual(row['artist'], 'Test Artist')
+        self.assertEqual(row['featured'], 'X, Y')
+
+    def test_save_tracks_if_video_stored(self):
+        """
+        Expect videos stored before or earlier in the crawl to be skipped.
+        """
+        tracks = {'items': [
+            {'id': f'Test Item {i}', 'snippet': {
+                'title': 'Test Song', 'resourceId': {'videoId': video_id}
+            }} for i, video_id in enumerate(['Stored Video', 'Test Video', 'Test Video'])
+        ]}
+        db_tracks = {'Stored Video'}
+
+        self.assertEqual(self.adapter.video_ids(tracks, db_tracks),
+                         ['Test Video', 'Test Video'])
+        rows = self.adapter.save_tracks(mock.MagicMock(), tracks, None, db_tracks)
+
+        self.assertEqual([row[3] for row in rows], ['Test Video', 'Test Video'])
+        self.assertEqual(db_tracks, {'Stored Video', 'Test Video'})
+
+    def test_playlist_tracks_if_videos_are_looked_up(self):
+        """
+        Expect videos of a page to be looked up off the writer's thread, with
+        the page.
+        """
+        pages = {None: 'Test Page', 'Test Page': None}
+        looked_up_on = []
+
+        def get_playlist_tracks(params):
+            return ClientResult(result={
+                'pageInfo': {'totalResults': 2},
+                'nextPageToken': pages[params['pageToken']],
+                'items': [{'id': f"{params['pageToken']} Item", 'snippet': {
+                    'title': 'Test Artist - Test Song',
+                    'resourceId': {'videoId': f"{params['pageToken']} Video"}
+                }}],
+            }, error=False, error_msg=None)
+
+        def get_videos(params):
+            looked_up_on.append(threading.current_thread())
+            return ClientResult(result={'items': []}, error=False, error_msg=None)
+
+        self.adapter.youtube_client.get_playlist_tracks = mock.MagicMock(
+            side_effect=get_playlist_tracks)
+        self.adapter.youtube_client.get_videos = mock.MagicMock(side_effect=get_videos)
+
+        tracks = self.adapter.playlist_tracks('Test Playlist', limit=1)
+
+        self.assertEqual([track.remote_id for page in tracks for track in page],
+                         ['None Video', 'Test Page Video'])
+        self.assertEqual(len(looked_up_on), 2)
+        self.assertNotIn(threading.current_thread(), looked_up_on)
+
+    def test_videos_if_request_fails(self):
+        """
+        Expect tracks to be saved without details instead of failing the crawl.
+        """
+        self.adapter.youtube_client.get_videos = mock.MagicMock(return_value=ClientResult(
+            result=None, error=True, error_msg='Test Error'
+        ))
+
+        with self.assertLogs('musicwire.provider.adapters.youtube', 'WARNING'):
+            videos = self.adapter.videos(['video1'])
+
+        self.assertDictEqual(videos, {})
+
+    def test_parse_duration(self):
+        self.assertEqual(self.adapter.parse_duration('PT3M21S'), 201000)
+        self.assertEqual(self.adapter.parse_duration('P1DT1S'), 86401000)
+        self.assertEqual(self.adapter.parse_duration('PT0S'), 0)
+        self.assertIsNone(self.adapter.parse_duration('3:21'))
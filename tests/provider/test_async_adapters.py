@@ -0,0 +1,157 @@
+import asyncio
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from model_mommy import mommy
+
+from musicwire.account.models import UserProfile
+from musicwire.provider.adapters import spotify, youtube
+from musicwire.provider.datastructures import ClientResult
+
+
+async def collect(pages) -> list:
+    return [page async for page in pages]
+
+
+def coroutine_mock(return_value):
+    async def aux(*args, **kwargs):
+        return return_value
+    return mock.MagicMock(side_effect=aux)
+
+
+class AsyncSpotifyAdapterTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = mommy.make(UserProfile)
+        self.adapter = spotify.AsyncAdapter(token='test', user=self.user)
+
+    def test_search_if_track_found(self):
+        search_result = {
+            'tracks': {'items': [{'uri': 'Test Uri', 'name': 'Test Name', 'type': 'track'}]}
+        }
+        self.adapter.spotify_client.search = coroutine_mock(
+            ClientResult(result=search_result, error=False, error_msg=None)
+        )
+
+        result = asyncio.run(self.adapter.search('Test Name'))
+
+        self.assertEqual(result, {'id': 'Test Uri', 'name': 'Test Name', 'type': 'track'})
+
+    def test_search_many_if_queries_repeat(self):
+        self.adapter.search = coroutine_mock({'id': 'Test Uri'})
+
+        results = asyncio.run(self.adapter.search_many(['Test Name', 'test name']))
+
+        self.adapter.search.assert_called_once_with('Test Name')
+        self.assertEqual(results, {'Test Name': {'id': 'Test Uri'},
+                                   'test name': {'id': 'Test Uri'}})
+
+    def test_collector_if_pages_gathered(self):
+        """
+        Expect every page to be requested on the same event loop.
+        """
+        fn = coroutine_mock(ClientResult(result={'total': 120, 'items': []},
+                                         error=False, error_msg=None))
+
+        responses = asyncio.run(collect(self.adapter.collector(fn, 'me/tracks', limit=50,
+                                                               offset=0)))
+
+        self.assertEqual(len(responses), 3)
+
+    @override_settings(PROVIDER_ASYNC_MAX_CONNECTIONS={'spotify': 2})
+    def test_collector_if_pages_are_bounded(self):
+        """
+        Expect at most PROVIDER_ASYNC_MAX_CONNECTIONS pages to be awaited at a time.
+        """
+        running, peak = 0, 0
+
+        async def fn(request_data):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0)
+            running -= 1
+            return ClientResult(result={'total': 500, 'items': []}, error=False,
+                                error_msg=None)
+
+        responses = asyncio.run(collect(self.adapter.collector(fn, 'me/tracks', limit=50,
+                                                               offset=0)))
+
+        self.assertEqual(len(responses), 10)
+        self.assertEqual(peak, 2)
+
+    @override_settings(PROVIDER_ASYNC_MAX_CONNECTIONS={'spotify': 2})
+    def test_collector_if_consumer_is_slow(self):
+        """
+        Expect pages to be requested only as far as the consumer took them.
+        """
+        fn = coroutine_mock(ClientResult(result={'total': 500, 'items': []},
+                                         error=False, error_msg=None))
+
+        async def take_two():
+            pages = self.adapter.collector(fn, 'me/tracks', limit=50, offset=0)
+            await pages.__anext__()
+            await pages.__anext__()
+            await asyncio.sleep(0.01)
+            await pages.aclose()
+
+        asyncio.run(take_two())
+
+        self.assertLessEqual(fn.call_count, 4)
+
+    def test_playlists_if_pages_are_written_as_they_arrive(self):
+        """
+        Expect the writer to get every page of the crawl off the event loop.
+        """
+        async def get_playlists(request_data):
+            return ClientResult(result={'total': 120, 'items': [request_data['offset']]},
+                                error=False, error_msg=None)
+
+        def save_playlists(playlists):
+            with self.assertRaises(RuntimeError):
+                asyncio.get_running_loop()
+            return sorted(item for response in playlists for item in response.result['items'])
+
+        self.adapter.spotify_client.get_playlists = get_playlists
+        self.adapter.save_playlists = save_playlists
+
+        result = asyncio.run(self.adapter.playlists())
+
+        self.assertListEqual(result, [0, 50, 100])
+
+    def test_create_playlist_if_user_id_is_awaited(self):
+        """
+        Expect current user to be requested with the async client.
+        """
+        self.adapter.spotify_client.get_current_user = coroutine_mock(
+            ClientResult(result={'id': 'Test User'}, error=False, error_msg=None)
+        )
+        self.adapter.spotify_client.create_a_playlist = coroutine_mock(
+            ClientResult(result={'id': 'Test Id'}, error=False, error_msg=None)
+        )
+        self.adapter.save_created_playlist = mock.MagicMock(return_value={'remote_id': 'Test Id'})
+
+        result = asyncio.run(self.adapter.create_playlist({'playlist_name': 'Test Name'}))
+        asyncio.run(self.adapter.create_playlist({'playlist_name': 'Other Name'}))
+
+        self.assertEqual(result, {'remote_id': 'Test Id'})
+        self.assertEqual(self.adapter.spotify_client.create_a_playlist.call_args[0][0],
+                         'Test User')
+        self.assertEqual(self.adapter.spotify_client.get_current_user.call_count, 1)
+
+
+class AsyncYoutubeAdapterTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = mommy.make(UserProfile)
+        self.adapter = youtube.AsyncAdapter(token='test', user=self.user)
+
+    def test_add_track_to_playlist(self):
+        self.adapter.youtube_client.add_tracks_to_playlist = coroutine_mock(
+            ClientResult(result={}, error=False, error_msg=None)
+        )
+
+        asyncio.run(self.adapter.add_track_to_playlist('Test Playlist', 'Test Video'))
+
+        request_data = self.adapter.youtube_client.add_tracks_to_playlist.call_args[1]
+        self.assertEqual(
+            request_data['request_data']['snippet']['resourceId']['videoId'], 'Test Video'
+        )
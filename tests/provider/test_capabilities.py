@@ -0,0 +1,39 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from musicwire.core.exceptions import ValidationError
+from musicwire.provider.capabilities import DEFAULT_CAPABILITY, get_capability, page_size
+from musicwire.provider.clients.youtube import Client
+from musicwire.provider.models import Provider
+from musicwire.provider.ratelimit import RateLimiter
+
+
+class CapabilitiesTestCase(TestCase):
+    def test_get_capability_if_id_in_path(self):
+        capability = get_capability(Provider.SPOTIFY, 'GET', 'playlists/37i9dQZF1/tracks')
+
+        self.assertEqual(capability.max_page_size, 100)
+
+    def test_get_capability_if_not_listed(self):
+        self.assertEqual(get_capability(Provider.SPOTIFY, 'GET', 'me'), DEFAULT_CAPABILITY)
+
+    def test_page_size(self):
+        self.assertEqual(page_size(Provider.YOUTUBE, 'playlistItems'), 50)
+        self.assertEqual(page_size(Provider.YOUTUBE, 'playlistItems', 10), 10)
+
+        with self.assertRaises(ValidationError):
+            page_size(Provider.SPOTIFY, 'me/tracks', 100)
+
+    def test_send_request_if_cost(self):
+        """
+        Expect YouTube quota units of the endpoint to be taken from the rate limiter.
+        """
+        client = Client(base_url='https://www.googleapis.com/youtube/v3/', token='test')
+        response = mock.MagicMock(ok=True, status_code=200, headers={}, content=b'{}')
+
+        with mock.patch.object(RateLimiter, 'acquire') as acquire, \
+                mock.patch.object(client.session, 'request', return_value=response):
+            client.search(params={'q': 'Test'})
+
+        acquire.assert_called_once_with(100)
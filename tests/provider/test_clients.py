@@ -0,0 +1,178 @@
+import asyncio
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+
+from musicwire.provider.clients.base import get_session
+from musicwire.provider.clients.spotify import AsyncClient, Client
+from musicwire.provider.models import Provider
+from musicwire.provider.ratelimit import RateLimiter, parse_retry_after
+
+
+class BaseClientTestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = Client(base_url="https://api.spotify.com/v1/", token='test')
+        patcher = mock.patch.object(RateLimiter, 'reserve', return_value=0)
+        self.reserve = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+
+    def test_get_session_if_same_provider(self):
+        """
+        Expect one keep-alive session per provider in a process.
+        """
+        self.assertIs(get_session(Provider.SPOTIFY), get_session(Provider.SPOTIFY))
+        self.assertIsNot(get_session(Provider.SPOTIFY), get_session(Provider.YOUTUBE))
+
+    def test_get_session_pool_size(self):
+        """
+        Expect room in the pool for every worker and the threads calling besides them.
+        """
+        adapter = get_session(Provider.SPOTIFY).get_adapter('https://api.spotify.com/')
+
+        self.assertEqual(adapter._pool_maxsize, settings.PROVIDER_MAX_WORKERS['spotify'] +
+                         settings.PROVIDER_CALLER_THREADS)
+
+    def test_make_request_if_session_used(self):
+        """
+        Expect requests to go through the pooled session of the provider.
+        """
+        response = mock.MagicMock(ok=True, status_code=200, headers={},
+                                  content=b'{"items": []}')
+
+        with mock.patch.object(self.client.session, 'request',
+                               return_value=response) as request:
+            result = self.client.get_playlists({'limit': 50})
+
+        request.assert_called_once()
+        self.assertEqual(result.result, {'items': []})
+
+    def test_make_request_if_rate_limited(self):
+        """
+        Expect 429 to pause the token with Retry-After and resend the request.
+        """
+        limited = mock.MagicMock(ok=False, status_code=429, headers={'Retry-After': '3'})
+        response = mock.MagicMock(ok=True, status_code=200, headers={},
+                                  content=b'{"items": []}')
+
+        with mock.patch.object(self.client.session, 'request',
+                               side_effect=[limited, response]) as request, \
+                mock.patch.object(RateLimiter, 'pause') as pause:
+            result = self.client.get_playlists({'limit': 50})
+
+        self.assertEqual(request.call_count, 2)
+        pause.assert_called_once_with(3.0)
+        self.assertFalse(result.error)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('7', default=5), 7.0)
+        self.assertEqual(parse_retry_after(None, default=5), 5)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', default=5), 0)
+
+    @mock.patch("musicwire.core.helpers.time.sleep")
+    def test_make_request_if_server_error_is_transient(self, sleep):
+        """
+        Expect GET requests to be retried on 5xx with a backoff wait.
+        """
+        failed = mock.MagicMock(ok=False, status_code=503)
+        response = mock.MagicMock(ok=True, status_code=200, headers={},
+                                  content=b'{"items": []}')
+
+        with mock.patch.object(self.client.session, 'request',
+                               side_effect=[failed, response]) as request:
+            result = self.client.get_playlists({'limit': 50})
+
+        self.assertEqual(request.call_count, 2)
+        sleep.assert_called_once()
+        self.assertFalse(result.error)
+
+    @mock.patch("musicwire.core.helpers.time.sleep")
+    def test_make_request_if_post_is_not_retry_safe(self, sleep):
+        """
+        Expect POST requests not to be resent after the provider got them.
+        """
+        failed = mock.MagicMock(ok=False, status_code=503, text='unavailable')
+
+        with mock.patch.object(self.client.session, 'request',
+                               return_value=failed) as request:
+            result = self.client.add_tracks_to_playlist('playlist', {'uris': ['uri']})
+
+        self.assertEqual(request.call_count, 1)
+        sleep.assert_not_called()
+        self.assertTrue(result.error)
+
+    @mock.patch("musicwire.core.helpers.time.sleep")
+    def test_send_request_if_arguments_are_positional(self, sleep):
+        """
+        Expect method and endpoint of positional arguments to decide the retry.
+        """
+        failed = mock.MagicMock(ok=False, status_code=503, text='unavailable')
+
+        with mock.patch.object(self.client.session, 'request',
+                               return_value=failed) as request:
+            result = self.client.send_request('playlists/test/tracks', None,
+                                              {'uris': ['uri']}, 'POST')
+
+        self.assertEqual(request.call_count, 1)
+        sleep.assert_not_called()
+        self.assertTrue(result.error)
+
+    def test_make_request_if_page_not_modified(self):
+        """
+        Expect ETag to be sent back and 304 to return the cached page without items.
+        """
+        response = mock.MagicMock(ok=True, status_code=200, headers={'ETag': '"v1"'},
+                                  content=b'{"items": [{"id": "Test ID"}], "total": 1}')
+        not_modified = mock.MagicMock(ok=True, status_code=304, headers={})
+
+        with mock.patch.object(self.client.session, 'request',
+                               side_effect=[response, not_modified]) as request:
+            first = self.client.get_saved_tracks({'limit': 50, 'offset': 0})
+            self.client.validators.store(first)
+            result = self.client.get_saved_tracks({'limit': 50, 'offset': 0})
+
+        headers = request.call_args[1]['headers']
+        self.assertEqual(headers['If-None-Match'], '"v1"')
+        self.assertTrue(result.not_modified)
+        self.assertEqual(result.result, {'items': [], 'total': 1})
+
+    def test_make_request_if_page_not_stored(self):
+        """
+        Expect ETag of a page which was not written yet not to be sent.
+        """
+        response = mock.MagicMock(ok=True, status_code=200, headers={'ETag': '"v1"'},
+                                  content=b'{"items": [{"id": "Test ID"}], "total": 1}')
+
+        with mock.patch.object(self.client.session, 'request',
+                               return_value=response) as request:
+            self.client.get_saved_tracks({'limit': 50, 'offset': 0})
+            result = self.client.get_saved_tracks({'limit': 50, 'offset': 0})
+
+        self.assertNotIn('If-None-Match', request.call_args[1]['headers'])
+        self.assertEqual(result.result['items'], [{'id': 'Test ID'}])
+
+
+class AsyncBaseClientTestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = AsyncClient(base_url="https://api.spotify.com/v1/", token='test')
+        patcher = mock.patch.object(RateLimiter, 'reserve', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+
+    def test_send_request_if_headers_are_lowercase(self):
+        """
+        Expect headers to be looked up regardless of their case, like requests does.
+        """
+        response = mock.MagicMock(status=200, headers={'etag': '"v1"'})
+        response.read = mock.AsyncMock(return_value=b'{"items": [], "total": 0}')
+        session = mock.MagicMock()
+        session.request.return_value.__aenter__.return_value = response
+
+        with mock.patch('musicwire.provider.clients.base.get_async_session',
+                        return_value=session):
+            result = asyncio.run(self.client.get_saved_tracks({'limit': 50, 'offset': 0}))
+
+        self.assertEqual(result.etag, '"v1"')
@@ -0,0 +1,63 @@
+import threading
+
+from django.test import TestCase, override_settings
+
+from musicwire.provider import executors
+from musicwire.provider.executors import FairExecutor, get_executor
+from musicwire.provider.models import Provider
+
+
+class FairExecutorTestCase(TestCase):
+    def setUp(self) -> None:
+        self.executor = FairExecutor(max_workers=1)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_submit_if_users_share_workers(self):
+        """
+        Expect queued calls of different users to be run round-robin instead
+        of in submit order.
+        """
+        started, release, calls = threading.Event(), threading.Event(), []
+
+        def block():
+            started.set()
+            release.wait()
+
+        self.executor.submit('busy', block)
+        started.wait()
+        futures = [self.executor.submit('big', calls.append, f'big-{i}') for i in range(3)]
+        futures.append(self.executor.submit('small', calls.append, 'small-0'))
+        release.set()
+        for future in futures:
+            future.result()
+
+        self.assertEqual(calls, ['big-0', 'small-0', 'big-1', 'big-2'])
+
+    def test_submit_if_call_raises(self):
+        future = self.executor.submit('user', int, 'not a number')
+
+        with self.assertRaises(ValueError):
+            future.result()
+
+    def test_submit_if_shutdown(self):
+        self.executor.shutdown()
+
+        with self.assertRaises(RuntimeError):
+            self.executor.submit('user', int, '1')
+
+
+class GetExecutorTestCase(TestCase):
+    def setUp(self) -> None:
+        self.addCleanup(executors._reset_executors)
+        executors._reset_executors()
+
+    @override_settings(PROVIDER_MAX_WORKERS={Provider.SPOTIFY: 8})
+    def test_get_executor(self):
+        """
+        Expect one lazily created executor per provider sized from settings.
+        """
+        executor = get_executor(Provider.SPOTIFY)
+
+        self.assertIs(executor, get_executor(Provider.SPOTIFY))
+        self.assertEqual(executor.max_workers, 8)
+        self.assertEqual(executor._threads, [])
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from model_mommy import mommy
+
+from musicwire.account.models import UserProfile
+from musicwire.music.models import Playlist, PlaylistTrack
+from musicwire.provider.adapters import spotify, youtube
+from musicwire.provider.fakes.data import FakeLibrary
+from musicwire.provider.fakes.server import FakeProviderServer
+from musicwire.provider.ratelimit import RateLimiter
+
+
+class FakeProviderServerTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = mommy.make(UserProfile)
+        self.library = FakeLibrary(playlists=120, tracks_per_playlist=30, saved_tracks=0)
+
+        self.server = FakeProviderServer(self.library)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        settings_patcher = override_settings(PROVIDER_BASE_URLS=self.server.base_urls)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+
+        patcher = mock.patch.object(RateLimiter, 'reserve', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+
+    def test_spotify_playlists_if_many_pages(self):
+        """
+        Expect every page to be saved and first page to be requested once.
+        """
+        adapter = spotify.Adapter(token='test', user=self.user)
+
+        adapter.playlists()
+
+        self.assertEqual(Playlist.objects.filter(user=self.user).count(), 120)
+        self.assertEqual(self.server.calls['spotify GET me/playlists'], 3)
+
+    def test_youtube_playlists_if_many_pages(self):
+        """
+        Expect every playlist to be saved from pages of 50.
+        """
+        adapter = youtube.Adapter(token='test', user=self.user)
+
+        result = adapter.playlists()
+
+        self.assertEqual(len(result), 120)
+        self.assertEqual(Playlist.objects.filter(user=self.user).count(), 120)
+        self.assertEqual(self.server.calls['youtube GET playlists'], 3)
+
+    def test_youtube_playlist_tracks_if_page_tokens(self):
+        """
+        Expect playlist items to be followed through page tokens.
+        """
+        adapter = youtube.Adapter(token='test', user=self.user)
+        playlist_id = self.library.playlist(0)['id']
+
+        adapter.playlist_tracks(playlist_id, limit=10)
+
+        self.assertEqual(PlaylistTrack.objects.filter(user=self.user).count(), 30)
+        self.assertEqual(self.server.calls['youtube GET playlistItems'], 3)
+
+    def test_youtube_playlist_tracks_if_video_details(self):
+        """
+        Expect channel and duration of every track from a videos request per page.
+        """
+        adapter = youtube.Adapter(token='test', user=self.user)
+        playlist_id = self.library.playlist(0)['id']
+
+        adapter.playlist_tracks(playlist_id)
+
+        track = self.library.track(0, 0)
+        saved = PlaylistTrack.objects.get(user=self.user, remote_id=track['id'][:11])
+        self.assertEqual(saved.artist, track['artist'])
+        self.assertEqual(saved.duration_ms, track['duration_ms'] // 1000 * 1000)
+        self.assertEqual(saved.category, '10')
+        self.assertEqual(saved.channel, f"{track['artist']} - Topic")
+        self.assertEqual(self.server.calls['youtube GET videos'], 1)
+
+    def test_youtube_playlist_tracks_if_stored(self):
+        """
+        Expect stored videos to be neither saved again nor their details requested.
+        """
+        adapter = youtube.Adapter(token='test', user=self.user)
+        playlist_id = self.library.playlist(0)['id']
+        adapter.playlist_tracks(playlist_id)
+        # Pages are requested again without their validators.
+        cache.clear()
+
+        adapter.playlist_tracks(playlist_id)
+
+        self.assertEqual(PlaylistTrack.objects.filter(user=self.user).count(), 30)
+        self.assertEqual(self.server.calls['youtube GET playlistItems'], 2)
+        self.assertEqual(self.server.calls['youtube GET videos'], 1)
@@ -0,0 +1,137 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from requests import exceptions as requests_exceptions
+
+from musicwire.provider.clients.spotify import Client
+from musicwire.provider.metrics import RequestMetrics, endpoint_name, request_metrics
+from musicwire.provider.models import Provider
+from musicwire.provider.ratelimit import RateLimiter
+
+
+class RequestMetricsTestCase(TestCase):
+    def setUp(self) -> None:
+        request_metrics.reset()
+        self.addCleanup(request_metrics.reset)
+        self.client = Client(base_url="https://api.spotify.com/v1/", token='test')
+        patcher = mock.patch.object(RateLimiter, 'reserve', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+
+    def test_endpoint_name_if_id_in_path(self):
+        self.assertEqual(endpoint_name('playlists/37i9dQZF1/tracks'), 'playlists/{id}/tracks')
+        self.assertEqual(endpoint_name('users/test/playlists'), 'users/{id}/playlists')
+        self.assertEqual(endpoint_name('me/tracks'), 'me/tracks')
+
+    def test_make_request_if_observed(self):
+        """
+        Expect status, size and retries of a request to be recorded under its
+        endpoint name.
+        """
+        failed = mock.MagicMock(ok=False, status_code=503, headers={}, content=b'')
+        response = mock.MagicMock(ok=True, status_code=200, headers={},
+                                  content=b'{"items": []}')
+
+        with mock.patch.object(self.client.session, 'request',
+                               side_effect=[failed, response]), \
+                mock.patch('musicwire.core.helpers.time.sleep'):
+            self.client.get_playlist_tracks({'playlist_id': 'test', 'limit': 50})
+
+        stats = request_metrics.endpoints[(Provider.SPOTIFY, 'GET', 'playlists/{id}/tracks')]
+        self.assertEqual(dict(stats.statuses), {'200': 1})
+        self.assertEqual(stats.retries, 1)
+        self.assertEqual(stats.response_bytes, len(b'{"items": []}'))
+
+    def test_make_request_if_connection_error(self):
+        with mock.patch.object(self.client.session, 'request',
+                               side_effect=requests_exceptions.ConnectionError), \
+                mock.patch('musicwire.core.helpers.time.sleep'):
+            self.client.get_playlists({'limit': 50})
+
+        stats = request_metrics.endpoints[(Provider.SPOTIFY, 'GET', 'me/playlists')]
+        self.assertEqual(dict(stats.statuses), {'error': 1})
+
+    def test_render(self):
+        request_metrics.observe(Provider.YOUTUBE, 'search', 'GET', 200, 0.3, 10, 0)
+
+        text = request_metrics.render()
+
+        labels = 'provider="youtube",method="GET",endpoint="search"'
+        self.assertIn(f'provider_requests_total{{{labels},status="200"}} 1', text)
+        self.assertIn(f'provider_request_duration_seconds_bucket{{{labels},le="0.25"}} 0',
+                      text)
+        self.assertIn(f'provider_request_duration_seconds_bucket{{{labels},le="0.5"}} 1',
+                      text)
+
+    def test_flush(self):
+        """
+        Expect counts to be added to the shared totals and cleared in process.
+        """
+        request_metrics.observe(Provider.YOUTUBE, 'search', 'GET', 200, 0.3, 10, 0)
+        redis = mock.MagicMock()
+
+        with mock.patch.object(RequestMetrics, 'redis', redis):
+            request_metrics.flush()
+
+        pipeline = redis.pipeline.return_value
+        pipeline.hincrby.assert_any_call(request_metrics.key,
+                                         'youtube|GET|search|status:200', 1)
+        pipeline.hincrbyfloat.assert_called_once_with(request_metrics.key,
+                                                      'youtube|GET|search|duration', 0.3)
+        self.assertEqual(dict(request_metrics.endpoints), {})
+
+    def test_flush_if_redis_is_unavailable(self):
+        """
+        Expect counts to be kept in process.
+        """
+        request_metrics.observe(Provider.YOUTUBE, 'search', 'GET', 200, 0.3, 10, 0)
+
+        with self.assertLogs('musicwire.provider.metrics', 'WARNING'):
+            request_metrics.flush()
+
+        stats = request_metrics.endpoints[(Provider.YOUTUBE, 'GET', 'search')]
+        self.assertEqual(stats.count, 1)
+
+    def test_render_if_other_processes_flushed(self):
+        """
+        Expect totals of other processes to be rendered with counts of this one.
+        """
+        request_metrics.observe(Provider.YOUTUBE, 'search', 'GET', 200, 0.3, 10, 0)
+        redis = mock.MagicMock()
+        redis.hgetall.return_value = {b'youtube|GET|search|status:200': b'2',
+                                      b'youtube|GET|search|count': b'2',
+                                      b'youtube|GET|search|duration': b'0.5'}
+
+        with mock.patch.object(RequestMetrics, 'redis', redis):
+            text = request_metrics.render()
+
+        labels = 'provider="youtube",method="GET",endpoint="search"'
+        self.assertIn(f'provider_requests_total{{{labels},status="200"}} 3', text)
+        self.assertIn(f'provider_request_duration_seconds_count{{{labels}}} 3', text)
+        self.assertIn(f'provider_request_duration_seconds_sum{{{labels}}} 0.800000', text)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_view_if_token_not_set(self):
+        """
+        Expect the endpoint to be closed unless a token is configured.
+        """
+        response = self.client_class().get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_view_if_token_missing(self):
+        response = self.client_class().get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_view(self):
+        response = self.client_class().get(reverse('metrics'),
+                                           HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE provider_requests_total counter', response.content)
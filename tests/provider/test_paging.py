@@ -0,0 +1,99 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase
+
+from musicwire.provider.datastructures import ClientResult
+from musicwire.provider.executors import FairExecutor
+from musicwire.provider.paging import prefetch_pages
+
+
+def token_page(token, last=3):
+    index = int(token or 0)
+    result = {'items': [index]}
+    if index + 1 < last:
+        result['nextPageToken'] = str(index + 1)
+    return ClientResult(result=result, error=False, error_msg=None)
+
+
+class PrefetchPagesTestCase(TestCase):
+    def setUp(self) -> None:
+        self.executor = FairExecutor(max_workers=2, name='test')
+        self.addCleanup(self.executor.shutdown)
+
+    def test_prefetch_pages(self):
+        """
+        Expect pages to be followed through tokens and yielded in order.
+        """
+        fetch = mock.MagicMock(side_effect=token_page)
+
+        pages = list(prefetch_pages(self.executor, 1, fetch))
+
+        self.assertEqual([page.result['items'] for page in pages], [[0], [1], [2]])
+        self.assertEqual([call[0][0] for call in fetch.call_args_list], [None, '1', '2'])
+
+    def test_prefetch_pages_if_read_ahead(self):
+        """
+        Expect next page to be requested while the consumer holds the current one.
+        """
+        requested = threading.Event()
+
+        def fetch(token):
+            if token == '1':
+                requested.set()
+            return token_page(token)
+
+        pages = prefetch_pages(self.executor, 1, fetch)
+        next(pages)
+
+        self.assertTrue(requested.wait(timeout=1))
+        pages.close()
+
+    def test_prefetch_pages_if_other_key_waits(self):
+        """
+        Expect calls of other keys to be served between pages of a crawl.
+        """
+        executor = FairExecutor(max_workers=1, name='test')
+        self.addCleanup(executor.shutdown)
+        calls = []
+
+        def fetch(token):
+            if token is None:
+                executor.submit(2, calls.append, 'other')
+            calls.append(token)
+            return token_page(token)
+
+        list(prefetch_pages(executor, 1, fetch))
+
+        self.assertListEqual(calls, [None, 'other', '1', '2'])
+
+    def test_prefetch_pages_if_error(self):
+        """
+        Expect a failed page to be the last one, its error is for the consumer.
+        """
+        error = ClientResult(result=None, error=True, error_msg='Test Error')
+        fetch = mock.MagicMock(side_effect=[token_page(None), error])
+
+        pages = list(prefetch_pages(self.executor, 1, fetch))
+
+        self.assertEqual(pages[-1], error)
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_prefetch_pages_if_exception(self):
+        fetch = mock.MagicMock(side_effect=ValueError('Test'))
+
+        with self.assertRaises(ValueError):
+            list(prefetch_pages(self.executor, 1, fetch))
+
+    def test_prefetch_pages_if_consumer_stopped(self):
+        """
+        Expect reader to stop requesting pages once the consumer stops.
+        """
+        fetch = mock.MagicMock(side_effect=lambda token: token_page(token, last=1000))
+
+        pages = prefetch_pages(self.executor, 1, fetch, depth=1)
+        next(pages)
+        pages.close()
+        self.executor.shutdown()
+
+        self.assertLess(fetch.call_count, 5)
@@ -0,0 +1,180 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from model_mommy import mommy
+from redis.exceptions import RedisError
+from rest_framework.test import APIClient
+
+from musicwire.account.models import UserProfile
+from musicwire.provider import progress
+from musicwire.provider.progress import ProgressReporter, get_progress, with_progress
+
+KEY = 'progress:1:transfer_tracks'
+
+
+class ProgressReporterTestCase(TestCase):
+    def setUp(self) -> None:
+        self.redis = mock.MagicMock()
+        patcher = mock.patch.object(ProgressReporter, 'redis', self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pipeline = self.redis.pipeline.return_value
+
+    def test_incr_if_throttled(self):
+        """
+        Expect increments within the interval to be written once, summed.
+        """
+        reporter = ProgressReporter(1, 'transfer_tracks', interval=60)
+
+        reporter.incr('pages_done')
+        reporter.incr('pages_done', 2)
+        self.pipeline.execute.assert_not_called()
+
+        reporter.flush()
+
+        self.pipeline.hincrby.assert_called_once_with(KEY, 'pages_done', 3)
+        self.pipeline.execute.assert_called_once()
+
+    def test_incr_if_interval_passed(self):
+        reporter = ProgressReporter(1, 'transfer_tracks', interval=0)
+
+        reporter.incr('searches', 5)
+
+        self.pipeline.hincrby.assert_called_once_with(KEY, 'searches', 5)
+
+    def test_incr_if_called_on_event_loop(self):
+        """
+        Expect due increments of coroutines to be written off the loop's thread.
+        """
+        reporter = ProgressReporter(1, 'transfer_tracks', interval=0)
+        flushed_on = []
+        self.pipeline.execute.side_effect = lambda: flushed_on.append(
+            threading.current_thread())
+
+        async def crawl():
+            reporter.incr('pages_done')
+            await asyncio.sleep(0.01)
+
+        asyncio.run(crawl())
+
+        self.pipeline.hincrby.assert_called_once_with(KEY, 'pages_done', 1)
+        self.assertNotEqual(flushed_on, [threading.current_thread()])
+
+    def test_flush_if_redis_is_unavailable(self):
+        """
+        Expect progress to be dropped with a warning instead of failing the job.
+        """
+        self.pipeline.execute.side_effect = RedisError('Connection refused')
+        reporter = ProgressReporter(1, 'transfer_tracks', interval=60)
+        reporter.incr('adds')
+
+        with self.assertLogs('musicwire.provider.progress', 'WARNING'):
+            reporter.flush()
+
+    def test_stage_if_failed(self):
+        reporter = ProgressReporter(1, 'transfer_tracks', interval=60)
+
+        with self.assertRaises(ValueError):
+            with reporter.stage():
+                raise ValueError()
+
+        self.redis.delete.assert_called_once_with(KEY)
+        self.pipeline.hset.assert_any_call(KEY, 'stage', 'transfer_tracks')
+        self.pipeline.hset.assert_called_with(KEY, 'state', 'failed')
+
+    def test_with_progress(self):
+        """
+        Expect the task's user argument to pick the counters.
+        """
+        user = mommy.make(UserProfile)
+
+        @with_progress('test')
+        def task(source_slug, user):
+            return source_slug
+
+        result = task('spotify', user=user)
+
+        self.assertEqual(result, 'spotify')
+        self.redis.delete.assert_called_once_with(f'progress:{user.pk}:test')
+        self.pipeline.hset.assert_called_with(f'progress:{user.pk}:test', 'state', 'finished')
+
+    def test_with_progress_if_stages_run_together(self):
+        """
+        Expect counters of the task's calls to go to its stage, a stage
+        starting does not reset the other.
+        """
+        user = mommy.make(UserProfile)
+
+        @with_progress('transfer_playlists')
+        def playlists_task(user):
+            return get_progress(user.pk)
+
+        @with_progress('transfer_tracks')
+        def tracks_task(user):
+            return get_progress(user.pk)
+
+        self.assertEqual(playlists_task(user=user).key, f'progress:{user.pk}:transfer_playlists')
+        self.assertEqual(tracks_task(user=user).key, f'progress:{user.pk}:transfer_tracks')
+        self.assertEqual(get_progress(user.pk).stage_name, 'crawl')
+        self.assertListEqual(self.redis.delete.call_args_list, [
+            mock.call(f'progress:{user.pk}:transfer_playlists'),
+            mock.call(f'progress:{user.pk}:transfer_tracks'),
+        ])
+
+    def test_with_progress_if_task_returned(self):
+        """
+        Expect the reporter of the task to be dropped once its stage is written.
+        """
+        user = mommy.make(UserProfile)
+
+        @with_progress('transfer_tracks')
+        def task(user):
+            get_progress(user.pk).incr('adds')
+            self.assertIn((user.pk, 'transfer_tracks'), progress._reporters)
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            task(user=user)
+
+        self.assertNotIn((user.pk, 'transfer_tracks'), progress._reporters)
+        self.pipeline.hincrby.assert_called_once_with(
+            f'progress:{user.pk}:transfer_tracks', 'adds', 1)
+
+    def test_read(self):
+        self.redis.hgetall.return_value = {b'state': b'running', b'pages_done': b'3'}
+
+        progress = ProgressReporter(1, 'transfer_tracks').read()
+
+        self.assertEqual(progress['state'], 'running')
+        self.assertEqual(progress['pages_done'], 3)
+        self.assertEqual(progress['adds'], 0)
+
+    def test_read_if_nothing_reported(self):
+        self.redis.hgetall.return_value = {}
+
+        self.assertDictEqual(ProgressReporter(1, 'transfer_tracks').read(), {})
+
+
+class TransferProgressViewTestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = mommy.make(UserProfile, token='user_token')
+
+    def test_get_progress(self):
+        with mock.patch.object(ProgressReporter, 'read',
+                               return_value={'state': 'running'}) as read:
+            response = self.client.get(reverse('transfer-progress'), HTTP_TOKEN='user_token')
+
+        self.assertEqual(read.call_count, 2)
+        self.assertEqual(response.json(), {
+            'transfer_playlists': {'state': 'running'},
+            'transfer_tracks': {'state': 'running'},
+        })
+
+    def test_get_progress_if_user_is_not_authenticated(self):
+        response = self.client.get(reverse('transfer-progress'))
+
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,165 @@
+import datetime
+from unittest import mock
+
+import pytz
+from django.test import TestCase
+from django.utils import timezone
+from kombu.utils import json
+from model_mommy import mommy
+from redis.exceptions import RedisError
+
+from musicwire.account.models import UserProfile
+from musicwire.core.exceptions import ProviderTokenExpired, QuotaExceeded
+from musicwire.provider.datastructures import AsyncResponse
+from musicwire.provider.models import Provider, ProviderToken
+from musicwire.provider.quota import QuotaLedger, get_quota, with_quota
+
+
+class QuotaLedgerTestCase(TestCase):
+    def setUp(self) -> None:
+        self.redis = mock.MagicMock()
+        patcher = mock.patch.object(QuotaLedger, 'redis', self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pipeline = self.redis.pipeline.return_value
+        self.ledger = QuotaLedger(Provider.YOUTUBE)
+
+    def test_reset_at(self):
+        """
+        Expect the quota day to end at midnight Pacific time, not UTC.
+        """
+        now = datetime.datetime(2020, 7, 1, 6, 0, tzinfo=pytz.utc)
+
+        self.assertEqual(self.ledger.day(now), datetime.date(2020, 6, 30))
+        self.assertEqual(self.ledger.reset_at(now),
+                         datetime.datetime(2020, 7, 1, 7, 0, tzinfo=pytz.utc))
+
+    def test_spend(self):
+        self.pipeline.execute.return_value = [150, True]
+
+        self.ledger.spend(100)
+
+        self.pipeline.incrby.assert_called_once_with(self.ledger.key, 100)
+        self.redis.decrby.assert_not_called()
+
+    def test_spend_if_quota_is_used_up(self):
+        """
+        Expect the request not to be recorded and QuotaExceeded to be raised.
+        """
+        self.pipeline.execute.return_value = [10050, True]
+
+        with self.assertRaises(QuotaExceeded):
+            self.ledger.spend(100)
+
+        self.redis.decrby.assert_called_once_with(self.ledger.key, 100)
+
+    def test_spend_if_redis_is_unavailable(self):
+        self.pipeline.execute.side_effect = RedisError('Connection refused')
+
+        with self.assertLogs('musicwire.provider.quota', 'WARNING'):
+            self.ledger.spend(100)
+
+    def test_observe_if_provider_tells_quota_exceeded(self):
+        response = AsyncResponse(status_code=403, headers={},
+                                 content=b'{"error": {"errors": [{"reason": "quotaExceeded"}]}}')
+
+        self.ledger.observe(response)
+
+        self.pipeline.set.assert_called_once_with(self.ledger.key, self.ledger.units)
+
+    def test_get_quota_if_provider_has_no_quota(self):
+        self.assertIsNone(get_quota(Provider.SPOTIFY))
+
+
+class WithQuotaTestCase(TestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch('musicwire.provider.quota.current_app')
+        self.app = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def task(func):
+        return with_quota(('end_slug', 'end_token'))(func)
+
+    def test_with_quota_if_quota_is_used_up(self):
+        """
+        Expect the task not to start and to be sent again after the reset.
+        """
+        calls = []
+
+        def test_task(end_slug, end_token):
+            calls.append(end_slug)
+
+        with mock.patch.object(QuotaLedger, 'remaining', return_value=0), \
+                self.assertLogs('musicwire.provider.quota', 'WARNING'):
+            self.task(test_task)(Provider.YOUTUBE, 'test_token')
+
+        self.assertListEqual(calls, [])
+        _, kwargs = self.app.send_task.call_args
+        self.assertDictEqual(kwargs['kwargs'], {'end_slug': Provider.YOUTUBE, 'end_token': None})
+        self.assertEqual(kwargs['eta'], QuotaLedger(Provider.YOUTUBE).reset_at())
+
+    def test_with_quota_if_task_runs_out(self):
+        def test_task(end_slug, end_token):
+            raise QuotaExceeded('Test Error')
+
+        with mock.patch.object(QuotaLedger, 'remaining', return_value=100), \
+                self.assertLogs('musicwire.provider.quota', 'WARNING'):
+            self.task(test_task)(Provider.YOUTUBE, 'test_token')
+
+        self.assertEqual(self.app.send_task.call_args[0][0],
+                         f'{__name__}.test_task')
+
+    def test_with_quota_if_sent_again(self):
+        """
+        Expect the task to be sent with JSON arguments, the user's pk instead
+        of the user and without the expiring token. Resumed task gets the
+        user and the latest token of the user.
+        """
+        user = mommy.make(UserProfile)
+        calls = []
+
+        @with_quota(('end_slug', 'end_token'))
+        def test_task(end_slug, end_token, user):
+            calls.append((end_token, user))
+
+        with mock.patch.object(QuotaLedger, 'remaining', return_value=0), \
+                self.assertLogs('musicwire.provider.quota', 'WARNING'):
+            test_task(Provider.YOUTUBE, 'test_token', user)
+        sent = json.loads(json.dumps(self.app.send_task.call_args[1]['kwargs']))
+        ProviderToken.remember(user, Provider.YOUTUBE, 'new_token')
+
+        with mock.patch.object(QuotaLedger, 'remaining', return_value=100):
+            test_task(**sent)
+
+        self.assertDictEqual(sent, {'end_slug': Provider.YOUTUBE, 'end_token': None,
+                                    'user': user.pk})
+        self.assertListEqual(calls, [('new_token', user)])
+
+    def test_with_quota_if_stored_token_expired(self):
+        """
+        Expect the resumed task not to run with an expired token.
+        """
+        user = mommy.make(UserProfile)
+        calls = []
+
+        @with_quota(('end_slug', 'end_token'))
+        def test_task(end_slug, end_token, user):
+            calls.append(end_token)
+
+        test_task(Provider.SPOTIFY, 'test_token', user)
+        ProviderToken.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=2))
+
+        with self.assertRaises(ProviderTokenExpired):
+            test_task(Provider.SPOTIFY, None, user.pk)
+
+        self.assertListEqual(calls, ['test_token'])
+        self.assertEqual(ProviderToken.objects.get(user=user).token, 'test_token')
+
+    def test_with_quota_if_provider_has_no_quota(self):
+        def test_task(end_slug, end_token):
+            return end_slug
+
+        self.assertEqual(self.task(test_task)(Provider.SPOTIFY, 'test_token'),
+                         Provider.SPOTIFY)
+        self.app.send_task.assert_not_called()
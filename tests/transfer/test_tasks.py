@@ -0,0 +1,129 @@
+import asyncio
+from unittest import mock
+
+from django.test import TestCase
+from model_mommy import mommy
+
+from musicwire.account.models import UserProfile
+from musicwire.core.exceptions import ProviderResponseError
+from musicwire.music.models import CreatedPlaylist, Playlist, PlaylistTrack
+from musicwire.provider.models import Provider, ProviderToken
+from musicwire.provider.quota import QuotaLedger
+from musicwire.transfer.models import TransferError
+from musicwire.transfer.tasks import crawl_playlists, flush_tracks, transfer_tracks_task
+
+
+class FlushTracksTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = mommy.make(UserProfile)
+        self.tracks = mommy.make(PlaylistTrack, user=self.user, is_transferred=False,
+                                 _quantity=3)
+
+    def test_flush_tracks(self):
+        """
+        Expect one batch request, added tracks marked transferred and a transfer
+        error for the rest.
+        """
+        adapter = mock.MagicMock()
+        adapter.add_tracks_to_playlist.return_value = ['id-0', 'id-2']
+        pending = [(track, f'id-{i}') for i, track in enumerate(self.tracks)]
+
+        with mock.patch('musicwire.transfer.tasks.TransferError.objects.create') as create:
+            flush_tracks(adapter, 'Test Playlist', pending, Provider.SPOTIFY,
+                         Provider.YOUTUBE, self.user)
+
+        adapter.add_tracks_to_playlist.assert_called_once_with(
+            'Test Playlist', ['id-0', 'id-1', 'id-2']
+        )
+        transferred = PlaylistTrack.objects.filter(is_transferred=True)
+        self.assertEqual(set(transferred), {self.tracks[0], self.tracks[2]})
+        self.assertEqual(create.call_args[1]['request_data']['track_ids'], ['id-1'])
+        self.assertListEqual(pending, [])
+
+
+class CrawlPlaylistTestCase(TestCase):
+    def test_crawl_playlists_if_adapter_is_async(self):
+        """
+        Expect playlists to be crawled on one event loop and a failed one to be
+        reported while the others finish.
+        """
+        loops, errors = [], []
+
+        async def playlist_tracks(playlist_id, keep_tracks, skip_synced):
+            loops.append(asyncio.get_running_loop())
+            if playlist_id == 'Failed Playlist':
+                raise ProviderResponseError('Test Error')
+
+        adapter = mock.MagicMock()
+        adapter.playlist_tracks = playlist_tracks
+
+        crawl_playlists(adapter, ['Test Playlist', 'Failed Playlist', 'Other Playlist'],
+                        lambda playlist_id, error: errors.append(playlist_id))
+
+        self.assertEqual(len(loops), 3)
+        self.assertEqual(len(set(loops)), 1)
+        self.assertListEqual(errors, ['Failed Playlist'])
+
+    def test_crawl_playlists(self):
+        adapter = mock.MagicMock()
+        adapter.playlist_tracks.side_effect = [ProviderResponseError('Test Error'), []]
+        errors = []
+
+        crawl_playlists(adapter, ['Failed Playlist', 'Test Playlist'],
+                        lambda playlist_id, error: errors.append(playlist_id))
+
+        self.assertEqual(adapter.playlist_tracks.call_count, 2)
+        self.assertListEqual(errors, ['Failed Playlist'])
+
+
+class TransferTracksTaskTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = mommy.make(UserProfile)
+        playlist = mommy.make(Playlist, name='Test Playlist', provider=Provider.SPOTIFY,
+                              user=self.user)
+        mommy.make(CreatedPlaylist, name='Test Playlist', provider=Provider.YOUTUBE,
+                   user=self.user)
+        self.tracks = mommy.make(PlaylistTrack, playlist=playlist, user=self.user,
+                                 is_transferred=False, _quantity=3)
+
+        self.adapter = mock.MagicMock(track_quota_cost=150, add_tracks_batch_size=50)
+        self.adapter.match_tracks.side_effect = lambda tracks: [{}] * len(tracks)
+        patcher = mock.patch('musicwire.transfer.tasks.Provider.get_provider',
+                             return_value=self.adapter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_transfer_tracks_task_if_token_expired(self):
+        """
+        Expect a resumed task without a valid token to be recorded as failed.
+        """
+        ProviderToken.remember(self.user, Provider.SPOTIFY, 'source_token')
+
+        with mock.patch('musicwire.transfer.tasks.TransferError.objects.create') as create, \
+                self.assertLogs('musicwire.provider.quota', 'WARNING'):
+            transfer_tracks_task(Provider.SPOTIFY, None, Provider.YOUTUBE, None, self.user.pk)
+
+        self.adapter.match_tracks.assert_not_called()
+        error = create.call_args[1]
+        self.assertEqual(error['request_data'], {'provider': Provider.YOUTUBE})
+        self.assertEqual(error['type'], TransferError.TRACK)
+        self.assertEqual(error['user'], self.user)
+
+    def test_transfer_tracks_task_if_quota_is_short(self):
+        """
+        Expect only the tracks the quota covers to be searched and the task to
+        be sent again for the rest.
+        """
+        with mock.patch.object(QuotaLedger, 'remaining', return_value=300), \
+                mock.patch('musicwire.provider.quota.current_app') as app, \
+                self.assertLogs('musicwire.provider.quota', 'WARNING'):
+            transfer_tracks_task(Provider.SPOTIFY, 'source_token', Provider.YOUTUBE,
+                                 'end_token', self.user)
+
+        self.assertEqual(len(self.adapter.match_tracks.call_args[0][0]), 2)
+        self.assertEqual(app.send_task.call_args[0][0],
+                         'musicwire.transfer.tasks.transfer_tracks_task')
+        sent = app.send_task.call_args[1]['kwargs']
+        self.assertEqual(sent['user'], self.user.pk)
+        self.assertIsNone(sent['source_token'])
+        self.assertIsNone(sent['end_token'])